@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from mybackend.budgets import BudgetTestMixin
+from tasks.models import Task
+
+
+class AgendaTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def agenda(self, start='2024-05-06', end='2024-05-13', **params):
+        return self.client.get('/api/agenda/', {'start': start, 'end': end, **params})
+
+    def test_tasks_and_appointments_are_merged_in_calendar_order(self):
+        Task.objects.create(owner=self.user, description='Report', date='2024-05-07', time='10:00')
+        Task.objects.create(owner=self.user, description='Errands', date='2024-05-06')
+        Task.objects.create(owner=self.user, description='Too late', date='2024-05-13')
+        Appointment.objects.create(owner=self.user, title='Standup', date='2024-05-07', time='10:00')
+        Appointment.objects.create(owner=self.user, title='Dentist', date='2024-05-06', time='15:30')
+        Appointment.objects.create(owner=self.user, title='Too early', date='2024-05-05', time='15:30')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        Task.objects.create(owner=other, description='Not mine', date='2024-05-07')
+
+        response = self.agenda()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['type'], item.get('title') or item.get('description')) for item in response.data['items']],
+            [('task', 'Errands'), ('appointment', 'Dentist'), ('appointment', 'Standup'), ('task', 'Report')],
+        )
+
+    def test_one_query_per_resource(self):
+        for day in range(6, 13):
+            appointment = Appointment.objects.create(owner=self.user, title='Meeting', date=f'2024-05-{day:02}')
+            appointment.attendees.add(Contact.objects.create(owner=self.user, name=f'Guest {day}'))
+            Task.objects.create(owner=self.user, description='Task', date=f'2024-05-{day:02}')
+
+        # tasks, appointments and their attendees
+        with self.assertNumQueries(3):
+            response = self.agenda(expand='attendees')
+        self.assertEqual(len(response.data['items']), 14)
+        self.assertEqual(response.data['items'][0]['attendees'][0]['name'], 'Guest 6')
+
+    def test_window_is_required_and_bounded(self):
+        self.assertEqual(self.client.get('/api/agenda/', {'start': '2024-05-06'}).status_code, 400)
+        self.assertEqual(self.agenda(end='2025-05-06').status_code, 400)
+        self.assertEqual(self.agenda(start='soon').status_code, 400)
+
+
+
+class AgendaBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/agenda/'
+
+    def test_budgets(self):
+        def week(rows):
+            owner = self.create_owner()
+            guest = Contact.objects.create(owner=owner, name='Guest')
+            for i in range(rows):
+                Task.objects.create(owner=owner, description=f'Task {i}', date=f'2024-05-{6 + i % 7:02}')
+                appointment = Appointment.objects.create(owner=owner, title='Meeting', date=f'2024-05-{6 + i % 7:02}')
+                appointment.attendees.add(guest)
+            client = self.client_for(owner)
+            return lambda: client.get('/api/agenda/', {'start': '2024-05-06', 'end': '2024-05-13'})
+
+        self.check_budgets({('agenda', 'GET'): week})
@@ -0,0 +1,59 @@
+import heapq
+from datetime import timedelta
+
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from appointments.models import Appointment
+from appointments.serializers import AppointmentSerializer
+from appointments.views import with_attendees
+from mybackend.filters import CALENDAR_ORDERING, date_range_filter, get_date_range
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+
+# Enough for a month view padded out to whole weeks, with room to spare
+MAX_WINDOW = timedelta(days=92)
+
+# Appointments come before tasks at the same moment
+RESOURCES = [
+    ('appointment', Appointment, AppointmentSerializer),
+    ('task', Task, TaskSerializer),
+]
+
+
+def calendar_key(item):
+    # ISO dates and times sort as strings; all-day items (no time) go first
+    return item['date'], item['time'] or ''
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def agenda(request):
+    """
+    The user's appointments and tasks between `?start=` and `?end=`, merged
+    into one list in calendar order. Each item carries a `type` of
+    "appointment" or "task" next to its usual fields.
+    """
+    start, end = get_date_range(request)
+    if start is None or end is None:
+        return Response({'error': 'Both start and end are required.'}, status=status.HTTP_400_BAD_REQUEST)
+    if end[0] - start[0] > MAX_WINDOW:
+        return Response({'error': f'The window can be at most {MAX_WINDOW.days} days.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    streams = []
+    for kind, model, serializer_class in RESOURCES:
+        queryset = model.objects.filter(date_range_filter(start, end), owner=request.user)
+        queryset = queryset.order_by(*CALENDAR_ORDERING, 'id')
+        if model is Appointment:
+            queryset = with_attendees(queryset)
+        data = serializer_class(queryset, many=True, context={'request': request}).data
+        streams.append([{'type': kind, **item} for item in data])
+
+    return Response({
+        'start': request.query_params['start'],
+        'end': request.query_params['end'],
+        'items': list(heapq.merge(*streams, key=calendar_key)),
+    })
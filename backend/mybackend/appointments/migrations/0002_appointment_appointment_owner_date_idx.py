@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['owner', 'date', 'time', 'id'], name='appointment_owner_date_idx'),
+        ),
+    ]
@@ -19,6 +19,16 @@ class Appointment(models.Model):
     
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also bumped when the attendee list changes, see sync.tracking
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves AppointmentListCreate: owner filter + chronological, id as tie-breaker
+            models.Index(fields=["owner", "date", "time", "id"], name="appointment_owner_date_idx"),
+            # Serves the delta sync: what changed for this owner since a point in time
+            models.Index(fields=["owner", "updated_at"], name="appointment_owner_updated_idx"),
+        ]
 
     def __str__(self):
         return f"'{self.title}' on {self.date} by {self.owner.username}"
\ No newline at end of file
@@ -1,7 +1,63 @@
+from django.core.exceptions import ValidationError
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from contacts.models import Contact
+from mybackend.fieldsets import SparseFieldsetSerializerMixin
+from mybackend.timing import TimedSerializerMixin
 from .models import Appointment
 
-class AppointmentSerializer(serializers.ModelSerializer):
+
+class PrimaryKeyListField(serializers.ManyRelatedField):
+    """ A list of primary keys, looked up in one query instead of DRF's one per key. """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        queryset = child.get_queryset()
+        keys = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise ValidationError(item)
+                keys.append(queryset.model._meta.pk.to_python(item))
+            except ValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        found = queryset.in_bulk(keys)
+        for key, item in zip(keys, data):
+            if key not in found:
+                child.fail('does_not_exist', pk_value=item)
+        return [found[key] for key in keys]
+
+
+class PrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {key: value for key, value in kwargs.items() if key in MANY_RELATION_KWARGS}
+        return PrimaryKeyListField(child_relation=cls(*args, **kwargs), **list_kwargs)
+
+
+class AttendeeSummarySerializer(serializers.ModelSerializer):
+    """ Just enough of a contact to show who is attending. """
+    class Meta:
+        model = Contact
+        fields = ['id', 'name', 'email']
+
+
+def expanded_fields(request):
+    """ The relations `?expand=` asks to inline. """
+    expand = request.query_params.get('expand', '') if request is not None else ''
+    return {name.strip() for name in expand.split(',') if name.strip()}
+
+
+class AppointmentSerializer(TimedSerializerMixin, SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    # Validates the attendee ids in one query
+    serializer_related_field = PrimaryKeyRelatedField
+
     class Meta:
         model = Appointment
         # We list the new fields from our model
@@ -15,6 +71,32 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'location', 
             'notes', 
             'attendees', 
-            'created_at'
+            'created_at',
+            'updated_at'
         ]
-        read_only_fields = ['owner']
\ No newline at end of file
+        read_only_fields = ['owner']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if 'attendees' in fields and request is not None:
+            # Only the user's own contacts can attend, or be expanded
+            fields['attendees'].child_relation.queryset = Contact.objects.filter(owner=request.user)
+        return fields
+
+    def get_expanded_fields(self):
+        # `?expand=attendees` inlines contact summaries instead of ids; code
+        # that isn't answering a request can pass `expand` in the context
+        if not hasattr(self, '_expanded_fields'):
+            if 'expand' in self.context:
+                self._expanded_fields = {name.strip() for name in self.context['expand'] if name.strip()}
+            else:
+                self._expanded_fields = expanded_fields(self.context.get('request'))
+        return self._expanded_fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'attendees' in self.get_expanded_fields() and 'attendees' in data:
+            # Reads the same prefetched attendees the id list came from
+            data['attendees'] = AttendeeSummarySerializer(instance.attendees.all(), many=True).data
+        return data
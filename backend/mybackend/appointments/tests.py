@@ -1,3 +1,255 @@
-from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from contacts.models import Contact
+from mybackend.budgets import BudgetTestMixin
+from mybackend.queryplans import QueryPlanTestMixin
+from .models import Appointment
+from .views import AppointmentListCreate
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class AppointmentListCreateQueryPlanTests(QueryPlanTestMixin, TestCase):
+    """ The list query has to be served by the owner index, not by sorting. """
+    view_class = AppointmentListCreate
+    url = '/api/appointments/'
+
+    def setUp(self):
+        # Ids are reused between tests, so cached lists could leak across them
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        for i in range(3):
+            Appointment.objects.create(owner=self.user, title=f'Appointment {i}')
+
+    def test_pages_use_owner_index(self):
+        self.check_list_plans('appointment_owner_date_idx')
+
+
+class AppointmentAttendeeTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.contacts = [
+            Contact.objects.create(owner=self.user, name=f'Contact {i}', email=f'c{i}@example.com')
+            for i in range(3)
+        ]
+
+    def add_appointments(self, count):
+        for i in range(count):
+            appointment = Appointment.objects.create(owner=self.user, title=f'Appointment {i}')
+            appointment.attendees.set(self.contacts)
+
+    def count_list_queries(self, params):
+        caches['lists'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/appointments/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_length(self):
+        self.add_appointments(2)
+        few = self.count_list_queries({})
+        self.add_appointments(10)
+        self.assertEqual(self.count_list_queries({}), few)
+        self.assertEqual(self.count_list_queries({'expand': 'attendees'}), few)
+
+    def test_expand_inlines_contact_summaries(self):
+        self.add_appointments(1)
+        plain = self.client.get('/api/appointments/').data['results'][0]
+        self.assertEqual(sorted(plain['attendees']), sorted(contact.id for contact in self.contacts))
+
+        expanded = self.client.get('/api/appointments/', {'expand': 'attendees'}).data['results'][0]
+        self.assertEqual(expanded['attendees'][0], {
+            'id': self.contacts[0].id, 'name': 'Contact 0', 'email': 'c0@example.com',
+        })
+
+        detail = self.client.get(f"/api/appointments/{plain['id']}/", {'expand': 'attendees'}).data
+        self.assertEqual(len(detail['attendees']), 3)
+
+    def test_sparse_fields_skip_the_notes_and_the_attendees(self):
+        self.add_appointments(2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/appointments/', {'omit': 'notes,attendees', 'expand': 'attendees'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('attendees', response.data['results'][0])
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"appointments_appointment"."notes"', sql)
+        self.assertNotIn('contacts_contact', sql)
+
+        response = self.client.get('/api/appointments/', {'fields': 'title,attendees', 'expand': 'attendees'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'attendees'])
+        self.assertEqual(len(response.data['results'][0]['attendees']), 3)
+
+    def test_attendee_ids_are_checked_in_one_query(self):
+        ids = [contact.id for contact in self.contacts]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/appointments/', {'title': 'Review', 'attendees': ids}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum('"contacts_contact"."id" IN' in query['sql'] for query in queries), 1)
+
+        response = self.client.post('/api/appointments/', {'title': 'Review', 'attendees': [ids[0], 0]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['attendees'], ['Invalid pk "0" - object does not exist.'])
+        response = self.client.post('/api/appointments/', {'title': 'Review', 'attendees': ['abc']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_contacts_cannot_attend(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        foreign = Contact.objects.create(owner=other, name='Private', email='private@example.com')
+        appointment = Appointment.objects.create(owner=self.user, title='Review')
+        appointment.attendees.set(self.contacts[:1])
+        error = [f'Invalid pk "{foreign.id}" - object does not exist.']
+        # The async views only take JWTs
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+        for urlconf in ('mybackend.urls', 'mybackend.urls_async'):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                response = self.client.post('/api/appointments/?expand=attendees',
+                                            {'title': 'Review', 'attendees': [foreign.id]}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['attendees'], error)
+
+                response = self.client.patch(f'/api/appointments/{appointment.id}/?expand=attendees',
+                                             {'attendees': [self.contacts[0].id, foreign.id]}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['attendees'], error)
+        self.assertEqual(list(appointment.attendees.all()), self.contacts[:1])
+        self.assertFalse(Appointment.objects.filter(attendees=foreign).exists())
+
+
+class AppointmentConditionalRequestTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.contacts = [Contact.objects.create(owner=self.user, name=f'Contact {i}') for i in range(3)]
+
+    def test_etag_after_an_attendee_change(self):
+        for urlconf in ('mybackend.urls', 'mybackend.urls_async'):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                appointment = Appointment.objects.create(owner=self.user, title='Review')
+                appointment.attendees.set(self.contacts[:1])
+                url = f'/api/appointments/{appointment.id}/'
+
+                etag = self.client.get(url)['ETag']
+                response = self.client.patch(url, {'attendees': [contact.id for contact in self.contacts]},
+                                             format='json', HTTP_IF_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertEqual(self.client.get(url)['ETag'], response['ETag'])
+                self.assertEqual(response.json()['updated_at'], self.client.get(url).json()['updated_at'])
+
+                response = self.client.patch(url, {'title': 'Renamed'}, format='json',
+                                             HTTP_IF_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 200)
+
+    def test_expanded_attendees_follow_contact_changes(self):
+        appointment = Appointment.objects.create(owner=self.user, title='Review')
+        appointment.attendees.set(self.contacts[:1])
+        contact_url = f'/api/contacts/{self.contacts[0].id}/'
+        for urlconf in ('mybackend.urls', 'mybackend.urls_async'):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                for url in ('/api/appointments/', f'/api/appointments/{appointment.id}/'):
+                    first = self.client.get(url, {'expand': 'attendees'})
+                    plain = self.client.get(url)
+                    self.client.patch(contact_url, {'name': f'Renamed for {url}'}, format='json')
+
+                    response = self.client.get(url, {'expand': 'attendees'}, HTTP_IF_NONE_MATCH=first['ETag'])
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response.get('X-Cache'), 'HIT')
+                    self.assertIn(f'Renamed for {url}', response.content.decode())
+                    # Without the contacts inlined, the representation hasn't changed
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=plain['ETag'])
+                    self.assertEqual(response.status_code, 304)
+
+
+@override_settings(ROOT_URLCONF='mybackend.urls_async')
+class AsyncAppointmentViewTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.contacts = [
+            Contact.objects.create(owner=self.user, name=f'Contact {i}', email=f'c{i}@example.com')
+            for i in range(3)
+        ]
+
+    def test_attendees(self):
+        ids = [contact.id for contact in self.contacts]
+        response = self.client.post('/api/appointments/', {'title': 'Review', 'attendees': ids[:2]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['attendees'], ids[:2])
+
+        url = f"/api/appointments/{response.json()['id']}/"
+        response = self.client.patch(url + '?expand=attendees', {'attendees': ids[1:]}, format='json')
+        self.assertEqual([attendee['name'] for attendee in response.json()['attendees']], ['Contact 1', 'Contact 2'])
+
+        listed = self.client.get('/api/appointments/', {'expand': 'attendees'}).json()['results']
+        self.assertEqual(listed[0]['attendees'], response.json()['attendees'])
+        with override_settings(ROOT_URLCONF='mybackend.urls'):
+            caches['lists'].clear()
+            self.assertEqual(self.client.get('/api/appointments/', {'expand': 'attendees'}).json()['results'], listed)
+
+
+class AppointmentBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/appointments/'
+
+    def setUp(self):
+        caches['lists'].clear()
+
+    def owner_with_appointments(self, rows):
+        """ `rows` appointments, each attended by all of the owner's `rows` contacts. """
+        owner = self.create_owner()
+        contacts = Contact.objects.bulk_create(Contact(owner=owner, name=f'Guest {i}') for i in range(rows))
+        appointments = Appointment.objects.bulk_create(
+            Appointment(owner=owner, title=f'Meeting {i}', date='2024-05-06') for i in range(rows)
+        )
+        Appointment.attendees.through.objects.bulk_create(
+            Appointment.attendees.through(appointment=appointment, contact=contact)
+            for appointment in appointments for contact in contacts
+        )
+        return self.client_for(owner), appointments, contacts
+
+    def test_budgets(self):
+        def list_appointments(rows):
+            client, _, _ = self.owner_with_appointments(rows)
+            return lambda: client.get('/api/appointments/', {'expand': 'attendees'})
+
+        def create_appointment(rows):
+            client, _, contacts = self.owner_with_appointments(rows)
+            return lambda: client.post('/api/appointments/', {
+                'title': 'Review', 'attendees': [contact.id for contact in contacts],
+            }, format='json')
+
+        def detail(method, data=None):
+            def setup(rows):
+                client, appointments, contacts = self.owner_with_appointments(rows)
+                path = f'/api/appointments/{appointments[0].id}/'
+                if method == 'get':
+                    return lambda: client.get(path, {'expand': 'attendees'})
+                return lambda: getattr(client, method)(path, data and data(contacts), format='json')
+            return setup
+
+        self.check_budgets({
+            ('AppointmentListCreate', 'GET'): list_appointments,
+            ('AppointmentListCreate', 'POST'): create_appointment,
+            ('AppointmentRetrieveUpdateDestroy', 'GET'): detail('get'),
+            ('AppointmentRetrieveUpdateDestroy', 'PATCH'): detail(
+                'patch', lambda contacts: {'attendees': [contact.id for contact in contacts[1:]]}),
+            ('AppointmentRetrieveUpdateDestroy', 'DELETE'): detail('delete'),
+        })
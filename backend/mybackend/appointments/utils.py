@@ -1,6 +1,7 @@
-from django.core.mail import send_mail
 from django.conf import settings
 
+from outbox.utils import queue_mail
+
 def send_appointment_creation_email(user, appointment):
     # Format the date and time for the email
     date_str = appointment.date.strftime('%A, %B %d, %Y')
@@ -26,10 +27,9 @@ def send_appointment_creation_email(user, appointment):
     The PAs Assistant Team
     """
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=message,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[user.email],
-        fail_silently=False,
     )
\ No newline at end of file
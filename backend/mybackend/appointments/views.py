@@ -1,23 +1,84 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import generics, permissions
+from mybackend.asyncviews import AsyncListCreateView, AsyncRetrieveUpdateDestroyView
+from mybackend.conditional import ConditionalDetailMixin, ConditionalListMixin
+from mybackend.fieldsets import SparseFieldsetMixin
+from mybackend.filters import DateRangeFilter
+from mybackend.listcache import CachedListMixin
+from mybackend.replicas import ReplicaReadMixin
+from contacts.models import Contact
 from .models import Appointment
-from .serializers import AppointmentSerializer
+from .serializers import AppointmentSerializer, expanded_fields
 from .utils import send_appointment_creation_email
 
 
-class AppointmentListCreate(generics.ListCreateAPIView):
+def attendees_prefetch():
+    # One query loads the attendees of every appointment on the page; the
+    # columns cover both the id list and the ?expand=attendees summaries
+    return Prefetch('attendees', queryset=Contact.objects.only('id', 'name', 'email').order_by('name', 'id'))
+
+
+def with_attendees(queryset):
+    return queryset.prefetch_related(attendees_prefetch())
+
+
+class ExpandedAttendeesMixin:
+    """ ?expand=attendees inlines contacts, so their writes change the response too. """
+
+    def get_included_resources(self):
+        fields = self.get_sparse_fields()
+        if 'attendees' in expanded_fields(self.request) and (fields is None or 'attendees' in fields):
+            return ['contacts']
+        return []
+
+
+class AppointmentListCreate(ExpandedAttendeesMixin, ReplicaReadMixin, ConditionalListMixin, CachedListMixin,
+                            SparseFieldsetMixin, generics.ListCreateAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DateRangeFilter]
 
     def get_queryset(self):
-        return Appointment.objects.filter(owner=self.request.user).order_by('date', 'time')
+        return with_attendees(Appointment.objects.filter(owner=self.request.user).order_by('date', 'time'))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
     
 
-class AppointmentRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class AppointmentRetrieveUpdateDestroy(ExpandedAttendeesMixin, ReplicaReadMixin, ConditionalDetailMixin,
+                                       SparseFieldsetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Appointment.objects.filter(owner=self.request.user)
\ No newline at end of file
+        return with_attendees(Appointment.objects.filter(owner=self.request.user))
+
+
+# Served in place of the two views above under ASGI; see mybackend/asyncviews.py
+
+class AsyncAppointmentMixin(ExpandedAttendeesMixin):
+    # Validating the attendee ids and saving them take queries
+    serializer_uses_database = True
+
+    async def prefetch(self, rows):
+        fields = self.get_sparse_fields()
+        if fields is not None and 'attendees' not in fields:
+            return
+        # Django 4.2 can't prefetch_related() while iterating asynchronously
+        await sync_to_async(prefetch_related_objects)(rows, attendees_prefetch())
+
+
+class AsyncAppointmentListCreate(AsyncAppointmentMixin, AsyncListCreateView):
+    serializer_class = AppointmentSerializer
+    filter_backends = [DateRangeFilter]
+
+    def get_queryset(self):
+        return Appointment.objects.filter(owner=self.request.user).order_by('date', 'time')
+
+
+class AsyncAppointmentRetrieveUpdateDestroy(AsyncAppointmentMixin, AsyncRetrieveUpdateDestroyView):
+    serializer_class = AppointmentSerializer
+
+    def get_queryset(self):
+        return Appointment.objects.filter(owner=self.request.user)
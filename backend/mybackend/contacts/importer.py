@@ -0,0 +1,255 @@
+"""
+Streaming contact import from CSV and vCard files.
+
+Files are read a line at a time and handled in chunks: every row of a
+chunk is validated with the ContactSerializer rules, checked for
+duplicates with one query, and the new contacts are written with one
+bulk_create(). Memory use depends on the chunk size, not the file size.
+"""
+import csv
+import io
+import re
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from sync.tracking import TRACKED_MODELS, changed, track_batch
+from .models import Contact, PhoneDigits, normalize_email, normalize_phone
+from .serializers import ContactSerializer
+
+CHUNK_SIZE = 500
+# The counts cover every row, but only this many problem rows are listed
+MAX_REPORTED_ROWS = 1000
+
+# Column headers as other address books export them, lowercased
+CSV_HEADERS = {
+    'name': 'name',
+    'full name': 'name',
+    'display name': 'name',
+    'email': 'email',
+    'e-mail': 'email',
+    'email address': 'email',
+    'e-mail address': 'email',
+    'e-mail 1 - value': 'email',
+    'phone': 'phone',
+    'phone number': 'phone',
+    'mobile': 'phone',
+    'mobile phone': 'phone',
+    'primary phone': 'phone',
+    'phone 1 - value': 'phone',
+    'company': 'company',
+    'organization': 'company',
+    'organisation': 'company',
+    'organization 1 - name': 'company',
+    'title': 'title',
+    'job title': 'title',
+    'organization 1 - title': 'title',
+    'first name': 'first_name',
+    'given name': 'first_name',
+    'last name': 'last_name',
+    'family name': 'last_name',
+}
+
+
+def open_text(fileobj):
+    # utf-8-sig drops the byte order mark spreadsheet programs like to add
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def read_csv(fileobj):
+    """ Yield (line number, contact fields) for every row of a CSV file with a header row. """
+    reader = csv.reader(open_text(fileobj))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [CSV_HEADERS.get(name.strip().lower()) for name in header]
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        row = {}
+        for column, value in zip(columns, values):
+            if column and value.strip() and column not in row:
+                row[column] = value.strip()
+        first, last = row.pop('first_name', ''), row.pop('last_name', '')
+        if 'name' not in row and (first or last):
+            row['name'] = ' '.join(part for part in (first, last) if part)
+        yield reader.line_num, row
+
+
+VCARD_SEPARATOR = re.compile(r'(?<!\\);')
+
+
+def vcard_unescape(value):
+    return re.sub(r'\\([\\,;nN])', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def vcard_lines(text):
+    """ Unfold continuation lines: a line starting with a space or tab belongs to the one before. """
+    current = None
+    for line in text:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def read_vcard(fileobj):
+    """ Yield (card number, contact fields) for every card in a vCard (.vcf) file. """
+    number, card = 0, None
+    for line in vcard_lines(open_text(fileobj)):
+        name, _, value = line.partition(':')
+        # "item1.EMAIL;TYPE=work" -> "EMAIL"
+        name = name.split(';')[0].split('.')[-1].upper()
+        if name == 'BEGIN' and value.strip().upper() == 'VCARD':
+            number, card = number + 1, {}
+        elif name == 'END' and card is not None:
+            yield number, vcard_contact(card)
+            card = None
+        elif card is not None and value.strip():
+            # Only the first of each property is kept, e.g. the first email
+            card.setdefault(name, value.strip())
+
+
+def vcard_contact(card):
+    row = {}
+    if 'FN' in card:
+        row['name'] = vcard_unescape(card['FN'])
+    elif 'N' in card:
+        # N is family;given;additional;prefix;suffix
+        parts = [vcard_unescape(part) for part in VCARD_SEPARATOR.split(card['N'])]
+        row['name'] = ' '.join(part for part in parts[1:2] + parts[:1] if part)
+    if 'EMAIL' in card:
+        row['email'] = vcard_unescape(card['EMAIL'])
+    if 'TEL' in card:
+        row['phone'] = vcard_unescape(card['TEL'])
+    if 'ORG' in card:
+        row['company'] = vcard_unescape(VCARD_SEPARATOR.split(card['ORG'])[0])
+    if 'TITLE' in card:
+        row['title'] = vcard_unescape(card['TITLE'])
+    return {field: value.strip() for field, value in row.items() if value.strip()}
+
+
+READERS = {
+    'csv': read_csv,
+    'vcard': read_vcard,
+}
+
+
+def detect_format(filename, head):
+    """ 'csv' or 'vcard', from the file name or else from the first bytes of the file. """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('vcf', 'vcard'):
+        return 'vcard'
+    if head.lstrip(b'\xef\xbb\xbf \r\n\t').upper().startswith(b'BEGIN:VCARD'):
+        return 'vcard'
+    return 'csv'
+
+
+class ImportReport:
+    """ Counts for the whole import plus the rows that were skipped, and why. """
+
+    def __init__(self):
+        self.created = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.rows = []
+        self.truncated = False
+
+    def add_row(self, entry):
+        if len(self.rows) < MAX_REPORTED_ROWS:
+            self.rows.append(entry)
+        else:
+            self.truncated = True
+
+    def error(self, row, errors):
+        self.failed += 1
+        self.add_row({'row': row, 'status': 'error', 'errors': errors})
+
+    def duplicate(self, row, field):
+        self.duplicates += 1
+        self.add_row({'row': row, 'status': 'duplicate', 'matched': field})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'rows': self.rows,
+            'truncated': self.truncated,
+        }
+
+
+def existing_keys(owner, emails, phones):
+    """ Normalized emails and phone numbers the owner already has, out of the given ones. """
+    matches = Contact.objects.alias(email_key=Lower('email'), phone_key=PhoneDigits('phone')).filter(
+        # Spelled out per index so SQLite can use both
+        Q(owner=owner, email_key__in=emails) | Q(owner=owner, phone_key__in=phones)
+    )
+    found_emails, found_phones = set(), set()
+    for email, phone in matches.values_list('email', 'phone'):
+        found_emails.add(normalize_email(email))
+        found_phones.add(normalize_phone(phone))
+    return found_emails - {''}, found_phones - {''}
+
+
+def import_chunk(owner, chunk, serializer, report):
+    first_entry = len(report.rows)
+    valid = []
+    for row, data in chunk:
+        try:
+            valid.append((row, serializer.run_validation(data)))
+        except serializers.ValidationError as exc:
+            report.error(row, exc.detail)
+
+    emails = {normalize_email(attrs.get('email')) for _, attrs in valid} - {''}
+    phones = {normalize_phone(attrs.get('phone')) for _, attrs in valid} - {''}
+    seen_emails, seen_phones = existing_keys(owner, emails, phones) if valid else (set(), set())
+
+    contacts = []
+    for row, attrs in valid:
+        email, phone = normalize_email(attrs.get('email')), normalize_phone(attrs.get('phone'))
+        if email and email in seen_emails:
+            report.duplicate(row, 'email')
+        elif phone and phone in seen_phones:
+            report.duplicate(row, 'phone')
+        else:
+            # Later rows of the same file are checked against this one too
+            seen_emails.add(email)
+            seen_phones.add(phone)
+            contacts.append(Contact(owner=owner, **attrs))
+
+    if contacts:
+        with transaction.atomic(), track_batch():
+            Contact.objects.bulk_create(contacts)
+            # bulk_create() doesn't send post_save
+            changed(owner.pk, TRACKED_MODELS[Contact])
+        report.created += len(contacts)
+
+    # Errors were found before duplicates; list them in file order
+    report.rows[first_entry:] = sorted(report.rows[first_entry:], key=lambda entry: entry['row'])
+
+
+def import_contacts(owner, rows, chunk_size=CHUNK_SIZE):
+    """
+    Import (row number, fields) pairs for `owner`, skipping rows whose email
+    or phone number matches a contact they already have. Each chunk is
+    committed on its own, so later chunks see the contacts of earlier ones.
+    """
+    report = ImportReport()
+    serializer = ContactSerializer()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return report
+        import_chunk(owner, chunk, serializer, report)
@@ -0,0 +1,111 @@
+import random
+import statistics
+import string
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from contacts.models import Contact
+from contacts.search import search_contacts
+
+SYLLABLES = ['al', 'an', 'ber', 'ca', 'dor', 'el', 'fa', 'gre', 'ha', 'is', 'jo', 'ka', 'li', 'mar', 'ne',
+             'or', 'pe', 'qui', 'ro', 'sa', 'ten', 'ul', 'va', 'wen', 'xi', 'yo', 'zan', 'bri', 'cor', 'dan']
+TITLES = ['Engineer', 'Manager', 'Director', 'Designer', 'Analyst', 'Consultant', 'Founder', 'Recruiter',
+          'Accountant', 'Lawyer', 'Nurse', 'Teacher']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time contact searches for one user with a large address book. The data is "
+        "created inside a transaction that is rolled back, so the database is left as it was."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contacts', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--budget-ms', type=float, default=10.0,
+                            help="Fail if the p99 latency is above this many milliseconds.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Roughly the spread of a real address book: a few hundred first
+        # names, thousands of surnames, a couple of hundred employers
+        self.first_names = self.make_words(rng, 2, 400)
+        self.last_names = self.make_words(rng, 3, 5000)
+        self.companies = self.make_words(rng, 2, 200)
+        try:
+            with transaction.atomic():
+                timings = self.run(rng, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"{options['queries']} searches over {options['contacts']} contacts: "
+            f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {timings[-1]:.2f} ms"
+        )
+        if p99 > options['budget_ms']:
+            raise CommandError(f"p99 {p99:.2f} ms is over the {options['budget_ms']} ms budget")
+
+    def run(self, rng, options):
+        owner = User.objects.create(username='search-benchmark@example.com', email='search-benchmark@example.com')
+        # A second user's contacts must not slow the first one down
+        neighbour = User.objects.create(username='search-neighbour@example.com')
+
+        start = time.perf_counter()
+        for user, count in ((owner, options['contacts']), (neighbour, options['contacts'] // 2)):
+            batch = []
+            for i in range(count):
+                first, last = rng.choice(self.first_names), rng.choice(self.last_names)
+                batch.append(Contact(
+                    owner=user,
+                    name=f'{first} {last}',
+                    email=f'{first}.{last}{i}@example.com'.lower(),
+                    phone=f'+1 (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+                    company=rng.choice(self.companies),
+                    title=rng.choice(TITLES),
+                ))
+                if len(batch) == 5000:
+                    Contact.objects.bulk_create(batch)
+                    batch = []
+            Contact.objects.bulk_create(batch)
+        self.stdout.write(f"Loaded contacts in {time.perf_counter() - start:.1f} s")
+
+        words = self.first_names + self.last_names + self.companies + TITLES
+        queries = []
+        for _ in range(options['queries']):
+            word = rng.choice(words).lower()
+            kind = rng.random()
+            if kind < 0.4:
+                queries.append(word[:rng.randint(2, len(word))])
+            elif kind < 0.8:
+                queries.append(f'{word} {rng.choice(words).lower()[:3]}')
+            else:
+                queries.append(''.join(rng.choices(string.ascii_lowercase, k=3)))
+
+        search_contacts(owner.pk, 'warm up', options['limit'])
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search_contacts(owner.pk, query, options['limit'])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    @staticmethod
+    def make_words(rng, syllables, count):
+        words = set()
+        while len(words) < count:
+            words.add(''.join(rng.choices(SYLLABLES, k=syllables)).capitalize())
+        return sorted(words)
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from contacts.importer import CHUNK_SIZE, READERS, detect_format, import_contacts
+
+
+class Command(BaseCommand):
+    help = "Import contacts for a user from a CSV or vCard file, skipping ones they already have."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help="Username or email of the user to import for.")
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help="Guessed from the file when left out.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first() or \
+            User.objects.filter(email__iexact=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user {options['user']!r}.")
+
+        try:
+            fileobj = open(options['path'], 'rb')
+        except OSError as exc:
+            raise CommandError(exc)
+        with fileobj:
+            kind = options['format'] or detect_format(options['path'], fileobj.read(64))
+            fileobj.seek(0)
+            report = import_contacts(user, READERS[kind](fileobj), chunk_size=options['chunk_size'])
+
+        for entry in report.rows:
+            if entry['status'] == 'duplicate':
+                self.stdout.write(f"Row {entry['row']}: already have a contact with this {entry['matched']}")
+            else:
+                self.stdout.write(f"Row {entry['row']}: {entry['errors']}")
+        if report.truncated:
+            self.stdout.write("(more rows were skipped than are listed)")
+        self.stdout.write(
+            f"Created {report.created} contact(s), skipped {report.duplicates} duplicate(s) "
+            f"and {report.failed} invalid row(s)."
+        )
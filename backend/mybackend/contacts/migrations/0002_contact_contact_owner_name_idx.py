@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['owner', 'name', 'id'], name='contact_owner_name_idx'),
+        ),
+    ]
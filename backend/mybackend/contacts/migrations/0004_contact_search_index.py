@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# Phone numbers are also indexed with common punctuation stripped, so
+# "5551234567" finds "(555) 123-4567". 0007 adds the digits after a
+# country code, for "+1 (555) 123-4567".
+PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace(replace("
+    "coalesce({row}.phone, ''), ' ', ''), '-', ''), '(', ''), ')', ''), '+', ''), '.', '')"
+)
+COLUMNS = "rowid, owner, name, email, company, title, phone, phone_digits"
+
+
+def values(row):
+    return (
+        f"{row}.id, 'u' || {row}.owner_id, {row}.name, coalesce({row}.email, ''), "
+        f"coalesce({row}.company, ''), coalesce({row}.title, ''), coalesce({row}.phone, ''), "
+        + PHONE_DIGITS.format(row=row)
+    )
+
+
+FORWARD = [
+    "CREATE VIRTUAL TABLE contacts_contact_fts USING fts5("
+    "owner, name, email, company, title, phone, phone_digits, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"INSERT INTO contacts_contact_fts ({COLUMNS}) SELECT {values('c')} FROM contacts_contact c",
+    "CREATE TRIGGER contacts_contact_fts_insert AFTER INSERT ON contacts_contact BEGIN "
+    f"INSERT INTO contacts_contact_fts ({COLUMNS}) VALUES ({values('new')}); END",
+    "CREATE TRIGGER contacts_contact_fts_update AFTER UPDATE ON contacts_contact BEGIN "
+    "DELETE FROM contacts_contact_fts WHERE rowid = old.id; "
+    f"INSERT INTO contacts_contact_fts ({COLUMNS}) VALUES ({values('new')}); END",
+    "CREATE TRIGGER contacts_contact_fts_delete AFTER DELETE ON contacts_contact BEGIN "
+    "DELETE FROM contacts_contact_fts WHERE rowid = old.id; END",
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS contacts_contact_fts_insert",
+    "DROP TRIGGER IF EXISTS contacts_contact_fts_update",
+    "DROP TRIGGER IF EXISTS contacts_contact_fts_delete",
+    "DROP TABLE IF EXISTS contacts_contact_fts",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # PostgreSQL is indexed by 0006, see contacts/search.py
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_contact_updated_at_contact_contact_owner_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-18 11:37
+
+import contacts.models
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0004_contact_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(models.F('owner'), django.db.models.functions.text.Lower('email'), name='contact_owner_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(models.F('owner'), contacts.models.PhoneDigits('phone'), name='contact_owner_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# GIN indexes on tsvectors of the columns 0004 mirrors into FTS5 on SQLite:
+# the name, and everything. Punctuation splits words as it does in FTS5, so
+# "example" finds "ada@example.com". contacts/search.py's TSVECTORS must
+# match these.
+def words(text):
+    return f"to_tsvector('simple', regexp_replace({text}, '[^[:alnum:]]+', ' ', 'g'))"
+
+
+VECTORS = {
+    'contacts_contact_search_name_idx': words("coalesce(name, '')"),
+    'contacts_contact_search_idx': words(
+        "coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || "
+        "coalesce(title, '') || ' ' || coalesce(phone, '') || ' ' || "
+        "regexp_replace(coalesce(phone, ''), '[^0-9]+', '', 'g')"
+    ),
+}
+
+FORWARD = [f"CREATE INDEX {name} ON contacts_contact USING gin (({vector}))" for name, vector in VECTORS.items()]
+
+BACKWARD = [f"DROP INDEX IF EXISTS {name}" for name in VECTORS]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # SQLite searches its FTS5 table from 0004 instead
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0005_contact_dedupe_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
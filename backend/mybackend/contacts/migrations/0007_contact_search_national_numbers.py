@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# Numbers saved with a country code ("+1 (555) 123-4567") are also indexed
+# without its one, two or three digits ("5551234567"), since searches match
+# prefixes and the country code would otherwise always come first.
+# contacts/search.py's TSVECTORS must match the PostgreSQL index below.
+
+
+def national_digits(phone, digits):
+    return (
+        f"CASE WHEN substr(ltrim(coalesce({phone}, '')), 1, 1) = '+' "
+        f"THEN ' ' || substr({digits}, 2) || ' ' || substr({digits}, 3) || ' ' || substr({digits}, 4) "
+        "ELSE '' END"
+    )
+
+
+# SQLite: the FTS5 table and triggers from 0004, with the suffixes in phone_digits
+PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace(replace("
+    "coalesce({row}.phone, ''), ' ', ''), '-', ''), '(', ''), ')', ''), '+', ''), '.', '')"
+)
+COLUMNS = "rowid, owner, name, email, company, title, phone, phone_digits"
+
+
+def values(row, national):
+    digits = PHONE_DIGITS.format(row=row)
+    if national:
+        digits += ' || ' + national_digits(f'{row}.phone', digits)
+    return (
+        f"{row}.id, 'u' || {row}.owner_id, {row}.name, coalesce({row}.email, ''), "
+        f"coalesce({row}.company, ''), coalesce({row}.title, ''), coalesce({row}.phone, ''), " + digits
+    )
+
+
+def sqlite_statements(national):
+    return [
+        "DROP TRIGGER IF EXISTS contacts_contact_fts_insert",
+        "DROP TRIGGER IF EXISTS contacts_contact_fts_update",
+        "DELETE FROM contacts_contact_fts",
+        f"INSERT INTO contacts_contact_fts ({COLUMNS}) SELECT {values('c', national)} FROM contacts_contact c",
+        "CREATE TRIGGER contacts_contact_fts_insert AFTER INSERT ON contacts_contact BEGIN "
+        f"INSERT INTO contacts_contact_fts ({COLUMNS}) VALUES ({values('new', national)}); END",
+        "CREATE TRIGGER contacts_contact_fts_update AFTER UPDATE ON contacts_contact BEGIN "
+        "DELETE FROM contacts_contact_fts WHERE rowid = old.id; "
+        f"INSERT INTO contacts_contact_fts ({COLUMNS}) VALUES ({values('new', national)}); END",
+    ]
+
+
+# PostgreSQL: the everything index from 0006, with the suffixes after the digits
+def words(text):
+    return f"to_tsvector('simple', regexp_replace({text}, '[^[:alnum:]]+', ' ', 'g'))"
+
+
+def search_vector(national):
+    digits = "regexp_replace(coalesce(phone, ''), '[^0-9]+', '', 'g')"
+    if national:
+        digits += ' || ' + national_digits('phone', digits)
+    return words(
+        "coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || "
+        "coalesce(title, '') || ' ' || coalesce(phone, '') || ' ' || " + digits
+    )
+
+
+def postgresql_statements(national):
+    return [
+        "DROP INDEX IF EXISTS contacts_contact_search_idx",
+        f"CREATE INDEX contacts_contact_search_idx ON contacts_contact USING gin (({search_vector(national)}))",
+    ]
+
+
+def run(national):
+    def apply(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite_statements,
+            'postgresql': postgresql_statements,
+        }.get(schema_editor.connection.vendor)
+        # Other backends have no contact search, see contacts/search.py
+        for statement in statements(national) if statements else []:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0006_contact_search_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(national=True), run(national=False)),
+    ]
@@ -1,6 +1,34 @@
+from functools import reduce
+
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User # Or your custom user model
 
+# Characters people put in phone numbers that don't change the number.
+# PhoneDigits and normalize_phone() have to strip exactly the same set.
+PHONE_PUNCTUATION = ' -().+'
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+def normalize_phone(value):
+    value = value or ''
+    for char in PHONE_PUNCTUATION:
+        value = value.replace(char, '')
+    return value
+
+
+class PhoneDigits(models.Func):
+    """ normalize_phone() in SQL, e.g. "+1 (555) 123-4567" -> "15551234567" """
+    arity = 1
+    output_field = models.CharField()
+    # The characters are spelled out rather than passed as parameters so the
+    # SQL is the same in the index and in queries, which lets it be used
+    template = reduce(lambda sql, char: "REPLACE(%s, '%s', '')" % (sql, char), PHONE_PUNCTUATION, '%(expressions)s')
+
+
 class Contact(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="contacts")
     name = models.CharField(max_length=200)
@@ -10,6 +38,18 @@ class Contact(models.Model):
     title = models.CharField(max_length=200, blank=True, null=True)
     # Add other fields like address, notes if needed
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves ContactListCreate: owner filter + alphabetical, id as tie-breaker
+            models.Index(fields=["owner", "name", "id"], name="contact_owner_name_idx"),
+            # Serves the delta sync: what changed for this owner since a point in time
+            models.Index(fields=["owner", "updated_at"], name="contact_owner_updated_idx"),
+            # Serve the duplicate checks of the contact import
+            models.Index(models.F("owner"), Lower("email"), name="contact_owner_email_idx"),
+            models.Index(models.F("owner"), PhoneDigits("phone"), name="contact_owner_phone_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} (Owner: {self.owner.username})"
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Full-text search over a user's contacts.
+
+On SQLite the contacts are mirrored into an FTS5 table (see migration
+0004_contact_search_index) that triggers keep in step with every INSERT,
+UPDATE and DELETE, bulk ones included. The owner is indexed as a token, so
+a search only ever walks that user's postings. On PostgreSQL the same
+columns are indexed as tsvectors with GIN, and searched with prefix
+tsqueries next to the owner filter. Other backends have no index to search
+with, and raise NotSupportedError rather than scan every contact.
+
+Results are ranked by where they matched rather than with bm25(), which
+has to score every matching row and gets slow once a short prefix matches
+thousands of contacts. Contacts whose name matches come first, then
+matches on any other field; each tier is read straight off the index in
+rowid order and capped at RANK_WINDOW rows, so the cost of a query is
+bounded no matter how many contacts it matches.
+"""
+import re
+
+from django.db import NotSupportedError, connection
+
+from .models import Contact
+
+FTS_TABLE = 'contacts_contact_fts'
+
+# Column filters for each ranking tier, best first
+TIERS = ['name', 'name email company title phone phone_digits']
+RANK_WINDOW = 1000
+# Prefixes shorter than this aren't in the FTS prefix index
+MIN_TERM_LENGTH = 2
+
+# The expressions of the GIN indexes in migrations 0006 and 0007, in tier order
+TSVECTORS = [
+    "to_tsvector('simple', regexp_replace(coalesce(name, ''), '[^[:alnum:]]+', ' ', 'g'))",
+    "to_tsvector('simple', regexp_replace(coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || "
+    "coalesce(company, '') || ' ' || coalesce(title, '') || ' ' || coalesce(phone, '') || ' ' || "
+    "regexp_replace(coalesce(phone, ''), '[^0-9]+', '', 'g') || "
+    "CASE WHEN substr(ltrim(coalesce(phone, '')), 1, 1) = '+' "
+    "THEN ' ' || substr(regexp_replace(coalesce(phone, ''), '[^0-9]+', '', 'g'), 2) || "
+    "' ' || substr(regexp_replace(coalesce(phone, ''), '[^0-9]+', '', 'g'), 3) || "
+    "' ' || substr(regexp_replace(coalesce(phone, ''), '[^0-9]+', '', 'g'), 4) "
+    "ELSE '' END, '[^[:alnum:]]+', ' ', 'g'))",
+]
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    terms = [term for term in TOKEN_RE.findall(query.lower()) if len(term) >= MIN_TERM_LENGTH]
+    return terms[:8]
+
+
+def fts_query(owner_id, columns, terms):
+    # Every term is quoted, so user input can't inject FTS5 operators
+    prefixes = ' AND '.join('"%s"*' % term.replace('"', '""') for term in terms)
+    return 'owner : "u%d" AND {%s} : (%s)' % (owner_id, columns, prefixes)
+
+
+def ts_query(terms):
+    # Quoted the same way, for to_tsquery()
+    return ' & '.join("'%s':*" % term.replace("'", "''") for term in terms)
+
+
+def tier_queries(owner_id, terms, window):
+    """ (sql, params) for each ranking tier's first `window` matches, in id order. """
+    if connection.vendor == 'sqlite':
+        return [
+            ('SELECT rowid AS id, %d AS tier FROM %s WHERE %s MATCH %%s LIMIT %d' % (tier, FTS_TABLE, FTS_TABLE, window),
+             [fts_query(owner_id, columns, terms)])
+            for tier, columns in enumerate(TIERS)
+        ]
+    if connection.vendor == 'postgresql':
+        return [
+            ("SELECT id, %d AS tier FROM contacts_contact WHERE owner_id = %%s AND %s @@ to_tsquery('simple', %%s) "
+             "ORDER BY id LIMIT %d" % (tier, vector, window),
+             [owner_id, ts_query(terms)])
+            for tier, vector in enumerate(TSVECTORS)
+        ]
+    raise NotSupportedError('Contact search needs SQLite or PostgreSQL, not %s.' % connection.display_name)
+
+
+def search_contact_ids(owner_id, query, limit, offset=0):
+    """ Ids of the owner's contacts matching every word of `query` as a prefix, best first. """
+    terms = tokenize(query)
+    if not terms:
+        return []
+
+    queries = tier_queries(owner_id, terms, max(RANK_WINDOW, offset + limit))
+    tiers = ' UNION ALL '.join('SELECT * FROM (%s) AS tier_%d' % (sql, tier) for tier, (sql, _) in enumerate(queries))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT id FROM (%s) AS tiers GROUP BY id ORDER BY min(tier), id LIMIT %%s OFFSET %%s' % tiers,
+            [param for _, params in queries for param in params] + [limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_contacts(owner_id, query, limit, offset=0):
+    """ Same as search_contact_ids(), but returns the Contact rows in rank order. """
+    ids = search_contact_ids(owner_id, query, limit, offset)
+    contacts = Contact.objects.filter(owner_id=owner_id).in_bulk(ids)
+    return [contacts[pk] for pk in ids if pk in contacts]
@@ -1,8 +1,12 @@
 from rest_framework import serializers
+from mybackend.bulk import BulkListSerializer
+from mybackend.fieldsets import SparseFieldsetSerializerMixin
+from mybackend.timing import TimedSerializerMixin
 from .models import Contact
 
-class ContactSerializer(serializers.ModelSerializer):
+class ContactSerializer(TimedSerializerMixin, SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Contact
-        fields = ['id', 'name', 'email', 'phone', 'company', 'title', 'created_at']
-        read_only_fields = ['id', 'created_at'] # Owner is set in the view
\ No newline at end of file
+        fields = ['id', 'name', 'email', 'phone', 'company', 'title', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at'] # Owner is set in the view
+        list_serializer_class = BulkListSerializer
\ No newline at end of file
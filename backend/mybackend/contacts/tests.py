@@ -1,3 +1,302 @@
+import io
+import tempfile
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from mybackend.budgets import BudgetTestMixin
+from mybackend.queryplans import QueryPlanTestMixin
+from .importer import import_contacts, read_csv, read_vcard
+from .models import Contact
+from .views import ContactListCreate
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class ContactListCreateQueryPlanTests(QueryPlanTestMixin, TestCase):
+    """ The list query has to be served by the owner index, not by sorting. """
+    view_class = ContactListCreate
+    url = '/api/contacts/'
+
+    def setUp(self):
+        # Ids are reused between tests, so cached lists could leak across them
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        for i in range(3):
+            Contact.objects.create(owner=self.user, name=f'Contact {i}')
+
+    def test_pages_use_owner_index(self):
+        self.check_list_plans('contact_owner_name_idx')
+
+
+class ContactBulkTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_update_and_delete_in_one_batch(self):
+        fix = Contact.objects.create(owner=self.user, name='Fix me', email='old@example.com')
+        drop = Contact.objects.create(owner=self.user, name='Drop me')
+
+        response = self.client.post('/api/contacts/bulk/', {
+            'create': [{'name': 'Grace', 'email': 'grace@example.com'}],
+            'update': [{'id': fix.id, 'email': 'new@example.com'}],
+            'delete': [drop.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['create'][0]['name'], 'Grace')
+        self.assertEqual(Contact.objects.get(pk=fix.pk).email, 'new@example.com')
+        self.assertFalse(Contact.objects.filter(pk=drop.pk).exists())
+
+    def test_invalid_email_is_reported_per_item(self):
+        fix = Contact.objects.create(owner=self.user, name='Fix me')
+
+        response = self.client.post('/api/contacts/bulk/', {
+            'update': [{'id': fix.id, 'email': 'not-an-email'}, {'id': 'abc'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data['update'][0])
+        self.assertEqual(response.data['update'][1], {'id': ['A valid integer is required.']})
+
+
+class ContactSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ada = Contact.objects.create(owner=self.user, name='Ada Lovelace', email='ada@analytical.org',
+                                          phone='+44 (20) 7946-0018', company='Analytical Engines')
+        self.alan = Contact.objects.create(owner=self.user, name='Alan Turing', company='Bletchley Park',
+                                           title='Cryptanalyst')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        Contact.objects.create(owner=other, name='Ada Someone Else')
+
+    def search(self, query, **params):
+        response = self.client.get('/api/contacts/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, query):
+        return [contact['id'] for contact in self.search(query)['results']]
+
+    def test_prefix_matching_across_fields(self):
+        self.assertEqual(self.ids('ad'), [self.ada.id])
+        self.assertEqual(self.ids('lovel'), [self.ada.id])
+        self.assertEqual(self.ids('analytical.org'), [self.ada.id])
+        self.assertEqual(self.ids('crypt'), [self.alan.id])
+        self.assertEqual(self.ids('bletchley pa'), [self.alan.id])
+        self.assertEqual(self.ids('nobody'), [])
+
+    def test_name_matches_rank_first(self):
+        # Alan only works at a "park", so the person called Parker comes first
+        parker = Contact.objects.create(owner=self.user, name='Dorothy Parker')
+        self.assertEqual(self.ids('park'), [parker.id, self.alan.id])
+
+    def test_phone_digits(self):
+        self.assertEqual(self.ids('44207946'), [self.ada.id])
+
+    def test_phone_digits_without_the_country_code(self):
+        us = Contact.objects.create(owner=self.user, name='Grace Hopper', phone='+1 (555) 123-4567')
+        local = Contact.objects.create(owner=self.user, name='Local Number', phone='555.123.4567')
+        self.assertEqual(self.ids('5551234567'), [us.id, local.id])
+        self.assertEqual(self.ids('15551234567'), [us.id])
+        self.assertEqual(self.ids('2079460018'), [self.ada.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.alan.name = 'Alan M. Turing'
+        self.alan.save()
+        self.assertEqual(self.ids('alan m'), [self.alan.id])
+
+        self.client.post('/api/contacts/bulk/', {'update': [{'id': self.ada.id, 'name': 'Augusta King'}]},
+                         format='json')
+        self.assertEqual(self.ids('augusta'), [self.ada.id])
+
+        self.ada.delete()
+        self.assertEqual(self.ids('augusta'), [])
+
+    def test_operators_are_not_interpreted(self):
+        self.assertEqual(self.ids('ada OR NOT "x'), [])
+        self.assertEqual(self.ids('"ada"'), [self.ada.id])
+
+    def test_pagination(self):
+        Contact.objects.create(owner=self.user, name='Ada Byron')
+        page = self.search('ada', limit=1)
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNone(page['previous'])
+        self.assertIn('offset=1', page['next'])
+
+        page = self.client.get(page['next']).data
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNone(page['next'])
+        self.assertNotIn('offset', page['previous'])
+
+
+CSV_FILE = (
+    '﻿First Name,Last Name,E-mail Address,Mobile Phone,Organization,Notes\r\n'
+    'Ada,Lovelace,ADA@example.com,,Analytical Engines,first\r\n'
+    'Alan,Turing,alan@example.com,+44 (20) 7946-0000,,"multi\r\nline"\r\n'
+    ',,,,,\r\n'
+    'Grace,Hopper,not-an-email,,,\r\n'
+    'Alan,Again,,442079460000,,\r\n'
+)
+
+VCARD_FILE = (
+    'BEGIN:VCARD\r\n'
+    'VERSION:3.0\r\n'
+    'N:Lovelace;Ada;;;\r\n'
+    'item1.EMAIL;TYPE=INTERNET:ada@example.com\r\n'
+    'ORG:Analytical Engines;Research\r\n'
+    'END:VCARD\r\n'
+    'BEGIN:VCARD\r\n'
+    'VERSION:3.0\r\n'
+    'FN:Hopper\\, Grace\r\n'
+    'TEL;TYPE=CELL:+1 555 0100\r\n'
+    'TITLE:Rear Admiral and computer scientist who worked on the first comp\r\n'
+    ' iler\r\n'
+    'END:VCARD\r\n'
+)
+
+
+class ContactImportTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content):
+        response = self.client.post('/api/contacts/import/', {'file': SimpleUploadedFile(name, content.encode())},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_csv_rows(self):
+        rows = list(read_csv(io.BytesIO(CSV_FILE.encode())))
+        self.assertEqual(rows[0], (2, {'name': 'Ada Lovelace', 'email': 'ADA@example.com',
+                                       'company': 'Analytical Engines'}))
+        self.assertEqual(rows[1], (4, {'name': 'Alan Turing', 'email': 'alan@example.com',
+                                       'phone': '+44 (20) 7946-0000'}))
+        self.assertEqual(len(rows), 4)
+
+    def test_vcard_rows(self):
+        rows = list(read_vcard(io.BytesIO(VCARD_FILE.encode())))
+        self.assertEqual(rows, [
+            (1, {'name': 'Ada Lovelace', 'email': 'ada@example.com', 'company': 'Analytical Engines'}),
+            (2, {'name': 'Hopper, Grace', 'phone': '+1 555 0100',
+                 'title': 'Rear Admiral and computer scientist who worked on the first compiler'}),
+        ])
+
+    def test_import_validates_and_dedupes(self):
+        Contact.objects.create(owner=self.user, name='Ada', email='ada@EXAMPLE.com')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        Contact.objects.create(owner=other, name='Alan', email='alan@example.com')
+
+        report = self.upload('google.csv', CSV_FILE)
+
+        self.assertEqual((report['created'], report['duplicates'], report['failed']), (1, 2, 1))
+        self.assertEqual(report['rows'], [
+            {'row': 2, 'status': 'duplicate', 'matched': 'email'},
+            {'row': 6, 'status': 'error', 'errors': {'email': ['Enter a valid email address.']}},
+            {'row': 7, 'status': 'duplicate', 'matched': 'phone'},
+        ])
+        self.assertEqual(sorted(Contact.objects.filter(owner=self.user).values_list('name', flat=True)),
+                         ['Ada', 'Alan Turing'])
+        # The list cache and ETags see the new contact
+        self.assertEqual(len(self.client.get('/api/contacts/').data['results']), 2)
+
+    def test_vcard_upload_is_detected_without_an_extension(self):
+        report = self.upload('contacts', VCARD_FILE)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(self.client.get('/api/contacts/search/', {'q': 'compiler'}).data['results'][0]['name'],
+                         'Hopper, Grace')
+
+    def test_one_duplicate_lookup_per_chunk(self):
+        rows = [(i, {'name': f'Person {i}', 'email': f'person{i}@example.com'}) for i in range(10)]
+        with CaptureQueriesContext(connection) as queries:
+            report = import_contacts(self.user, rows, chunk_size=4)
+        lookups = [q for q in queries if q['sql'].startswith('SELECT') and 'contacts_contact' in q['sql']]
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "contacts_contact"')]
+        self.assertEqual(report.created, 10)
+        self.assertEqual(len(lookups), 3)
+        self.assertEqual(len(inserts), 3)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.vcf', encoding='utf-8') as vcf:
+            vcf.write(VCARD_FILE)
+            vcf.flush()
+            out = io.StringIO()
+            call_command('import_contacts', 'owner', vcf.name, stdout=out)
+            call_command('import_contacts', 'owner@example.com', vcf.name, stdout=out)
+        self.assertIn('Created 2 contact(s)', out.getvalue())
+        self.assertIn('skipped 2 duplicate(s)', out.getvalue())
+        self.assertEqual(Contact.objects.filter(owner=self.user).count(), 2)
+
+
+class ContactBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/contacts/'
+
+    def setUp(self):
+        caches['lists'].clear()
+
+    def owner_with_contacts(self, rows):
+        owner = self.create_owner()
+        contacts = Contact.objects.bulk_create(
+            Contact(owner=owner, name=f'Ada {i}', email=f'ada.{i}@example.com', company='Analytical Engines')
+            for i in range(rows)
+        )
+        return self.client_for(owner), contacts
+
+    def test_budgets(self):
+        def get(path):
+            def setup(rows):
+                client, _ = self.owner_with_contacts(rows)
+                return lambda: client.get(path)
+            return setup
+
+        def create_contact(rows):
+            client, _ = self.owner_with_contacts(rows)
+            return lambda: client.post('/api/contacts/', {'name': 'Grace'}, format='json')
+
+        def bulk(rows):
+            client, contacts = self.owner_with_contacts(2 * rows)
+            return lambda: client.post('/api/contacts/bulk/', {
+                'create': [{'name': f'Grace {i}'} for i in range(rows)],
+                'update': [{'id': contact.id, 'company': 'Navy'} for contact in contacts[:rows]],
+                'delete': [contact.id for contact in contacts[rows:]],
+            }, format='json')
+
+        def import_csv(rows):
+            client, _ = self.owner_with_contacts(0)
+            content = 'Name,Email\n' + ''.join(f'Grace {i},grace.{i}@example.com\n' for i in range(rows))
+            return lambda: client.post('/api/contacts/import/', {
+                'file': SimpleUploadedFile('contacts.csv', content.encode()),
+            }, format='multipart')
+
+        def detail(method, data=None):
+            def setup(rows):
+                client, contacts = self.owner_with_contacts(rows)
+                return lambda: getattr(client, method)(f'/api/contacts/{contacts[0].id}/', data, format='json')
+            return setup
 
-# Create your tests here.
+        self.check_budgets({
+            ('ContactListCreate', 'GET'): get('/api/contacts/'),
+            ('ContactListCreate', 'POST'): create_contact,
+            ('ContactBulk', 'POST'): bulk,
+            ('ContactSearch', 'GET'): get('/api/contacts/search/?q=ada'),
+            ('ContactImport', 'POST'): import_csv,
+            ('ContactRetrieveUpdateDestroy', 'GET'): detail('get'),
+            ('ContactRetrieveUpdateDestroy', 'PATCH'): detail('patch', {'company': 'Navy'}),
+            ('ContactRetrieveUpdateDestroy', 'DELETE'): detail('delete'),
+        })
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import ContactListCreate, ContactRetrieveUpdateDestroy
+from .views import ContactListCreate, ContactRetrieveUpdateDestroy, ContactBulk, ContactSearch, ContactImport
 
 urlpatterns = [
     path('', ContactListCreate.as_view(), name='contact-list-create'),
+    path('bulk/', ContactBulk.as_view(), name='contact-bulk'),
+    path('search/', ContactSearch.as_view(), name='contact-search'),
+    path('import/', ContactImport.as_view(), name='contact-import'),
     path('<int:pk>/', ContactRetrieveUpdateDestroy.as_view(), name='contact-detail'),
 ]
\ No newline at end of file
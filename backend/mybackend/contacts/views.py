@@ -1,8 +1,20 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from mybackend.conditional import ConditionalDetailMixin, ConditionalListMixin
+from mybackend.listcache import CachedListMixin
+from mybackend.replicas import ReplicaReadMixin
+from mybackend.asyncviews import AsyncListCreateView, AsyncRetrieveUpdateDestroyView
+from mybackend.bulk import BulkOperationsView
+from mybackend.fieldsets import SparseFieldsetMixin
+from .importer import READERS, detect_format, import_contacts
 from .models import Contact
+from .search import search_contacts
 from .serializers import ContactSerializer
 
-class ContactListCreate(generics.ListCreateAPIView):
+class ContactListCreate(ReplicaReadMixin, ConditionalListMixin, CachedListMixin, SparseFieldsetMixin,
+                        generics.ListCreateAPIView):
     """ List all contacts for the logged-in user or create a new one. """
     serializer_class = ContactSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -15,11 +27,93 @@ class ContactListCreate(generics.ListCreateAPIView):
         # Assign owner automatically
         serializer.save(owner=self.request.user)
 
-class ContactRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class ContactRetrieveUpdateDestroy(ReplicaReadMixin, ConditionalDetailMixin, SparseFieldsetMixin,
+                                   generics.RetrieveUpdateDestroyAPIView):
     """ Retrieve, update or delete a specific contact instance. """
     serializer_class = ContactSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Ensure user can only access their own contacts
-        return Contact.objects.filter(owner=self.request.user)
\ No newline at end of file
+        return Contact.objects.filter(owner=self.request.user)
+
+class AsyncContactListCreate(AsyncListCreateView):
+    """ ContactListCreate for ASGI; see mybackend/asyncviews.py. """
+    serializer_class = ContactSerializer
+
+    def get_queryset(self):
+        return Contact.objects.filter(owner=self.request.user).order_by('name')
+
+class AsyncContactRetrieveUpdateDestroy(AsyncRetrieveUpdateDestroyView):
+    """ ContactRetrieveUpdateDestroy for ASGI. """
+    serializer_class = ContactSerializer
+
+    def get_queryset(self):
+        return Contact.objects.filter(owner=self.request.user)
+
+class ContactBulk(BulkOperationsView):
+    """ Create, patch and delete many contacts in one request. """
+    serializer_class = ContactSerializer
+
+    def get_queryset(self):
+        return Contact.objects.filter(owner=self.request.user)
+
+
+class ContactSearch(generics.GenericAPIView):
+    """ Ranked full-text search over the user's contacts: ?q=<words>&limit=&offset= """
+    serializer_class = ContactSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+    # Ranked results can't be paged with a keyset, so keep offsets shallow
+    max_offset = 1000
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        limit = self.get_int_param('limit', self.default_limit, 1, self.max_limit)
+        offset = self.get_int_param('offset', 0, 0, self.max_offset)
+
+        contacts = search_contacts(request.user.pk, query, limit + 1, offset) if query else []
+        has_next = len(contacts) > limit and offset + limit <= self.max_offset
+
+        url = request.build_absolute_uri()
+        next_link = replace_query_param(url, 'offset', offset + limit) if has_next else None
+        previous_link = None
+        if offset > 0:
+            previous_offset = max(offset - limit, 0)
+            previous_link = (replace_query_param(url, 'offset', previous_offset) if previous_offset
+                             else remove_query_param(url, 'offset'))
+
+        return Response({
+            'next': next_link,
+            'previous': previous_link,
+            'results': self.get_serializer(contacts[:limit], many=True).data,
+        })
+
+    def get_int_param(self, name, default, minimum, maximum):
+        try:
+            value = int(self.request.query_params[name])
+        except (KeyError, ValueError):
+            return default
+        return min(max(value, minimum), maximum)
+
+
+class ContactImport(generics.GenericAPIView):
+    """
+    Import contacts from an uploaded CSV or vCard file (multipart, field
+    `file`). Rows matching an existing contact's email or phone number are
+    skipped; the response counts what happened and lists the skipped rows.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Larger uploads are spooled to disk by Django, and read back a line at a time
+        kind = detect_format(upload.name or '', upload.read(64))
+        upload.seek(0)
+        report = import_contacts(request.user, READERS[kind](upload))
+        return Response(report.as_dict())
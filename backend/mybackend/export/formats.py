@@ -0,0 +1,146 @@
+"""
+Line writers for the export formats. Each one takes an iterable of records
+and yields text, so a whole export never has to be held in memory.
+"""
+import csv
+import json
+import re
+from datetime import datetime, timezone
+
+from rest_framework.utils.encoders import JSONEncoder
+
+# Lines are joined into chunks of about this size before they are sent
+CHUNK_BYTES = 64 * 1024
+
+
+def buffered(lines, size=CHUNK_BYTES):
+    """ Join small lines into larger chunks; a write per row is slow to serve. """
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """ A file-like object for csv.writer that hands each row straight back. """
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets run cells that start with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return '; '.join(csv_text(item) for item in value)
+    if isinstance(value, dict):
+        # Attendee summaries: "Name <email>"
+        return '%s <%s>' % (value['name'], value['email']) if value.get('email') else value['name']
+    return value
+
+
+def csv_value(value):
+    value = csv_text(value)
+    # The export is opened in Excel: a leading quote keeps a name like
+    # "=HYPERLINK(...)" as text
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(fields, records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for record in records:
+        yield writer.writerow([csv_value(record.get(field)) for field in fields])
+
+
+# iCalendar (RFC 5545)
+
+# UIDs have to stay the same between exports so calendars can re-import them
+UID_DOMAIN = 'pa-assistant'
+
+
+def ics_text(value):
+    # A bare CR is a line break to lenient parsers too
+    value = value.replace('\r\n', '\n').replace('\r', '\n')
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+# Parameter values can't hold quotes or control characters, nor escape them
+PARAM_UNSAFE_RE = re.compile(r'["\x00-\x1f\x7f]')
+
+
+def ics_param(value):
+    return PARAM_UNSAFE_RE.sub(lambda match: "'" if match.group() == '"' else ' ', value)
+
+
+def ics_fold(line):
+    # Content lines are limited to 75 octets; longer ones continue on the
+    # next line after a single leading space
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_utc(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_event_lines(appointment):
+    yield 'BEGIN:VEVENT'
+    yield 'UID:appointment-%d@%s' % (appointment.id, UID_DOMAIN)
+    yield 'DTSTAMP:' + ics_utc(appointment.updated_at)
+    yield 'CREATED:' + ics_utc(appointment.created_at)
+    yield 'LAST-MODIFIED:' + ics_utc(appointment.updated_at)
+    if appointment.time is None:
+        yield 'DTSTART;VALUE=DATE:' + appointment.date.strftime('%Y%m%d')
+    else:
+        # Appointments are stored as wall-clock times, so they stay "floating"
+        yield 'DTSTART:' + datetime.combine(appointment.date, appointment.time).strftime('%Y%m%dT%H%M%S')
+    yield 'SUMMARY:' + ics_text(appointment.title)
+    if appointment.location:
+        yield 'LOCATION:' + ics_text(appointment.location)
+    if appointment.notes:
+        yield 'DESCRIPTION:' + ics_text(appointment.notes)
+    for contact in appointment.attendees.all():
+        if contact.email:
+            yield 'ATTENDEE;CN="%s":mailto:%s' % (ics_param(contact.name), contact.email)
+    yield 'END:VEVENT'
+
+
+def ics_lines(appointments):
+    """ A VCALENDAR with one VEVENT per dated appointment. """
+    yield 'BEGIN:VCALENDAR\r\n'
+    yield 'VERSION:2.0\r\n'
+    yield 'PRODID:-//PA Assistant//Export//EN\r\n'
+    yield 'CALSCALE:GREGORIAN\r\n'
+    for appointment in appointments:
+        if appointment.date is None:
+            continue
+        for line in ics_event_lines(appointment):
+            yield ics_fold(line)
+    yield 'END:VCALENDAR\r\n'
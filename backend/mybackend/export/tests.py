@@ -0,0 +1,160 @@
+import csv
+import gzip
+import io
+import json
+import warnings
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from mybackend.budgets import BudgetTestMixin
+from tasks.models import Task
+from .formats import ics_fold
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(owner=self.user, description='Write report', date='2024-05-06')
+        self.ada = Contact.objects.create(owner=self.user, name='Ada Lovelace', email='ada@example.com',
+                                          phone='+44 20 7946 0018')
+        self.appointment = Appointment.objects.create(
+            owner=self.user, title='Review, part 1', date='2024-05-07', time='09:30',
+            location='Room 4', notes='Bring the\nslides',
+        )
+        self.appointment.attendees.add(self.ada)
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        Task.objects.create(owner=other, description='Not mine')
+
+    def download(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_full_export_as_json_lines(self):
+        response, body = self.download('/api/export/')
+
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(record['type'], record['id']) for record in records], [
+            ('task', self.task.id), ('contact', self.ada.id), ('appointment', self.appointment.id),
+        ])
+        self.assertEqual(records[2]['attendees'], [{'id': self.ada.id, 'name': 'Ada Lovelace',
+                                                    'email': 'ada@example.com'}])
+
+    @override_settings(ROOT_URLCONF='mybackend.urls_async')
+    async def test_streamed_asynchronously_under_asgi(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await AsyncClient().get('/api/export/', headers=headers)
+            self.assertTrue(response.is_async)
+            body = b''.join([chunk async for chunk in response])
+            compressed = await AsyncClient().get('/api/export/tasks.csv',
+                                                 headers={**headers, 'Accept-Encoding': 'gzip'})
+            csv_body = gzip.decompress(b''.join([chunk async for chunk in compressed]))
+        # Not read to the end on a thread and held in memory before sending
+        self.assertFalse([w for w in caught if 'must consume synchronous iterators' in str(w.message)])
+        self.assertEqual(len(body.decode().splitlines()), 3)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Write report', csv_body.decode())
+
+    def test_csv(self):
+        _, body = self.download('/api/export/appointments.csv')
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Review, part 1')
+        self.assertEqual(rows[0]['notes'], 'Bring the\nslides')
+        self.assertEqual(rows[0]['attendees'], 'Ada Lovelace <ada@example.com>')
+
+    def test_icalendar(self):
+        Appointment.objects.create(owner=self.user, title='Someday')
+        response, body = self.download('/api/export/appointments.ics')
+
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('UID:appointment-%d@pa-assistant\r\n' % self.appointment.id, body)
+        self.assertIn('DTSTART:20240507T093000\r\n', body)
+        self.assertIn('SUMMARY:Review\\, part 1\r\n', body)
+        self.assertIn('DESCRIPTION:Bring the\\nslides\r\n', body)
+        self.assertIn('ATTENDEE;CN="Ada Lovelace":mailto:ada@example.com\r\n', body)
+
+    def test_names_cannot_inject_formulas_or_calendar_properties(self):
+        self.ada.name = '=HYPERLINK("https://evil.example")\r\nATTENDEE:mailto:x@evil.example'
+        self.ada.save()
+
+        _, body = self.download('/api/export/contacts.csv')
+        row = next(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(row['name'], "'" + self.ada.name)
+        self.assertEqual(row['phone'], "'+44 20 7946 0018")
+
+        _, body = self.download('/api/export/appointments.ics')
+        self.assertIn('\r\nATTENDEE;CN="=HYPERLINK(\'https://evil.example\')  ATTENDEE:mailto:x@evil.example"'
+                      ':mailto:ada@example.com\r\n', body.replace('\r\n ', ''))
+        self.assertNotIn('\r\nATTENDEE:mailto:x@evil.example', body)
+
+        self.appointment.title = 'Review\rDESCRIPTION:injected'
+        self.appointment.save()
+        _, body = self.download('/api/export/appointments.ics')
+        self.assertIn('SUMMARY:Review\\nDESCRIPTION:injected\r\n', body)
+        self.assertNotIn('\r', body.replace('\r\n', ''))
+
+    def test_unknown_exports(self):
+        self.assertEqual(self.client.get('/api/export/tasks.ics').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/users.csv').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/tasks.xml').status_code, 404)
+
+    @mock.patch('export.views.CHUNK_SIZE', 2)
+    def test_rows_are_read_in_chunks(self):
+        for i in range(4):
+            Appointment.objects.create(owner=self.user, title=f'Meeting {i}').attendees.add(self.ada)
+
+        response = self.client.get('/api/export/appointments.jsonl')
+        # One cursor over the appointments, then attendees for each chunk of two
+        with self.assertNumQueries(4):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_long_lines_are_folded(self):
+        line = 'DESCRIPTION:' + 'é' * 100
+        folded = ics_fold(line)
+        parts = folded.split('\r\n ')
+        self.assertTrue(all(len(part.encode('utf-8').rstrip(b'\r\n')) <= 75 for part in parts))
+        self.assertEqual(''.join(parts), line + '\r\n')
+
+
+
+class ExportBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/export/'
+
+    def owner_with_data(self, rows):
+        owner = self.create_owner()
+        Task.objects.bulk_create(Task(owner=owner, description=f'Task {i}') for i in range(rows))
+        contacts = Contact.objects.bulk_create(Contact(owner=owner, name=f'Contact {i}') for i in range(rows))
+        for i in range(rows):
+            Appointment.objects.create(owner=owner, title=f'Meeting {i}').attendees.set(contacts[:3])
+        return self.client_for(owner)
+
+    def test_budgets(self):
+        def download(path):
+            def setup(rows):
+                client = self.owner_with_data(rows)
+                return lambda: client.get(path)
+            return setup
+
+        self.check_budgets({
+            ('export_all', 'GET'): download('/api/export/'),
+            ('export_resource', 'GET'): download('/api/export/appointments.csv'),
+        })
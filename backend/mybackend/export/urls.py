@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.export_all, name='export-all'),
+    path('<str:resource>.<str:extension>', views.export_resource, name='export-resource'),
+]
@@ -0,0 +1,112 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from appointments.models import Appointment
+from appointments.serializers import AppointmentSerializer
+from appointments.views import with_attendees
+from contacts.models import Contact
+from contacts.serializers import ContactSerializer
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+from .formats import buffered, csv_lines, ics_lines, jsonl_lines
+
+RESOURCES = {
+    'tasks': ('task', Task, TaskSerializer),
+    'contacts': ('contact', Contact, ContactSerializer),
+    'appointments': ('appointment', Appointment, AppointmentSerializer),
+}
+
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'ics': 'text/calendar; charset=utf-8',
+}
+
+# Rows are read from the database this many at a time, and the attendees of
+# each batch of appointments are loaded with one extra query
+CHUNK_SIZE = 500
+
+
+def export_queryset(resource, user):
+    _, model, _ = RESOURCES[resource]
+    queryset = model.objects.filter(owner=user).order_by('id')
+    if model is Appointment:
+        queryset = with_attendees(queryset)
+    return queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_records(resource, request):
+    _, _, serializer_class = RESOURCES[resource]
+    serializer = serializer_class(context={'request': request, 'expand': ['attendees']})
+    for obj in export_queryset(resource, request.user):
+        yield serializer.to_representation(obj)
+
+
+async def on_request_thread(chunks):
+    """
+    `chunks` as an async iterator, for ASGI: StreamingHttpResponse reads a
+    sync one to the end before it sends any of it. Each chunk is still made
+    on the request's thread, where the export's connection and cursor are.
+    """
+    pull = sync_to_async(next)
+    try:
+        while (chunk := await pull(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def stream(request, lines, filename, extension):
+    chunks = buffered(lines)
+    if isinstance(request._request, ASGIRequest):
+        chunks = on_request_thread(chunks)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[extension])
+    response['Content-Disposition'] = 'attachment; filename="%s-%s.%s"' % (
+        filename, timezone.now().strftime('%Y%m%d'), extension,
+    )
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_all(request):
+    """
+    Everything the user has, as JSON Lines: one task, contact or appointment
+    per line, each tagged with its `type`. Appointments include attendee
+    summaries. The response is streamed, so memory use doesn't grow with
+    the size of the account.
+    """
+    def records():
+        for resource, (kind, _, _) in RESOURCES.items():
+            for record in export_records(resource, request):
+                yield {'type': kind, **record}
+
+    return stream(request, jsonl_lines(records()), 'export', 'jsonl')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_resource(request, resource, extension):
+    """ One resource as `.jsonl` or `.csv`, or appointments as `.ics`. """
+    if resource not in RESOURCES or extension not in CONTENT_TYPES:
+        return Response({'error': 'Unknown export.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if extension == 'jsonl':
+        lines = jsonl_lines(export_records(resource, request))
+    elif extension == 'csv':
+        fields = list(RESOURCES[resource][2]().fields)
+        lines = csv_lines(fields, export_records(resource, request))
+    elif resource == 'appointments':
+        lines = ics_lines(export_queryset(resource, request.user))
+    else:
+        return Response({'error': 'Only appointments can be exported as iCalendar.'},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    return stream(request, lines, resource, extension)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mybackend.settings')
+# Serve the async views; DJANGO_URLCONF=mybackend.urls keeps the DRF ones
+os.environ.setdefault('DJANGO_URLCONF', 'mybackend.urls_async')
 
 application = get_asgi_application()
@@ -0,0 +1,211 @@
+"""
+Async views for running under ASGI.
+
+DRF's views are synchronous, so under ASGI every request to one is handed
+to a thread as a whole. The views here are native async Django views: rows
+are loaded and saved with the async ORM, and everything that doesn't touch
+the database is borrowed from DRF - serializers, KeysetPagination, filter
+backends and the JSON renderer and parser. They answer like their DRF
+counterparts, ETags included, but don't use the server-side list cache.
+mybackend/urls_async.py serves them in place of the DRF views.
+
+In Django 4.2 the async ORM still runs each query on a thread; what goes
+away is holding a thread for the whole request.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import CachedJWTAuthentication
+from .conditional import ResourceVersionMixin, arefresh_updated_at, finish, list_etag, object_etag
+from .fieldsets import only_fields, requested_fields
+from .pagination import KeysetPagination
+from .replicas import read_from_replica
+from .timing import timed
+
+
+class AsyncAPIView(View):
+    """ The parts of APIView the async views need: JSON in and out, JWT authentication and error responses. """
+    authentication_class = CachedJWTAuthentication
+    # Endpoints anyone may call, like login, set this to False
+    login_required = True
+    # GETs read from a replica, as with ReplicaReadMixin
+    replica_reads = False
+    # The JSON ones from REST_FRAMEWORK
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    parser = api_settings.DEFAULT_PARSER_CLASSES[0]()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # As with APIView: requests authenticate with a header, not a cookie
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = request = Request(request, parsers=[self.parser])
+        request.accepted_renderer = self.renderer
+        try:
+            await self.authenticate(request)
+            if self.replica_reads:
+                read_from_replica(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        authenticator = self.authentication_class()
+        if hasattr(authenticator, 'aauthenticate'):
+            result = await authenticator.aauthenticate(request)
+        else:
+            # e.g. JWTStatelessUserAuthentication, which doesn't query
+            result = authenticator.authenticate(request)
+        if result is not None:
+            request.user, request.auth = result
+        elif self.login_required:
+            raise exceptions.NotAuthenticated()
+
+    def handle_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authentication_class().authenticate_header(self.request)
+        return response
+
+    def render(self, data, status=status.HTTP_200_OK):
+        with timed('render'):
+            content = self.renderer.render(data)
+        return HttpResponse(content, status=status, content_type=self.renderer.media_type)
+
+
+class AsyncResourceMixin(ResourceVersionMixin):
+    serializer_class = None
+    # Set when validating or saving needs queries, e.g. to check related
+    # ids; the serializer then runs on a thread, as it would under DRF
+    serializer_uses_database = False
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_serializer_class(self):
+        return self.serializer_class
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = requested_fields(self.request, self.get_serializer_class())
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('context', {'request': self.request, 'view': self, 'fields': self.get_sparse_fields()})
+        return self.get_serializer_class()(*args, **kwargs)
+
+    async def prefetch(self, rows):
+        """ Load related rows the serializer reads; async iteration can't prefetch_related(). """
+
+    async def save(self, serializer, **kwargs):
+        """ serializer.is_valid() and serializer.save(), with the async ORM where it can. """
+        if self.serializer_uses_database:
+            def validate_and_save():
+                serializer.is_valid(raise_exception=True)
+                self.perform_save(serializer, **kwargs)
+            await sync_to_async(validate_and_save)()
+        else:
+            serializer.is_valid(raise_exception=True)
+            attrs = {**serializer.validated_data, **kwargs}
+            if serializer.instance is None:
+                serializer.instance = await self.get_serializer_class().Meta.model.objects.acreate(**attrs)
+            else:
+                for name, value in attrs.items():
+                    setattr(serializer.instance, name, value)
+                await serializer.instance.asave()
+
+        # Related rows may have changed along with the instance
+        serializer.instance._prefetched_objects_cache = {}
+        await self.prefetch([serializer.instance])
+
+    def perform_save(self, serializer, **kwargs):
+        """ The save on the thread, when serializer_uses_database is set. """
+        serializer.save(**kwargs)
+
+
+class AsyncListCreateView(AsyncResourceMixin, AsyncAPIView):
+    """ ListCreateAPIView with ConditionalListMixin's ETags, for ASGI. """
+    filter_backends = []
+    replica_reads = True
+    pagination_class = KeysetPagination
+
+    async def get(self, request):
+        resource = self.get_resource()
+        version = await self.aget_resource_version()
+        etag = list_etag(resource, request.user.pk, version, self.get_variant_digest())
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            queryset = self.get_queryset()
+            for backend in self.filter_backends:
+                queryset = backend().filter_queryset(request, queryset, self)
+            queryset = only_fields(queryset, self.get_serializer_class(), self.get_sparse_fields())
+            paginator = self.pagination_class()
+            rows = await paginator.apaginate_queryset(queryset, request)
+            await self.prefetch(rows)
+            data = self.get_serializer(rows, many=True).data
+            response = self.render(paginator.get_paginated_response(data).data)
+        return finish(response, etag)
+
+    async def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        await self.save(serializer, owner=request.user)
+        return self.render(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncRetrieveUpdateDestroyView(AsyncResourceMixin, AsyncAPIView):
+    """ RetrieveUpdateDestroyAPIView with ConditionalDetailMixin's ETags, for ASGI. """
+    replica_reads = True
+
+    async def get_object(self, pk):
+        queryset = only_fields(self.get_queryset(), self.get_serializer_class(), self.get_sparse_fields())
+        try:
+            return await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound('No %s matches the given query.' % queryset.model._meta.object_name)
+
+    async def get(self, request, pk):
+        obj = await self.get_object(pk)
+        etag = object_etag(obj, await self.aget_included_versions())
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            await self.prefetch([obj])
+            response = self.render(self.get_serializer(obj).data)
+        return finish(response, etag)
+
+    async def put(self, request, pk):
+        return await self.update(request, pk, partial=False)
+
+    async def patch(self, request, pk):
+        return await self.update(request, pk, partial=True)
+
+    async def update(self, request, pk, partial):
+        obj = await self.get_object(pk)
+        included = await self.aget_included_versions()
+        response = get_conditional_response(request._request, etag=object_etag(obj, included))
+        if response is not None:
+            return response
+        serializer = self.get_serializer(obj, data=request.data, partial=partial)
+        await self.save(serializer)
+        await arefresh_updated_at(obj)
+        return finish(self.render(serializer.data), object_etag(obj, included))
+
+    async def delete(self, request, pk):
+        obj = await self.get_object(pk)
+        etag = object_etag(obj, await self.aget_included_versions())
+        response = get_conditional_response(request._request, etag=etag)
+        if response is not None:
+            return response
+        await self.destroy(obj)
+        return self.render(None, status=status.HTTP_204_NO_CONTENT)
+
+    async def destroy(self, obj):
+        await obj.adelete()
@@ -0,0 +1,158 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .timing import timed
+
+
+class UserCache:
+    """
+    A small thread-safe LRU of users by id, with a time to live.
+
+    It lives in each process: saves in this process drop the entry right
+    away, while changes made by other processes (or by queryset.update())
+    show up once the entry expires.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        # Each request gets its own copy to change as it likes
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        expires = time.monotonic() + settings.JWT_USER_CACHE_TTL
+        with self.lock:
+            self.entries[user_id] = (copy.copy(user), expires)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > settings.JWT_USER_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Covers deactivation, password changes and deletes; the token's user
+    # id claim is a string, see token_user_id()
+    user_cache.discard(str(instance.pk))
+
+
+def token_user_id(validated_token):
+    try:
+        return str(validated_token[api_settings.USER_ID_CLAIM])
+    except KeyError:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+
+
+def stateless_user(validated_token):
+    """
+    A User built from the token's claims (see users/tokens.py) without a
+    query. It works anywhere a User is used as a foreign key value, but
+    fields the token doesn't carry are left at their defaults.
+    """
+    user = User(
+        id=int(token_user_id(validated_token)),
+        username=validated_token.get('username', ''),
+        email=validated_token.get('email', ''),
+        is_active=True,
+    )
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps recently seen users in memory instead of
+    loading the User row on every request. With JWT_STATELESS_USERS on it
+    doesn't touch the database at all.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if settings.JWT_STATELESS_USERS:
+            return stateless_user(validated_token)
+
+        user_id = token_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+
+        self.check_user(validated_token, user)
+        return user
+
+    async def aauthenticate(self, request):
+        """ authenticate() for async views: a cache miss is loaded with the async ORM. """
+        with timed('auth'):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if settings.JWT_STATELESS_USERS:
+            return stateless_user(validated_token)
+
+        user_id = token_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            self.check_user(validated_token, user)
+            user_cache.set(user_id, user)
+            return user
+
+        self.check_user(validated_token, user)
+        return user
+
+    def check_user(self, validated_token, user):
+        """ The checks super().get_user() makes on a freshly loaded user. """
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
@@ -0,0 +1,172 @@
+"""
+Query and memory budgets for every view, checked by the apps' tests.
+
+Each (view, method) in BUDGETS gets at most `queries` SQL queries and
+`kilobytes` of peak Python allocations (as tracemalloc counts them) for a
+request over SIZES[-1] rows. The apps' BudgetTests run each endpoint once
+per size in SIZES with BudgetTestMixin, and fail when a request goes over
+its budget or when it makes more queries for more rows - the lazy
+`owner.username` or the unprefetched many-to-many that slipped in.
+
+A new view needs a budget here and a scenario in its app's BudgetTests;
+the tests fail until it has both. Lower a budget when a change makes the
+view cheaper, so the headroom doesn't hide the next regression.
+"""
+import itertools
+import tracemalloc
+import weakref
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+
+from users.tokens import tokens_for_user
+
+Budget = namedtuple('Budget', 'queries kilobytes')
+
+# Rows the user has for each run; the larger one is what the budgets are for
+SIZES = (3, 30)
+
+BUDGETS = {
+    ('TokenObtainPairView', 'POST'): Budget(queries=3, kilobytes=80),
+    ('TokenRefreshView', 'POST'): Budget(queries=7, kilobytes=80),
+    ('register_user', 'POST'): Budget(queries=6, kilobytes=80),
+    ('login_user', 'POST'): Budget(queries=2, kilobytes=80),
+    ('logout_user', 'POST'): Budget(queries=6, kilobytes=64),
+    ('get_user_profile', 'GET'): Budget(queries=0, kilobytes=48),
+    ('check_auth_status', 'GET'): Budget(queries=0, kilobytes=48),
+    ('activate_user', 'POST'): Budget(queries=2, kilobytes=80),
+    ('resend_activation', 'POST'): Budget(queries=2, kilobytes=64),
+    ('password_reset_request', 'POST'): Budget(queries=2, kilobytes=64),
+    ('password_reset_confirm', 'POST'): Budget(queries=2, kilobytes=64),
+
+    ('TaskListCreate', 'GET'): Budget(queries=3, kilobytes=192),
+    ('TaskListCreate', 'POST'): Budget(queries=9, kilobytes=96),
+    ('TaskBulk', 'POST'): Budget(queries=19, kilobytes=624),
+    ('TaskStats', 'GET'): Budget(queries=3, kilobytes=48),
+    ('TaskRetrieveUpdateDestroy', 'GET'): Budget(queries=2, kilobytes=80),
+    ('TaskRetrieveUpdateDestroy', 'PATCH'): Budget(queries=13, kilobytes=96),
+    ('TaskRetrieveUpdateDestroy', 'DELETE'): Budget(queries=14, kilobytes=80),
+
+    ('ContactListCreate', 'GET'): Budget(queries=3, kilobytes=192),
+    ('ContactListCreate', 'POST'): Budget(queries=6, kilobytes=96),
+    ('ContactBulk', 'POST'): Budget(queries=22, kilobytes=624),
+    ('ContactSearch', 'GET'): Budget(queries=3, kilobytes=144),
+    ('ContactImport', 'POST'): Budget(queries=9, kilobytes=240),
+    ('ContactRetrieveUpdateDestroy', 'GET'): Budget(queries=2, kilobytes=80),
+    ('ContactRetrieveUpdateDestroy', 'PATCH'): Budget(queries=7, kilobytes=96),
+    ('ContactRetrieveUpdateDestroy', 'DELETE'): Budget(queries=14, kilobytes=96),
+
+    ('AppointmentListCreate', 'GET'): Budget(queries=4, kilobytes=2048),
+    ('AppointmentListCreate', 'POST'): Budget(queries=13, kilobytes=160),
+    ('AppointmentRetrieveUpdateDestroy', 'GET'): Budget(queries=4, kilobytes=144),
+    ('AppointmentRetrieveUpdateDestroy', 'PATCH'): Budget(queries=15, kilobytes=176),
+    ('AppointmentRetrieveUpdateDestroy', 'DELETE'): Budget(queries=10, kilobytes=112),
+
+    ('sync_changes', 'GET'): Budget(queries=6, kilobytes=624),
+    ('agenda', 'GET'): Budget(queries=4, kilobytes=528),
+    ('export_all', 'GET'): Budget(queries=5, kilobytes=480),
+    ('export_resource', 'GET'): Budget(queries=3, kilobytes=640),
+}
+
+
+def view_name(callback):
+    """ The class name of a class-based view, the function name of a DRF @api_view. """
+    return getattr(callback, 'view_class', callback).__name__
+
+
+def routed_views(patterns=None, prefix=''):
+    """ Yield (URL prefix of the include, view name) for every route, apart from the admin's. """
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace != 'admin':
+                yield from routed_views(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix, view_name(pattern.callback)
+
+
+def measure(send):
+    """
+    Run send() and return its result, the queries it made and its peak
+    allocations in kB.
+
+    Every weak signal connect registers a weakref.finalize, and Django 4.2's
+    test client connects on each request, so the registry grows all through
+    the suite and whichever request resizes it is charged for all of it.
+    What weakref.py allocated and still holds at the end is left out.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            response = send()
+            if response.streaming:
+                b''.join(response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+            finalizers = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, weakref.__file__)])
+        finally:
+            tracemalloc.stop()
+    peak -= sum(stat.size for stat in finalizers.statistics('filename'))
+    return response, len(queries), peak / 1024
+
+
+class BudgetTestMixin:
+    """
+    For an app's TestCase. check_budgets() runs every view routed under
+    `url_prefix` with the scenarios given, and reports all the budgets
+    that were broken in one failure.
+    """
+    url_prefix = None
+    owners = itertools.count()
+
+    def create_owner(self, password=None, **fields):
+        """ A new user for each setup, so no cache carries over between runs. """
+        email = f'budget-{next(self.owners)}@example.com'
+        return User.objects.create_user(email, email, password, **fields)
+
+    def client_for(self, user):
+        """ An APIClient with a bearer token for `user`, so authentication counts towards the budget. """
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+        return client
+
+    def check_budgets(self, scenarios):
+        """
+        `scenarios` maps each (view, method) to setup(rows), which creates a
+        user with `rows` rows of whatever the view reads, and returns a
+        function that sends the request.
+        """
+        views = {name for prefix, name in routed_views() if prefix == self.url_prefix}
+        self.assertEqual(views - {view for view, _ in BUDGETS}, set(), "Views without a budget")
+        self.assertEqual({key for key in BUDGETS if key[0] in views} - set(scenarios), set(),
+                         "Budgets without a scenario")
+
+        failures = []
+        for (view, method), setup in scenarios.items():
+            failures += self.broken_budgets(view, method, BUDGETS[view, method], setup)
+        if failures:
+            self.fail('\n'.join(failures))
+
+    def broken_budgets(self, view, method, budget, setup):
+        label = f'{method} {view}'
+        # Imports and Django's and DRF's caches are filled on first use
+        measure(setup(SIZES[0]))
+
+        counts = []
+        for rows in SIZES:
+            response, queries, kilobytes = measure(setup(rows))
+            if response.status_code >= 400:
+                return [f'{label}: the scenario failed with {response.status_code}']
+            counts.append(queries)
+        failures = []
+        if counts[-1] > counts[0]:
+            failures.append(f'{label}: {counts[0]} queries for {SIZES[0]} rows but {counts[-1]} '
+                            f'for {SIZES[-1]}')
+        if counts[-1] > budget.queries:
+            failures.append(f'{label}: {counts[-1]} queries, over the budget of {budget.queries}')
+        if kilobytes > budget.kilobytes:
+            failures.append(f'{label}: {kilobytes:.0f} kB at the peak, over the budget of '
+                            f'{budget.kilobytes} kB')
+        return failures
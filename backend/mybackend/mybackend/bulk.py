@@ -0,0 +1,160 @@
+from django.db import transaction
+from rest_framework import generics, permissions, serializers, status
+from rest_framework.response import Response
+
+from sync.tracking import TRACKED_MODELS, changed, delete_tracked, track_batch
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that writes a whole batch with one query per operation.
+    For updates, `instance` is a {pk: object} mapping and every item in
+    `data` carries the `id` of the object it patches.
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            self.child.instance = self.instance[data['id']]
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create([model(**attrs) for attrs in validated_data])
+
+    def update(self, instance, validated_data):
+        model = self.child.Meta.model
+        objs, fields = [], set()
+        for item, attrs in zip(self.initial_data, validated_data):
+            obj = instance[item['id']]
+            for name, value in attrs.items():
+                setattr(obj, name, value)
+            fields.update(attrs)
+            objs.append(obj)
+        # bulk_update() skips pre_save(), so auto_now fields need a hand
+        if fields:
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    fields.add(field.name)
+                    for obj in objs:
+                        field.pre_save(obj, add=False)
+        if objs and fields:
+            model.objects.bulk_update(objs, sorted(fields))
+        return objs
+
+
+class BulkOperationsView(generics.GenericAPIView):
+    """
+    POST {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}
+
+    The whole batch is validated first and then written in one transaction,
+    so either every item is applied or none is. The response holds one
+    result (or one error) per item, in request order, under the same keys.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 500
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with create, update and/or delete lists.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        batch = {}
+        for key in ('create', 'update', 'delete'):
+            batch[key] = request.data.get(key, [])
+            if not isinstance(batch[key], list):
+                return Response({key: ['Expected a list of items.']}, status=status.HTTP_400_BAD_REQUEST)
+        if sum(len(items) for items in batch.values()) > self.max_batch_size:
+            return Response({'error': f'A batch can hold at most {self.max_batch_size} items.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        update_ids = [self.parse_id(item.get('id') if isinstance(item, dict) else None) for item in batch['update']]
+        delete_ids = [self.parse_id(value) for value in batch['delete']]
+
+        # One owner-scoped lookup covers every id in the batch
+        owned = self.get_queryset().in_bulk([pk for pk in update_ids + delete_ids if pk is not None])
+
+        errors = {
+            'create': [{} for _ in batch['create']],
+            'update': self.check_ids(update_ids, owned),
+            'delete': self.check_ids(delete_ids, owned),
+        }
+
+        create_serializer = self.get_serializer(data=batch['create'], many=True)
+        if not create_serializer.is_valid():
+            errors['create'] = create_serializer.errors
+
+        updates = [
+            dict(item, id=pk)
+            for item, pk, error in zip(batch['update'], update_ids, errors['update'])
+            if not error
+        ]
+        update_serializer = self.get_serializer(
+            {pk: owned[pk] for pk in update_ids if pk in owned},
+            data=updates, many=True, partial=True,
+        )
+        if not update_serializer.is_valid():
+            item_errors = iter(update_serializer.errors)
+            errors['update'] = [error or next(item_errors) for error in errors['update']]
+
+        if any(any(item_errors) for item_errors in errors.values()):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic(), track_batch():
+            self.perform_batch(create_serializer, update_serializer, [owned[pk] for pk in delete_ids])
+
+        return Response({
+            'create': create_serializer.data,
+            'update': update_serializer.data,
+            'delete': [{'id': pk, 'deleted': True} for pk in delete_ids],
+        })
+
+    def perform_batch(self, create_serializer, update_serializer, instances):
+        """ Write the validated batch, in its transaction. """
+        self.perform_bulk_create(create_serializer)
+        self.perform_bulk_update(update_serializer)
+        self.perform_bulk_destroy(instances)
+
+    def perform_bulk_create(self, serializer):
+        if serializer.validated_data:
+            serializer.save(owner=self.request.user)
+            self.record_change()
+
+    def perform_bulk_update(self, serializer):
+        if serializer.validated_data:
+            serializer.save()
+            self.record_change()
+
+    def record_change(self):
+        # bulk_create() and bulk_update() don't send post_save
+        resource = TRACKED_MODELS.get(self.get_queryset().model)
+        if resource:
+            changed(self.request.user.pk, resource)
+
+    def perform_bulk_destroy(self, instances):
+        if instances:
+            delete_tracked(self.get_queryset().filter(pk__in=[obj.pk for obj in instances]))
+
+    @staticmethod
+    def parse_id(value):
+        if isinstance(value, bool):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def check_ids(ids, owned):
+        errors, seen = [], set()
+        for pk in ids:
+            if pk is None:
+                errors.append({'id': ['A valid integer is required.']})
+            elif pk not in owned:
+                errors.append({'id': ['Not found.']})
+            elif pk in seen:
+                errors.append({'id': ['Appears more than once in this batch.']})
+            else:
+                errors.append({})
+            seen.add(pk)
+        return errors
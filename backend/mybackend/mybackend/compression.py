@@ -0,0 +1,136 @@
+"""
+gzip and Brotli for responses, picked from the request's Accept-Encoding.
+
+Like Django's GZipMiddleware, with Brotli added (when the Brotli package is
+installed), q-values honoured, and a COMPRESSION_MIN_SIZE below which a
+response goes out as it is: the detail endpoints' few hundred bytes gain
+less than the compressing costs. Streamed responses, the exports, are
+compressed chunk by chunk whatever their size.
+
+Unlike GZipMiddleware this leaves strong ETags strong. They stand for the
+row or the list version, whatever the encoding, and the detail endpoints
+compare If-Match strongly; a weakened ETag could never match again.
+Vary: Accept-Encoding keeps shared caches from mixing the encodings up.
+"""
+import re
+from gzip import GzipFile
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer, compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Quality 4-5 is where Brotli beats gzip -6 on size at about its speed
+BROTLI_QUALITY = 5
+
+re_coding = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def accepted_encodings(header):
+    """ {coding: q} from an Accept-Encoding header. """
+    codings = {}
+    for part in header.split(','):
+        match = re_coding.match(part)
+        if match:
+            try:
+                codings[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+    return codings
+
+
+def choose_encoding(header):
+    """ 'br', 'gzip' or None, by the client's preference; Brotli wins a tie. """
+    codings = accepted_encodings(header)
+    best_q, best = 0, None
+    for coding in (['br'] if brotli is not None else []) + ['gzip']:
+        q = codings.get(coding, codings.get('*', 0))
+        if q > best_q:
+            best_q, best = q, coding
+    return best
+
+
+def compress_brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_sequence(sequence):
+    """ compress_sequence() for async streaming content. """
+    buf = StreamingBuffer()
+    with GzipFile(mode='wb', compresslevel=6, fileobj=buf, mtime=0) as zfile:
+        yield buf.read()
+        async for item in sequence:
+            zfile.write(item)
+            data = buf.read()
+            if data:
+                yield data
+    yield buf.read()
+
+
+async def acompress_brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    async for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """ Goes right after ServerTimingMiddleware, so it compresses what the rest produce. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                compress = acompress_brotli_sequence if encoding == 'br' else acompress_sequence
+            else:
+                compress = compress_brotli_sequence if encoding == 'br' else compress_sequence
+            response.streaming_content = compress(response.streaming_content)
+            # The compressed size isn't known until it has been streamed
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,146 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+from sync.tracking import TRACKED_MODELS, acurrent_versions, current_versions
+
+
+def list_etag(resource, owner_id, version, variant):
+    return '"%s-%s-%s-%s"' % (resource, owner_id, version, variant)
+
+
+def object_etag(obj, included_versions=()):
+    resource = TRACKED_MODELS[type(obj)]
+    stamp = '.'.join(map(str, [int(obj.updated_at.timestamp() * 1_000_000), *included_versions]))
+    return '"%s-%s-%s"' % (resource, obj.pk, stamp)
+
+
+class ResourceVersionMixin:
+    """
+    Shared by the list and detail mixins so the version stamps are read only
+    once. A representation that inlines rows of other resources (see
+    get_included_resources()) depends on their versions as well.
+    """
+
+    def get_resource(self):
+        return TRACKED_MODELS[self.get_serializer_class().Meta.model]
+
+    def get_included_resources(self):
+        """ Other resources this request's representation includes rows of. """
+        return []
+
+    def get_included_versions(self):
+        if not hasattr(self, '_included_versions'):
+            included = self.get_included_resources()
+            self._included_versions = current_versions(self.request.user.pk, included) if included else []
+        return self._included_versions
+
+    async def aget_included_versions(self):
+        if not hasattr(self, '_included_versions'):
+            included = self.get_included_resources()
+            self._included_versions = await acurrent_versions(self.request.user.pk, included) if included else []
+        return self._included_versions
+
+    def get_resource_version(self):
+        # The resource's own version first, then the included ones
+        if not hasattr(self, '_resource_version'):
+            versions = current_versions(self.request.user.pk, [self.get_resource(), *self.get_included_resources()])
+            self._resource_version = '.'.join(map(str, versions))
+        return self._resource_version
+
+    async def aget_resource_version(self):
+        if not hasattr(self, '_resource_version'):
+            resources = [self.get_resource(), *self.get_included_resources()]
+            versions = await acurrent_versions(self.request.user.pk, resources)
+            self._resource_version = '.'.join(map(str, versions))
+        return self._resource_version
+
+    def get_variant_digest(self):
+        # Different pages, filters and formats are different representations
+        variant = '%s?%s' % (self.request.accepted_renderer.format, self.request.META.get('QUERY_STRING', ''))
+        return hashlib.md5(variant.encode('utf-8'), usedforsecurity=False).hexdigest()[:12]
+
+
+def refresh_updated_at(obj):
+    """
+    Reload `updated_at` after a save that changed many-to-many fields: the
+    m2m_changed receivers bump it with queryset.update(), behind the
+    instance's back (see sync.tracking), and the ETag has to match the row.
+    """
+    if obj._meta.many_to_many:
+        obj.refresh_from_db(fields=['updated_at'])
+
+
+async def arefresh_updated_at(obj):
+    if obj._meta.many_to_many:
+        await obj.arefresh_from_db(fields=['updated_at'])
+
+
+def finish(response, etag):
+    response['ETag'] = etag
+    # Clients may keep the response but must check back before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalListMixin(ResourceVersionMixin):
+    """
+    Strong ETags for list endpoints, built from the user's version stamp for
+    the resource. A matching If-None-Match is answered with a 304 after a
+    single-row lookup, before the list queryset is evaluated.
+    """
+
+    def get_list_etag(self, request):
+        return list_etag(self.get_resource(), request.user.pk, self.get_resource_version(), self.get_variant_digest())
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return finish(response, etag)
+
+
+class ConditionalDetailMixin(ResourceVersionMixin):
+    """
+    Strong ETags for detail endpoints, built from the row's `updated_at`, so
+    writes to other rows don't invalidate them. GET honours If-None-Match;
+    PUT, PATCH and DELETE honour If-Match and answer 412 on a mismatch.
+    """
+
+    def get_object(self):
+        # retrieve/update/destroy and the precondition check share one lookup
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def get_object_etag(self, obj):
+        return object_etag(obj, self.get_included_versions())
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.get_object_etag(self.get_object())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return finish(response, etag)
+
+    def update(self, request, *args, **kwargs):
+        # UpdateModelMixin.update(), with the precondition and a fresh ETag
+        instance = self.get_object()
+        response = get_conditional_response(request, etag=self.get_object_etag(instance))
+        if response is not None:
+            return response
+        serializer = self.get_serializer(instance, data=request.data, partial=kwargs.pop('partial', False))
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        refresh_updated_at(instance)
+        if getattr(instance, '_prefetched_objects_cache', None):
+            instance._prefetched_objects_cache = {}
+        return finish(Response(serializer.data), self.get_object_etag(instance))
+
+    def destroy(self, request, *args, **kwargs):
+        response = get_conditional_response(request, etag=self.get_object_etag(self.get_object()))
+        if response is not None:
+            return response
+        return super().destroy(request, *args, **kwargs)
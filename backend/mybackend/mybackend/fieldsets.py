@@ -0,0 +1,92 @@
+"""
+Sparse fieldsets for the task, contact and appointment endpoints.
+
+`?fields=id,description,completed` answers a GET with just those fields,
+`?omit=notes` with all but those. `id` is always included. The same names
+trim the query: the rows are loaded with only() the columns the fields read,
+plus the ordering (the cursors need it) and `updated_at` (the ETags do),
+and many-to-many prefetches are skipped when no field asks for them.
+
+Writes ignore both parameters and answer with every field.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+ALWAYS = ('id',)
+
+
+def split_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fields(request, serializer_class):
+    """ The names of the fields a GET asks for, in the serializer's order, or None for all of them. """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    fields, omit = request.query_params.get(FIELDS_PARAM), request.query_params.get(OMIT_PARAM)
+    if not fields and not omit:
+        return None
+
+    available = list(serializer_class().fields)
+    wanted = split_names(fields) if fields else set(available)
+    omitted = split_names(omit or '')
+    unknown = (wanted | omitted) - set(available)
+    if unknown:
+        raise ValidationError({FIELDS_PARAM if fields else OMIT_PARAM: [
+            'Unknown fields: %s. Choose from %s.' % (', '.join(sorted(unknown)), ', '.join(available))
+        ]})
+    return [name for name in available if name in ALWAYS or (name in wanted and name not in omitted)]
+
+
+def only_fields(queryset, serializer_class, names):
+    """ `queryset` loading just the columns the fields `names` are read from. """
+    if names is None:
+        return queryset
+    model, fields = queryset.model, serializer_class().fields
+    columns = {model._meta.pk.name, 'updated_at'}
+    columns.update(name.lstrip('-') for name in queryset.query.order_by)
+    many_to_many = False
+    for name in names:
+        try:
+            field = model._meta.get_field(fields[name].source.split('.')[0])
+        except FieldDoesNotExist:
+            continue
+        if field.many_to_many or field.one_to_many:
+            many_to_many = True
+        elif field.concrete:
+            columns.add(field.name)
+    queryset = queryset.only(*columns)
+    if not many_to_many:
+        queryset = queryset.prefetch_related(None)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """ For the DRF list and detail views; the serializers need SparseFieldsetSerializerMixin. """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = requested_fields(self.request, self.get_serializer_class())
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.setdefault('fields', self.get_sparse_fields())
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return only_fields(queryset, self.get_serializer_class(), self.get_sparse_fields())
+
+
+class SparseFieldsetSerializerMixin:
+    """ Drops the fields that aren't in the `fields` the view puts in the context. """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = self.context.get('fields')
+        if names is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in names}
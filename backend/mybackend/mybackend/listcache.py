@@ -0,0 +1,97 @@
+"""
+Per-user cache for the list endpoints.
+
+Entries are keyed by user, resource, the user's version stamp for that
+resource (and for the resources the response includes, such as expanded
+attendees) and the request variant. A write bumps the stamp, so a stale
+entry can never be served, even from another process's local memory. The
+`resource_changed` receiver below then evicts the superseded entries so
+they don't sit around until the LRU gets to them.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from sync.tracking import resource_changed
+from .conditional import ResourceVersionMixin
+
+CACHE_ALIAS = 'lists'
+HITS_KEY = 'lists:stats:hits'
+MISSES_KEY = 'lists:stats:misses'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def index_key(owner_id, resource):
+    return 'lists:%s:%s:keys' % (owner_id, resource)
+
+
+def count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First hit/miss since the cache started (or was cleared)
+        cache.add(key, 1, timeout=None)
+
+
+def is_shared():
+    """ Whether other processes see this cache, as they do with Redis but not with local memory. """
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def stats():
+    """ The hit and miss counters; another process only sees them when is_shared(). """
+    cache = get_cache()
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = values.get(HITS_KEY, 0), values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def invalidate(owner_id, resource):
+    cache = get_cache()
+    key = index_key(owner_id, resource)
+    cache.delete_many(list(cache.get(key, ())) + [key])
+
+
+@receiver(resource_changed)
+def invalidate_on_change(sender, owner_id, resource, **kwargs):
+    # Evict once the write is visible, or a concurrent reader could put the
+    # old rows right back
+    transaction.on_commit(lambda: invalidate(owner_id, resource))
+
+
+class CachedListMixin(ResourceVersionMixin):
+    """ Serve list responses from the per-user cache when possible. """
+
+    def list(self, request, *args, **kwargs):
+        cache = get_cache()
+        resource = self.get_resource()
+        key = 'lists:%s:%s:%s:%s' % (
+            request.user.pk, resource, self.get_resource_version(), self.get_variant_digest(),
+        )
+
+        data = cache.get(key)
+        if data is not None:
+            count(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        count(MISSES_KEY)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = getattr(settings, 'LIST_CACHE_TIMEOUT', 300)
+            cache.set(key, response.data, timeout)
+            # Indexed under every resource whose writes supersede it
+            for keys in [index_key(request.user.pk, name) for name in [resource, *self.get_included_resources()]]:
+                cache.set(keys, set(cache.get(keys, ())) | {key}, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
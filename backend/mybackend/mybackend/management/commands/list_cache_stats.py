@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mybackend import listcache
+
+
+class Command(BaseCommand):
+    help = (
+        "Show hit/miss counters of the list response cache. They live in the cache, so "
+        "this only sees the serving processes' counters when LIST_CACHE_REDIS_URL is set."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters afterwards.")
+
+    def handle(self, *args, **options):
+        if not listcache.is_shared():
+            raise CommandError(
+                "The list cache is in each process's local memory, so the counters of the "
+                "processes serving requests can't be read from here. Set LIST_CACHE_REDIS_URL "
+                "to share it, or watch the X-Cache header on the list responses."
+            )
+        stats = listcache.stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit rate: {stats['hit_rate']:.1%}"
+        )
+        if options['reset']:
+            listcache.get_cache().delete_many([listcache.HITS_KEY, listcache.MISSES_KEY])
@@ -0,0 +1,272 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (a.k.a. seek) pagination over the ordering the view's queryset
+    already has, e.g. ``-created_at`` for tasks or ``date, time`` for
+    appointments. The primary key is appended as a tie-breaker so every
+    position is unique, and pages are fetched with a ``WHERE`` on the last
+    seen row instead of an ``OFFSET`` scan.
+
+    Cursors are opaque to the client; they only need to follow the
+    ``next`` / ``previous`` links.
+
+    With ``?compact=true`` the page comes as ``columns``, the field names,
+    and ``rows``, one array of values per result, instead of ``results``,
+    so the names aren't repeated (and encoded) for every row.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    compact_query_param = 'compact'
+    max_page_size = 200
+    invalid_cursor_message = 'Invalid cursor'
+    page_size = api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        queryset = self.get_page_queryset(queryset, request)
+        return self.paginate_rows(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request):
+        """ paginate_queryset() for async views, fetching the page with the async ORM. """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        queryset = self.get_page_queryset(queryset, request)
+        return self.paginate_rows([row async for row in queryset[:self.page_size + 1]])
+
+    def paginate_rows(self, rows):
+        """ Set up the links from the page's rows, fetched with one row extra. """
+        position, reverse = self.position, self.reverse
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        # An empty page can only happen if the rows around a cursor were
+        # deleted; we still want the client to be able to walk back.
+        if rows:
+            self.next_position = self.get_position(rows[-1])
+            self.previous_position = self.get_position(rows[0])
+        else:
+            self.next_position = self.previous_position = position
+
+        return rows
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the queryset for the requested page, before slicing. This is
+        the query the list views actually run, so it is what the indexes
+        have to serve.
+        """
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [(name, not desc) for name, desc in ordering]
+
+        queryset = queryset.order_by(*self.order_by_expressions(ordering))
+        if self.position is not None:
+            queryset = queryset.filter(self.after_position(ordering, self.position))
+        return queryset
+
+    def get_paginated_response(self, data):
+        if self.request.query_params.get(self.compact_query_param) in ('1', 'true'):
+            columns = self.get_columns(data)
+            return Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('columns', columns),
+                ('rows', [[row.get(name) for name in columns] for row in data]),
+            ]))
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_columns(self, data):
+        # From the serializer, so an empty page has them too
+        serializer = getattr(data, 'serializer', None)
+        if serializer is not None and hasattr(serializer, 'child'):
+            return [name for name, field in serializer.child.fields.items() if not field.write_only]
+        return list(data[0]) if data else []
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Turn the queryset's ``order_by()`` into ``[(field, descending), ...]``
+        and make it unique by appending the primary key.
+        """
+        ordering = []
+        for name in queryset.query.order_by or ('-pk',):
+            if not isinstance(name, str):
+                raise TypeError('KeysetPagination only supports ordering by field names.')
+            desc = name.startswith('-')
+            name = name.lstrip('-')
+            if name == 'pk':
+                name = self.model._meta.pk.name
+            ordering.append((name, desc))
+
+        pk_name = self.model._meta.pk.name
+        if pk_name not in [name for name, _ in ordering]:
+            ordering.append((pk_name, ordering[0][1]))
+        return ordering
+
+    # NULLs always sort "before" in ascending order and "after" in descending
+    # order, so that the same index can be walked in both directions.
+
+    def is_nullable(self, name):
+        return self.model._meta.get_field(name).null
+
+    def order_by_expressions(self, ordering):
+        expressions = []
+        for name, desc in ordering:
+            if not self.is_nullable(name):
+                expressions.append(F(name).desc() if desc else F(name).asc())
+            elif desc:
+                expressions.append(F(name).desc(nulls_last=True))
+            else:
+                expressions.append(F(name).asc(nulls_first=True))
+        return expressions
+
+    def after_position(self, ordering, position):
+        """
+        Build the lexicographic ``(a, b, c) > (x, y, z)`` condition for the
+        given ordering, taking NULLs into account.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, desc), value in zip(ordering, position):
+            condition |= equal & self.after_value(name, desc, value)
+            if value is None:
+                equal &= Q(**{'%s__isnull' % name: True})
+            else:
+                equal &= Q(**{name: value})
+        return condition
+
+    def after_value(self, name, desc, value):
+        if desc:
+            if value is None:
+                return Q(pk__in=[])
+            condition = Q(**{'%s__lt' % name: value})
+            if self.is_nullable(name):
+                condition |= Q(**{'%s__isnull' % name: True})
+            return condition
+        if value is None:
+            return Q(**{'%s__isnull' % name: False})
+        return Q(**{'%s__gt' % name: value})
+
+    def get_position(self, instance):
+        return [getattr(instance, self.model._meta.get_field(name).attname) for name, _ in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        payload = {'p': [self.dump_value(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                None if value is None else self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def dump_value(value):
+        # Keep full precision; DjangoJSONEncoder would truncate microseconds.
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.compact_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Return the page as columns and rows of values.',
+                'schema': {'type': 'boolean'},
+            },
+        ]
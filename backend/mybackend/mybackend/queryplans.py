@@ -0,0 +1,45 @@
+"""
+EXPLAIN checks for the apps' tests, the way budgets.py checks query counts.
+
+An index only helps if SQLite picks it for the query the view actually
+runs. QueryPlanTestMixin builds that query, the list view's page with the
+paginator's WHERE and ORDER BY, and fails when the plan doesn't name the
+index or sorts in a temporary B-tree instead of reading the index in order.
+"""
+from urllib.parse import parse_qs, urlparse
+
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+
+class QueryPlanTestMixin:
+    """
+    For an app's TestCase. `view_class` is the list view served at `url`;
+    setUp creates `self.user` with a few rows in it.
+    """
+    view_class = None
+    url = None
+
+    def list_queryset(self, params=None):
+        """ The queryset a page of the list runs, before slicing. """
+        request = Request(APIRequestFactory().get(self.url, params or {}))
+        request.user = self.user
+        view = self.view_class(request=request, format_kwarg=None)
+        return view.paginator.get_page_queryset(view.filter_queryset(view.get_queryset()), request)
+
+    def next_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        next_link = client.get(self.url, {'page_size': 1}).data['next']
+        return parse_qs(urlparse(next_link).query)['cursor'][0]
+
+    def assertUsesIndex(self, queryset, index):
+        """ `queryset` is served by `index`, without a sort of its own. """
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def check_list_plans(self, index):
+        """ The first page and the page after a cursor both read `index`. """
+        self.assertUsesIndex(self.list_queryset(), index)
+        self.assertUsesIndex(self.list_queryset({'cursor': self.next_cursor()}), index)
@@ -0,0 +1,128 @@
+"""
+Reads from read replicas, for the list and detail endpoints.
+
+Only views with ReplicaReadMixin (or replica_reads on the async views)
+read from a replica, and only for GET and HEAD once the user has been
+authenticated: everything else, authentication included, reads and writes
+the primary. A request that writes reads the primary from then on, and so
+does the user for REPLICA_PIN_SECONDS after it, so they see their own
+writes while the replicas catch up.
+
+The replicas are the DATABASE_REPLICAS aliases in DATABASES; see
+mybackend/database.py for setting them up. With none, nothing changes.
+The pins live in the REPLICA_PIN_CACHE cache, which the workers have to
+share (Redis): with local memory, only the worker that served the write
+knows about it.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_request = ContextVar('replica_request', default=None)
+
+
+class RequestState:
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def pin_key(user_id):
+    return 'replicas:pinned:%s' % user_id
+
+
+def user_id(request):
+    # DRF sets request.user on the Django request as well
+    return getattr(getattr(request, 'user', None), 'pk', None)
+
+
+def read_from_replica(request):
+    """ Let the rest of this request read from a replica, unless the user wrote recently. """
+    state = _request.get()
+    if state is None or not settings.DATABASE_REPLICAS or request.method not in ('GET', 'HEAD'):
+        return
+    if state.wrote or caches[settings.REPLICA_PIN_CACHE].get(pin_key(request.user.pk)):
+        return
+    state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaReadMixin:
+    """ For DRF views whose GETs may read from a replica. """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        read_from_replica(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Keeps track of each request's writes and pins the user to the primary
+    after one. Runs either way, so ASGI doesn't hold a thread per request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestState()
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            pinned = user_id(request)
+            if pinned is not None:
+                caches[settings.REPLICA_PIN_CACHE].set(pin_key(pinned), True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestState()
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            # A session user is loaded lazily, with a query
+            pinned = await sync_to_async(user_id)(request)
+            if pinned is not None:
+                await caches[settings.REPLICA_PIN_CACHE].aset(pin_key(pinned), True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _request.get()
+        if state is None or state.replica is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads in a transaction see what it wrote
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get the schema from the primary
+        return db == DEFAULT_DB_ALIAS
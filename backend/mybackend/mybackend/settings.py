@@ -13,6 +13,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from .database import database_from_env, replicas_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,14 +42,24 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'users',
     'tasks',
     'contacts',
-    'appointments'
+    'appointments',
+    'outbox',
+    'sync',
+    'agenda',
+    'export',
+    # For the management commands of the project-wide modules, e.g. listcache
+    'mybackend',
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers the other middleware
+    'mybackend.timing.ServerTimingMiddleware',
+    'mybackend.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -56,9 +68,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mybackend.replicas.ReplicaRoutingMiddleware',
 ]
 
-ROOT_URLCONF = 'mybackend.urls'
+# asgi.py switches to mybackend.urls_async, which serves the async views
+ROOT_URLCONF = os.environ.get('DJANGO_URLCONF', 'mybackend.urls')
 
 TEMPLATES = [
     {
@@ -81,13 +95,57 @@ WSGI_APPLICATION = 'mybackend.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# SQLite unless DATABASE_URL is set; see mybackend/database.py
 
 DATABASES = {
+    'default': database_from_env(os.environ, BASE_DIR / 'db.sqlite3'),
+    **replicas_from_env(os.environ),
+}
+
+# List and detail GETs read from these; see mybackend/replicas.py
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['mybackend.replicas.PrimaryReplicaRouter']
+# How long a user reads from the primary after writing, to see their own
+# writes while the replicas catch up
+REPLICA_PIN_SECONDS = 5
+# Where the pins are kept. It has to be shared between workers, so with
+# replicas set LIST_CACHE_REDIS_URL too: with local memory, a user's next
+# request can land on a worker that doesn't know they wrote, and miss
+# their own write
+REPLICA_PIN_CACHE = 'lists'
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The 'lists' cache holds per-user list responses. Local memory is fine for a
+# single process; point LIST_CACHE_REDIS_URL at a shared Redis to share it
+# between workers. Either way the least recently used entries are evicted.
+# Redis needs the redis package (pip install redis), which requirements.txt
+# leaves out since local memory is the default. Only a shared cache lets
+# `manage.py list_cache_stats` see the workers' hit/miss counters.
+
+LIST_CACHE_REDIS_URL = os.environ.get('LIST_CACHE_REDIS_URL')
+LIST_CACHE_TIMEOUT = 300
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'lists': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'list-responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
 }
+if LIST_CACHE_REDIS_URL:
+    # Bound it with maxmemory and an allkeys-lru maxmemory-policy
+    CACHES['lists'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': LIST_CACHE_REDIS_URL,
+        'KEY_PREFIX': 'pa',
+    }
 
 
 # Password validation
@@ -108,6 +166,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Threads the async views hash passwords on (see users/hashing.py); logins
+# beyond this many wait for a free one
+PASSWORD_HASHING_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# Request timing
+# The share of requests, from 0 to 1, that answer with a Server-Timing header
+# and log where their time went; see mybackend/timing.py
+
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', 0))
+
+# Responses smaller than this many bytes go out uncompressed; see
+# mybackend/compression.py
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'mybackend.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -136,11 +227,25 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Rest framework settings
 REST_FRAMEWORK = {
   'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication with an in-process cache of users
+        'mybackend.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated'  
     ],
+    # List endpoints page through the view's own ordering with opaque cursors
+    'DEFAULT_PAGINATION_CLASS': 'mybackend.pagination.KeysetPagination',
+    # orjson in and out; see mybackend/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'mybackend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'mybackend.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'PAGE_SIZE': 50,
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -174,6 +279,30 @@ SIMPLE_JWT = {
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
     "JTI_CLAIM": "jti",
+
+    # Both put the user's name and email in the tokens, so /api/users/me/
+    # can answer without a database lookup (see users/tokens.py)
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.ProfileTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.ProfileTokenRefreshSerializer",
 }
 
+# Users resolved from access tokens are kept for JWT_USER_CACHE_TTL seconds,
+# at most JWT_USER_CACHE_SIZE of them per process. Saving or deleting a user
+# drops it from this process's cache straight away. JWT_STATELESS_USERS=1
+# builds users from the token claims instead, with no lookup at all.
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_TTL = 60
+JWT_STATELESS_USERS = os.environ.get('JWT_STATELESS_USERS') == '1'
+
+# Refresh tokens are checked against the blacklist through a Bloom filter in
+# each process (see users/blacklist.py); only possible hits are looked up.
+# The filter is filled TOKEN_BLACKLIST_LOAD_BATCH rows per refresh, and
+# tokens blacklisted by other processes are picked up within
+# TOKEN_BLACKLIST_SYNC_INTERVAL seconds. Run `manage.py prune_tokens` from
+# cron to delete expired tokens.
+TOKEN_BLACKLIST_CACHE = True
+TOKEN_BLACKLIST_BLOOM_CAPACITY = 2000000
+TOKEN_BLACKLIST_SYNC_INTERVAL = 1.0
+TOKEN_BLACKLIST_LOAD_BATCH = 2000
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
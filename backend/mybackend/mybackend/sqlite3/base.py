@@ -0,0 +1,37 @@
+"""
+Django's SQLite backend with two extra OPTIONS, for serving the app from a
+SQLite file (see mybackend/database.py for the values used):
+
+- 'pragmas': PRAGMAs to run on every new connection, by tune_connection().
+- 'transaction_mode': 'IMMEDIATE' starts transactions with BEGIN IMMEDIATE,
+  like the option of the same name in Django 5.1. A deferred transaction
+  that reads before it writes can't wait for the write lock once another
+  connection has it; SQLite fails it right away with "database is locked",
+  whatever the busy timeout. Taking the lock up front lets it wait.
+"""
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+from django.dispatch import receiver
+
+EXTRA_OPTIONS = ('pragmas', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # These aren't sqlite3.connect() arguments
+        for option in EXTRA_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
+
+
+@receiver(connection_created, sender=DatabaseWrapper)
+def tune_connection(sender, connection, **kwargs):
+    with connection.cursor() as cursor:
+        for name, value in connection.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
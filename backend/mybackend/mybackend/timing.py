@@ -0,0 +1,174 @@
+"""
+Where the time of a request goes, for a sample of requests.
+
+ServerTimingMiddleware picks SERVER_TIMING_SAMPLE_RATE of the requests.
+For those it counts and times the queries, adds up the spans the app
+reports with timed() - JWT authentication, serialization and rendering -
+and hands the totals back in a Server-Timing header (browsers show it in
+the network panel) and a log line tagged with the URL name. Spans overlap:
+queries a serializer triggers count towards both db and ser.
+
+A request that isn't sampled costs a random() call, and each span a
+context variable lookup. Under ASGI the middleware stays async; the
+queries are counted on the request's thread for sync code, which is
+where the async ORM runs them too.
+"""
+import logging
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_timings = ContextVar('request_timings', default=None)
+
+# In the order they are reported
+SPANS = ('auth', 'ser', 'render')
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.queries = 0
+        self.spans = dict.fromkeys(SPANS + ('db',), 0.0)
+        self.serializing = False
+
+    def time_query(self, execute, sql, params, many, context):
+        # Like DEBUG's query log this times execute(); rows the driver
+        # fetches later (SQLite does, past the first) aren't included
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.spans['db'] += perf_counter() - start
+            self.queries += 1
+
+    def metrics(self, total):
+        """ Milliseconds per span, plus the query count. """
+        metrics = {f'{name}_ms': round(seconds * 1000, 2) for name, seconds in self.spans.items()}
+        metrics.update(queries=self.queries, total_ms=round(total * 1000, 2))
+        return metrics
+
+    def header(self, total):
+        parts = [f'db;dur={self.spans["db"] * 1000:.2f};desc="{self.queries} queries"']
+        parts += [f'{name};dur={self.spans[name] * 1000:.2f}' for name in SPANS if self.spans[name]]
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def timed(name):
+    """ Add the time the with block takes to span `name` of the request, if it is sampled. """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans[name] += perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """ Reports to_representation() as the 'ser' span; nested serializers are part of their parent's. """
+
+    def to_representation(self, instance):
+        timings = _timings.get()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        timings.serializing = True
+        start = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializing = False
+            timings.spans['ser'] += perf_counter() - start
+
+
+def sampled():
+    rate = settings.SERVER_TIMING_SAMPLE_RATE
+    return rate and random.random() < rate
+
+
+def time_queries(stack, timings):
+    """ Count the queries on this thread's connections until `stack` closes. """
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(timings.time_query))
+
+
+class ServerTimingMiddleware:
+    """ Goes first in MIDDLEWARE, so the total covers the rest. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                time_queries(stack, timings)
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.report(request, response, timings, perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not sampled():
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = perf_counter()
+        try:
+            stack = ExitStack()
+            # Sync code and the async ORM share the request's thread and its connections
+            await sync_to_async(time_queries)(stack, timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _timings.reset(token)
+        return self.report(request, response, timings, perf_counter() - start)
+
+    def report(self, request, response, timings, total):
+        response['Server-Timing'] = timings.header(total)
+        match = request.resolver_match
+        metrics = {
+            'url': match.view_name if match else 'unresolved',
+            'method': request.method,
+            'status': response.status_code,
+            **timings.metrics(total),
+        }
+        # logfmt, for log search; handlers that want the fields get them as record.timing
+        logger.info(' '.join(f'{name}={value}' for name, value in metrics.items()), extra={'timing': metrics})
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        timings = _timings.get()
+        if timings is not None:
+            start = perf_counter()
+
+            def rendered(response):
+                timings.spans['render'] += perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
@@ -7,4 +7,7 @@ urlpatterns = [
     path('api/tasks/', include('tasks.urls')),
     path('api/contacts/', include('contacts.urls')),
     path('api/appointments/', include('appointments.urls')),
+    path('api/sync/', include('sync.urls')),
+    path('api/agenda/', include('agenda.urls')),
+    path('api/export/', include('export.urls')),
 ]
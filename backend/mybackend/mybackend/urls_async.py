@@ -0,0 +1,26 @@
+"""
+URLs for ASGI: the task, contact, appointment and auth endpoints are served
+by their async views (mybackend/asyncviews.py), at the same paths.
+Everything else falls through to the DRF views in urls.py. The names are
+urls.py's, so the timing logs and reverse() see the same routes.
+"""
+from django.urls import path
+
+from appointments.views import AsyncAppointmentListCreate, AsyncAppointmentRetrieveUpdateDestroy
+from contacts.views import AsyncContactListCreate, AsyncContactRetrieveUpdateDestroy
+from tasks.views import AsyncTaskListCreate, AsyncTaskRetrieveUpdateDestroy
+from users.views import AsyncAuthStatus, AsyncLogin, AsyncPasswordResetConfirm, AsyncUserProfile
+from . import urls
+
+urlpatterns = [
+    path('api/users/login/', AsyncLogin.as_view(), name='login_user'),
+    path('api/users/password-reset-confirm/', AsyncPasswordResetConfirm.as_view(), name='password_reset_confirm'),
+    path('api/users/profile/', AsyncUserProfile.as_view(), name='get_user_profile'),
+    path('api/users/me/', AsyncAuthStatus.as_view(), name='user-detail'),
+    path('api/tasks/', AsyncTaskListCreate.as_view(), name='task-list-create'),
+    path('api/tasks/<int:pk>/', AsyncTaskRetrieveUpdateDestroy.as_view(), name='task-detail'),
+    path('api/contacts/', AsyncContactListCreate.as_view(), name='contact-list-create'),
+    path('api/contacts/<int:pk>/', AsyncContactRetrieveUpdateDestroy.as_view(), name='contact-detail'),
+    path('api/appointments/', AsyncAppointmentListCreate.as_view(), name='appointment-list-create'),
+    path('api/appointments/<int:pk>/', AsyncAppointmentRetrieveUpdateDestroy.as_view(), name='appointment-detail'),
+] + urls.urlpatterns
@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import OutboxEmail
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    # The bodies hold live password-reset and activation links, so they are
+    # neither shown nor searchable by recipient
+    search_fields = ('subject', 'last_error')
+    exclude = ('message',)
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
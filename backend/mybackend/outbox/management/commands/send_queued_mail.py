@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from outbox import worker
+
+# Seconds between purges when running with --loop
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver the emails waiting in the outbox, and purge the ones sent or failed "
+        "more than --retention-days ago."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=worker.BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=worker.MAX_ATTEMPTS)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running and poll the outbox instead of exiting once it is empty.",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Seconds to sleep between polls when running with --loop.",
+        )
+        parser.add_argument(
+            '--retention-days', type=float, default=worker.RETENTION / timedelta(days=1),
+            help="Days to keep sent and failed emails for. With --loop they are purged once an hour.",
+        )
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['retention_days'])
+        purged_at = None
+        while True:
+            if purged_at is None or time.monotonic() - purged_at >= PURGE_INTERVAL:
+                purged = worker.purge(retention)
+                purged_at = time.monotonic()
+                if purged:
+                    self.stdout.write(f"Purged {purged} sent or failed email(s).")
+            sent, failed = worker.drain_outbox(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+            )
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Sent {sent} email(s), {failed} permanently failed.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import worker
+from .models import OutboxEmail
+from .utils import queue_mail
+
+
+class FailingEmailBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        FailingEmailBackend.opened += 1
+
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP server went away')
+
+
+class OutboxTests(TestCase):
+
+    def test_registration_queues_instead_of_sending(self):
+        response = APIClient().post('/api/users/register/', {
+            'full_name': 'Ada Lovelace',
+            'email': 'ada@example.com',
+            'password': 'a-Strong-passw0rd',
+            'password_confirm': 'a-Strong-passw0rd',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().recipient_list, ['ada@example.com'])
+
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ada@example.com'])
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.SENT)
+
+    def test_drains_in_batches(self):
+        for i in range(5):
+            queue_mail(f'Subject {i}', 'Body', 'from@example.com', [f'user{i}@example.com'])
+
+        self.assertEqual(worker.drain_outbox(batch_size=2), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(worker.drain_outbox(batch_size=2), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='outbox.tests.FailingEmailBackend')
+    def test_failures_back_off_then_give_up(self):
+        FailingEmailBackend.opened = 0
+        for i in range(3):
+            queue_mail(f'Subject {i}', 'Body', 'from@example.com', ['user@example.com'])
+
+        self.assertEqual(worker.drain_outbox(max_attempts=2), (0, 0))
+        self.assertEqual(FailingEmailBackend.opened, 1)
+        email = OutboxEmail.objects.first()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTP server went away', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet, so nothing is retried
+        self.assertEqual(worker.drain_outbox(max_attempts=2), (0, 0))
+        self.assertEqual(OutboxEmail.objects.get(pk=email.pk).attempts, 1)
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(worker.drain_outbox(max_attempts=2), (0, 3))
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.FAILED).exists())
+
+    def test_reclaims_rows_from_a_dead_worker(self):
+        email = queue_mail('Subject', 'Body', 'from@example.com', ['user@example.com'])
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            status=OutboxEmail.SENDING,
+            claimed_at=timezone.now() - worker.CLAIM_TIMEOUT - timedelta(seconds=1),
+        )
+        self.assertEqual(worker.drain_outbox(), (1, 0))
+
+    def test_purges_sent_and_failed_emails_after_the_retention(self):
+        old = timezone.now() - worker.RETENTION - timedelta(seconds=1)
+        recent = timezone.now() - timedelta(hours=1)
+        rows = {
+            'old sent': (OutboxEmail.SENT, {'sent_at': old}),
+            'recent sent': (OutboxEmail.SENT, {'sent_at': recent}),
+            'old failed': (OutboxEmail.FAILED, {'claimed_at': old}),
+            'recent failed': (OutboxEmail.FAILED, {'claimed_at': recent}),
+            'old pending': (OutboxEmail.PENDING, {'created_at': old}),
+        }
+        for subject, (status, fields) in rows.items():
+            email = queue_mail(subject, 'Reset link', 'from@example.com', ['user@example.com'])
+            OutboxEmail.objects.filter(pk=email.pk).update(status=status, **fields)
+
+        call_command('send_queued_mail', stdout=StringIO())
+        self.assertEqual(
+            sorted(OutboxEmail.objects.values_list('subject', flat=True)),
+            ['old pending', 'recent failed', 'recent sent'],
+        )
@@ -0,0 +1,14 @@
+from .models import OutboxEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Drop-in replacement for `send_mail` that stores the email in the outbox.
+    Call it inside the same transaction as the change that caused the email.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipient_list=list(recipient_list),
+    )
@@ -0,0 +1,116 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+# Retry after 30s, 1m, 2m, 4m... but never wait more than an hour
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# A claimed row that is still 'sending' after this long belongs to a dead worker
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Sent and failed rows are kept this long, then purged: their bodies hold
+# password-reset and activation links
+RETENTION = timedelta(days=7)
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """
+    Mark up to `batch_size` due emails as ours and return them. The claim is a
+    single conditional UPDATE, so several workers can run side by side
+    without sending the same email twice.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = (
+        Q(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+        | Q(status=OutboxEmail.SENDING, claimed_at__lt=now - CLAIM_TIMEOUT)
+    )
+    ids = OutboxEmail.objects.filter(due).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size]
+    OutboxEmail.objects.filter(due, id__in=list(ids)).update(
+        status=OutboxEmail.SENDING, claimed_at=now, claim_token=token,
+    )
+    return list(OutboxEmail.objects.filter(claim_token=token, status=OutboxEmail.SENDING).order_by('id'))
+
+
+def send_batch(emails, connection, max_attempts=MAX_ATTEMPTS):
+    """
+    Send the claimed emails over one connection and record the outcome of
+    each with a single bulk update. Returns (sent, failed) counts.
+    """
+    sent = failed = 0
+    for email in emails:
+        message = EmailMessage(
+            subject=email.subject,
+            body=email.message,
+            from_email=email.from_email,
+            to=email.recipient_list,
+            connection=connection,
+        )
+        email.attempts += 1
+        email.claim_token = ''
+        try:
+            message.send()
+        except Exception as exc:
+            logger.warning('Sending outbox email %s failed (attempt %s): %s', email.pk, email.attempts, exc)
+            email.last_error = str(exc)
+            if email.attempts >= max_attempts:
+                email.status = OutboxEmail.FAILED
+                failed += 1
+            else:
+                email.status = OutboxEmail.PENDING
+                email.next_attempt_at = timezone.now() + backoff(email.attempts)
+        else:
+            email.status = OutboxEmail.SENT
+            email.sent_at = timezone.now()
+            email.last_error = ''
+            sent += 1
+
+    OutboxEmail.objects.bulk_update(
+        emails,
+        ['status', 'attempts', 'next_attempt_at', 'claim_token', 'last_error', 'sent_at'],
+    )
+    return sent, failed
+
+
+def drain_outbox(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, connection=None):
+    """
+    Send every email that is currently due, batch by batch, reusing a single
+    mail connection. Returns (sent, failed) totals.
+    """
+    connection = connection or get_connection()
+    total_sent = total_failed = 0
+    with connection:
+        while True:
+            emails = claim_batch(batch_size)
+            if not emails:
+                break
+            sent, failed = send_batch(emails, connection, max_attempts)
+            total_sent += sent
+            total_failed += failed
+            if len(emails) < batch_size:
+                break
+    return total_sent, total_failed
+
+
+def purge(retention=RETENTION):
+    """
+    Delete the emails that were sent, or last tried before failing for good,
+    more than `retention` ago. Returns the number deleted.
+    """
+    cutoff = timezone.now() - retention
+    done = Q(status=OutboxEmail.SENT, sent_at__lt=cutoff) | Q(status=OutboxEmail.FAILED, claimed_at__lt=cutoff)
+    deleted, _ = OutboxEmail.objects.filter(done).delete()
+    return deleted
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Tombstone
+
+
+class TombstoneAdmin(admin.ModelAdmin):
+    list_display = ('resource', 'object_id', 'owner', 'deleted_at')
+    list_filter = ('resource',)
+
+admin.site.register(Tombstone, TombstoneAdmin)
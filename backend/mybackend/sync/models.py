@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+
+class Tombstone(models.Model):
+    """ Left behind when a synced row is deleted, so clients can drop it too. """
+    RESOURCE_CHOICES = [
+        ('tasks', 'Tasks'),
+        ('contacts', 'Contacts'),
+        ('appointments', 'Appointments'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tombstones")
+    resource = models.CharField(max_length=20, choices=RESOURCE_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'deleted_at'], name='tombstone_owner_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} #{self.object_id} deleted at {self.deleted_at}"
+
+
+class ResourceVersion(models.Model):
+    """
+    A counter per user and resource that goes up on every write. It is the
+    cheap version stamp behind the list endpoints' ETags.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="resource_versions")
+    resource = models.CharField(max_length=20, choices=Tombstone.RESOURCE_CHOICES)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'resource'], name='unique_owner_resource_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}/{self.resource} v{self.version}"
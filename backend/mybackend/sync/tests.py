@@ -0,0 +1,154 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from mybackend.budgets import BudgetTestMixin
+from tasks.models import Task
+from .models import Tombstone
+from .views import encode_token
+
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_only_changes_since_the_token_are_returned(self):
+        old = Task.objects.create(owner=self.user, description='Old')
+        gone = Contact.objects.create(owner=self.user, name='Gone')
+        since = encode_token(timezone.now())
+
+        new = Task.objects.create(owner=self.user, description='New')
+        gone_id = gone.id
+        gone.delete()
+
+        data = self.sync(since)
+        self.assertEqual([task['id'] for task in data['tasks']], [new.id])
+        self.assertEqual(data['contacts'], [])
+        self.assertEqual(data['deleted']['contacts'], [gone_id])
+        self.assertNotIn(old.id, data['deleted']['tasks'])
+
+    def test_full_sync_without_token(self):
+        Task.objects.create(owner=self.user, description='Task')
+        Contact.objects.create(owner=self.user, name='Contact')
+        data = self.sync()
+        self.assertEqual(len(data['tasks']), 1)
+        self.assertEqual(len(data['contacts']), 1)
+        self.assertTrue(data['token'])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_full_sync_comes_in_pages(self):
+        tasks = [Task.objects.create(owner=self.user, description=str(i)).id for i in range(3)]
+        contacts = [Contact.objects.create(owner=self.user, name=str(i)).id for i in range(2)]
+        appointments = [Appointment.objects.create(owner=self.user, title='Meeting').id]
+        Task.objects.create(owner=User.objects.create_user('other', 'other@example.com', 'password'), description='x')
+
+        pages, cursor = [], None
+        while True:
+            response = self.client.get('/api/sync/', {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            cursor = response.data['next']
+            if not cursor:
+                break
+
+        self.assertEqual(
+            [[item['id'] for resource in ('tasks', 'contacts', 'appointments') for item in page[resource]]
+             for page in pages],
+            [tasks[:2], tasks[2:] + contacts[:1], contacts[1:] + appointments],
+        )
+        # Every page hands out the token of the first, so nothing written meanwhile is missed
+        self.assertEqual({page['token'] for page in pages}, {pages[0]['token']})
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_changes_come_in_pages(self):
+        Task.objects.create(owner=self.user, description='Before')
+        since = encode_token(timezone.now())
+        tasks = [Task.objects.create(owner=self.user, description=str(i)) for i in range(2)]
+        contact = Contact.objects.create(owner=self.user, name='Contact')
+        gone = [Appointment.objects.create(owner=self.user, title=str(i)) for i in range(2)]
+        gone_ids = [appointment.id for appointment in gone]
+        for appointment in gone:
+            appointment.delete()
+        # Edited while the client pages through: it comes again, later
+        tasks[0].description = 'Edited'
+        tasks[0].save()
+
+        pages, params = [], {'since': since}
+        while True:
+            response = self.client.get('/api/sync/', params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            if not response.data['next']:
+                break
+            params = {'cursor': response.data['next']}
+
+        self.assertEqual(
+            [([item['id'] for item in page['tasks']], [item['id'] for item in page['contacts']],
+              page['deleted']['appointments']) for page in pages],
+            [([tasks[1].id, tasks[0].id], [], []), ([], [contact.id], gone_ids[:1]), ([], [], gone_ids[1:])],
+        )
+        self.assertEqual({page['token'] for page in pages}, {pages[0]['token']})
+
+    def test_attendee_changes_touch_the_appointment(self):
+        contact = Contact.objects.create(owner=self.user, name='Guest')
+        appointment = Appointment.objects.create(owner=self.user, title='Meeting')
+        since = encode_token(timezone.now())
+
+        appointment.attendees.add(contact)
+        self.assertEqual([item['id'] for item in self.sync(since)['appointments']], [appointment.id])
+
+        since = encode_token(timezone.now())
+        contact.delete()
+        self.assertEqual([item['id'] for item in self.sync(since)['appointments']], [appointment.id])
+
+    def test_bulk_delete_leaves_tombstones(self):
+        tasks = [Task.objects.create(owner=self.user, description=str(i)) for i in range(3)]
+        response = self.client.post('/api/tasks/bulk/', {'delete': [task.id for task in tasks]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(resource='tasks').values_list('object_id', flat=True)),
+            [task.id for task in tasks],
+        )
+
+    def test_deleting_the_user_leaves_no_tombstones(self):
+        Task.objects.create(owner=self.user, description='Task')
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'nope'}).status_code, 400)
+        expired = encode_token(timezone.now() - timezone.timedelta(days=365))
+        self.assertEqual(self.client.get('/api/sync/', {'since': expired}).status_code, 410)
+        self.assertEqual(self.client.get('/api/sync/', {'cursor': 'nope'}).status_code, 400)
+
+
+
+class SyncBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/sync/'
+
+    def test_budgets(self):
+        def changes(rows):
+            owner = self.create_owner()
+            since = encode_token(timezone.now())
+            Task.objects.bulk_create(Task(owner=owner, description=f'Task {i}') for i in range(rows))
+            contacts = Contact.objects.bulk_create(Contact(owner=owner, name=f'Contact {i}') for i in range(rows))
+            for i in range(rows):
+                Appointment.objects.create(owner=owner, title=f'Meeting {i}').attendees.set(contacts[:3])
+            Tombstone.objects.bulk_create(
+                Tombstone(owner=owner, resource='tasks', object_id=1000 + i) for i in range(rows)
+            )
+            client = self.client_for(owner)
+            return lambda: client.get('/api/sync/', {'since': since})
+
+        self.check_budgets({('sync_changes', 'GET'): changes})
@@ -0,0 +1,168 @@
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from tasks.models import Task
+from .models import ResourceVersion, Tombstone
+
+# Model -> resource name used by the sync endpoint and the version stamps
+TRACKED_MODELS = {
+    Task: 'tasks',
+    Contact: 'contacts',
+    Appointment: 'appointments',
+}
+TRACKED_MODELS_BY_RESOURCE = {resource: model for model, resource in TRACKED_MODELS.items()}
+
+
+class PendingChanges:
+    """ Work the receivers defer while a batch is being written. """
+
+    def __init__(self):
+        self.tombstones = []
+        self.versions = set()
+
+    def flush(self):
+        Tombstone.objects.bulk_create(self.tombstones)
+        for owner_id, resource in sorted(self.versions):
+            bump_version(owner_id, resource)
+
+
+# Sent with owner_id and resource after a resource's version was bumped
+resource_changed = Signal()
+
+# Set while track_batch() is active; receivers queue their work here instead
+# of issuing queries for every row.
+_pending = ContextVar('pending_changes', default=None)
+
+
+class track_batch:
+    """
+    Context manager for writes that touch many rows at once: tombstones
+    are written with one INSERT and each version is bumped once. Writes
+    that skip signals (bulk_create, bulk_update) register themselves with
+    `changed()`. Nested batches fold into the outermost one.
+    """
+
+    def __enter__(self):
+        self.pending = _pending.get()
+        self.token = None
+        if self.pending is None:
+            self.pending = PendingChanges()
+            self.token = _pending.set(self.pending)
+        return self.pending
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.token is None:
+            return
+        _pending.reset(self.token)
+        if exc_type is None:
+            self.pending.flush()
+
+
+def changed(owner_id, resource):
+    """ Note that `resource` changed for the owner, now or at the end of the batch. """
+    pending = _pending.get()
+    if pending is None:
+        bump_version(owner_id, resource)
+    else:
+        pending.versions.add((owner_id, resource))
+
+
+def bump_version(owner_id, resource):
+    versions = ResourceVersion.objects.filter(owner_id=owner_id, resource=resource)
+    if not versions.update(version=F('version') + 1):
+        try:
+            with transaction.atomic():
+                ResourceVersion.objects.create(owner_id=owner_id, resource=resource, version=1)
+        except IntegrityError:
+            # Someone else created it in the meantime
+            versions.update(version=F('version') + 1)
+    resource_changed.send(sender=TRACKED_MODELS_BY_RESOURCE[resource], owner_id=owner_id, resource=resource)
+
+
+def current_versions(owner_id, resources):
+    """ The owner's versions of `resources`, in order, with one query. """
+    rows = ResourceVersion.objects.filter(owner_id=owner_id, resource__in=resources).values_list('resource', 'version')
+    versions = dict(rows)
+    return [versions.get(resource, 0) for resource in resources]
+
+
+async def acurrent_versions(owner_id, resources):
+    rows = ResourceVersion.objects.filter(owner_id=owner_id, resource__in=resources).values_list('resource', 'version')
+    versions = {resource: version async for resource, version in rows}
+    return [versions.get(resource, 0) for resource in resources]
+
+
+def owner_is_being_deleted(origin):
+    # Rows removed by a cascade from their owner don't need tracking
+    if isinstance(origin, QuerySet):
+        return origin.model is User
+    return isinstance(origin, User)
+
+
+def touch_appointments(queryset, owner_id):
+    """ Bump `updated_at` on appointments whose attendee list changed. """
+    queryset.update(updated_at=timezone.now())
+    changed(owner_id, 'appointments')
+
+
+def delete_tracked(queryset):
+    """
+    Delete every row in `queryset` with a constant number of queries,
+    instead of one tombstone INSERT per row through the post_delete receiver.
+    """
+    with transaction.atomic(), track_batch():
+        if queryset.model is Contact:
+            appointments = Appointment.objects.filter(attendees__in=queryset.values('pk'))
+            for owner_id in set(queryset.values_list('owner_id', flat=True)):
+                touch_appointments(appointments.filter(owner_id=owner_id), owner_id)
+        queryset.delete()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Contact)
+@receiver(post_save, sender=Appointment)
+def record_save(sender, instance, **kwargs):
+    changed(instance.owner_id, TRACKED_MODELS[sender])
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Contact)
+@receiver(post_delete, sender=Appointment)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if owner_is_being_deleted(origin):
+        return
+    resource = TRACKED_MODELS[sender]
+    tombstone = Tombstone(owner_id=instance.owner_id, resource=resource, object_id=instance.pk)
+    pending = _pending.get()
+    if pending is None:
+        tombstone.save()
+    else:
+        pending.tombstones.append(tombstone)
+    changed(instance.owner_id, resource)
+
+
+@receiver(pre_delete, sender=Contact)
+def touch_appointments_of_deleted_contact(sender, instance, origin=None, **kwargs):
+    # Deleting a contact silently drops it from attendee lists
+    if owner_is_being_deleted(origin) or _pending.get() is not None:
+        return
+    touch_appointments(Appointment.objects.filter(attendees=instance), instance.owner_id)
+
+
+@receiver(m2m_changed, sender=Appointment.attendees.through)
+def touch_appointments_on_attendee_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_appointments(Appointment.objects.filter(pk=instance.pk), instance.owner_id)
+    elif action in ('post_add', 'post_remove'):
+        touch_appointments(Appointment.objects.filter(pk__in=pk_set), instance.owner_id)
+    elif action == 'pre_clear':
+        touch_appointments(Appointment.objects.filter(attendees=instance), instance.owner_id)
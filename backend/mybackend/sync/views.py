@@ -0,0 +1,170 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from appointments.models import Appointment
+from appointments.serializers import AppointmentSerializer
+from appointments.views import with_attendees
+from contacts.models import Contact
+from contacts.serializers import ContactSerializer
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+from .models import Tombstone
+
+RESOURCES = [
+    ('tasks', Task, TaskSerializer),
+    ('contacts', Contact, ContactSerializer),
+    ('appointments', Appointment, AppointmentSerializer),
+]
+RESOURCE_MODELS = {resource: model for resource, model, _ in RESOURCES}
+RESOURCE_SERIALIZERS = {resource: serializer_class for resource, _, serializer_class in RESOURCES}
+
+# What a sync walks through, in order: the resources, then the tombstones
+SECTIONS = [resource for resource, _, _ in RESOURCES] + ['deleted']
+
+# Tokens are handed out slightly in the past so that a write whose
+# transaction commits while we read is picked up by the next sync.
+# Clients may see a row twice; applying a change is idempotent.
+CLOCK_SKEW = timedelta(seconds=5)
+
+
+def tombstone_retention():
+    return getattr(settings, 'SYNC_TOMBSTONE_RETENTION', timedelta(days=30))
+
+
+def sync_page_size():
+    return getattr(settings, 'SYNC_PAGE_SIZE', 500)
+
+
+def encode_token(moment):
+    return urlsafe_b64encode(moment.isoformat().encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    try:
+        moment = parse_datetime(urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+    except (ValueError, UnicodeError):
+        return None
+    if moment is None or timezone.is_naive(moment):
+        return None
+    return moment
+
+
+def encode_cursor(moment, since, section, position):
+    """
+    Where a paged sync goes on from: after `position`, the (time, id) of the
+    last row sent, in `section`, for the token of `moment`. `since` is None
+    for a full sync.
+    """
+    payload = {
+        't': moment.isoformat(),
+        's': since and since.isoformat(),
+        'r': section,
+        'p': position and [position[0].isoformat(), position[1]],
+    }
+    return urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+        moment, section = parse_datetime(payload['t']), payload['r']
+        since = None if payload['s'] is None else parse_datetime(payload['s'])
+        position = None
+        if payload['p'] is not None:
+            at, last_id = payload['p']
+            position = (parse_datetime(at), last_id)
+    except (TypeError, ValueError, KeyError, UnicodeError):
+        return None
+    moments = [moment] + ([since] if payload['s'] is not None else []) + ([position[0]] if position else [])
+    if any(value is None or timezone.is_naive(value) for value in moments):
+        return None
+    if section not in SECTIONS or (position is not None and not isinstance(position[1], int)):
+        return None
+    return moment, since, section, position
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Everything that changed for the user since `?since=<token>`, across
+    tasks, contacts and appointments, with the token for the next call.
+    Without `since` it is the full data set instead.
+
+    Either way the changes come a page at a time: tasks first, then
+    contacts, appointments and the deletions, each in the order they
+    changed. While `next` is set there is more: pass it back as `?cursor=`
+    to get the next page. Every page carries the token of the first, to
+    sync from once `next` is null.
+    """
+    now = timezone.now()
+    if request.query_params.get('cursor'):
+        cursor = decode_cursor(request.query_params['cursor'])
+        if cursor is None:
+            return Response({'error': 'Invalid sync cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        return sync_page(request, *cursor)
+
+    since = None
+    if request.query_params.get('since'):
+        since = decode_token(request.query_params['since'])
+        if since is None:
+            return Response({'error': 'Invalid sync token.'}, status=status.HTTP_400_BAD_REQUEST)
+    return sync_page(request, now - CLOCK_SKEW, since, SECTIONS[0], None)
+
+
+def sync_page(request, moment, since, start, position):
+    """
+    The page of a sync that starts after `position` in section `start`: up
+    to sync_page_size() rows, walking the sections in turn by (time, id).
+    """
+    # The tombstones that would have to be in it are gone
+    if (since or moment) < timezone.now() - tombstone_retention():
+        return Response({'error': 'Sync token has expired. Sync again without since.'},
+                        status=status.HTTP_410_GONE)
+
+    data = {'token': encode_token(moment), 'next': None, **{resource: [] for resource in RESOURCE_MODELS}}
+    deleted = {resource: [] for resource in RESOURCE_MODELS}
+    room = sync_page_size()
+    for section in SECTIONS[SECTIONS.index(start):]:
+        # A full sync has nothing to delete
+        if data['next'] or (section == 'deleted' and since is None):
+            break
+        if section == 'deleted':
+            queryset, moment_field = Tombstone.objects.filter(owner=request.user), 'deleted_at'
+        else:
+            model = RESOURCE_MODELS[section]
+            queryset, moment_field = model.objects.filter(owner=request.user), 'updated_at'
+            if model is Appointment:
+                queryset = with_attendees(queryset)
+        if since is not None:
+            queryset = queryset.filter(**{moment_field + '__gte': since})
+        if section == start and position is not None:
+            queryset = queryset.filter(
+                Q(**{moment_field + '__gt': position[0]}) | Q(**{moment_field: position[0], 'id__gt': position[1]})
+            )
+
+        # One row more than there is room for says whether this section goes on
+        rows = list(queryset.order_by(moment_field, 'id')[:room + 1])
+        if len(rows) > room:
+            rows = rows[:room]
+            last = (getattr(rows[-1], moment_field), rows[-1].id) if rows else (position if section == start else None)
+            data['next'] = encode_cursor(moment, since, section, last)
+        if section == 'deleted':
+            for row in rows:
+                deleted[row.resource].append(row.object_id)
+        else:
+            data[section] = RESOURCE_SERIALIZERS[section](rows, many=True).data
+        room -= len(rows)
+
+    data['deleted'] = deleted
+    return Response(data)
@@ -0,0 +1,70 @@
+import gzip
+import io
+import statistics
+import time
+from datetime import date, datetime, time as clock, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from mybackend.compression import BROTLI_QUALITY, brotli
+from mybackend.parsers import ORJSONParser
+from mybackend.renderers import ORJSONRenderer
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+
+
+def build_tasks(count):
+    """ Unsaved tasks that look like the seeded ones, so nothing touches the database. """
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        Task(
+            id=i + 1, owner_id=1, description=f'Task {i}: follow up on the quarterly report',
+            date=date(2024, 1, 1) + timedelta(days=i % 365), time=clock(9 + i % 8, 30) if i % 3 else None,
+            priority=('High', 'Medium', 'Low')[i % 3], completed=bool(i % 2),
+            created_at=start + timedelta(minutes=i), updated_at=start + timedelta(minutes=i, seconds=7),
+        )
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering and parsing a list of tasks with DRF's JSONRenderer and JSONParser "
+        "and with the orjson ones in mybackend, and how much gzip and Brotli save on it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10000, help="Tasks in the list.")
+        parser.add_argument('--repeat', type=int, default=20, help="Runs to take the median of.")
+
+    def handle(self, *args, **options):
+        data = TaskSerializer(build_tasks(options['tasks']), many=True).data
+        self.stdout.write(f"{options['tasks']} tasks, median of {options['repeat']} runs:")
+
+        for name, renderer in (('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())):
+            content, took = self.time(options['repeat'], renderer.render, data, 'application/json')
+            self.stdout.write(f"render {name}: {took:.1f} ms, {len(content)} bytes")
+
+        for name, parser in (('JSONParser', JSONParser()), ('ORJSONParser', ORJSONParser())):
+            _, took = self.time(options['repeat'], lambda: parser.parse(io.BytesIO(content)))
+            self.stdout.write(f"parse {name}: {took:.1f} ms")
+
+        codings = [('gzip', lambda: gzip.compress(content, compresslevel=6))]
+        if brotli is not None:
+            codings.append(('br', lambda: brotli.compress(content, quality=BROTLI_QUALITY)))
+        else:
+            self.stdout.write("br: skipped, Brotli isn't installed")
+        for name, compress in codings:
+            compressed, took = self.time(options['repeat'], compress)
+            saved = 1 - len(compressed) / len(content)
+            self.stdout.write(f"{name}: {took:.1f} ms, {len(compressed)} bytes, {saved:.0%} saved")
+
+    def time(self, repeat, func, *args):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(*args)
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, statistics.median(timings)
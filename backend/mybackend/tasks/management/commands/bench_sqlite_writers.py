@@ -0,0 +1,121 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+
+from mybackend.database import SQLITE_PRAGMAS, sqlite_database
+from tasks import stats
+from tasks.models import Task
+
+PROFILES = {
+    # What DATABASES had before: rollback journal, deferred transactions,
+    # a new connection per request
+    'stock': lambda path: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path},
+    # The PRAGMAs alone
+    'wal': lambda path: {'ENGINE': 'mybackend.sqlite3', 'NAME': path, 'OPTIONS': {'pragmas': SQLITE_PRAGMAS}},
+    'tuned': sqlite_database,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writers against a scratch SQLite file, once with Django's stock "
+        "SQLite settings and once with mybackend.database's, and count the \"database is "
+        "locked\" errors. Each writer creates a task, then toggles one in a transaction "
+        "that reads before it writes, like the bulk endpoints do."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=16, help="Threads writing at once.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="How long each run lasts.")
+        parser.add_argument('--tasks', type=int, default=1000, help="Tasks per writer to start with.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            template = os.path.join(directory, 'template.sqlite3')
+            with self.database(PROFILES['stock'](template)):
+                call_command('migrate', verbosity=0)
+                users = User.objects.bulk_create(
+                    User(username=f'writer-{i}@example.com') for i in range(options['writers'])
+                )
+                Task.objects.bulk_create(
+                    Task(owner=user, description=f'Task {i}') for user in users for i in range(options['tasks'])
+                )
+                # So the writers update the stats counters rather than each count them first
+                stats.rebuild([user.pk for user in users])
+
+            self.stdout.write(f"{options['writers']} writers, {options['seconds']:g} s each:")
+            for name, profile in PROFILES.items():
+                path = os.path.join(directory, f'{name}.sqlite3')
+                shutil.copy(template, path)
+                with self.database(profile(path)):
+                    self.run(name, options)
+
+    @contextmanager
+    def database(self, settings_dict):
+        """ Point the 'default' alias at another database for the duration of a with block. """
+        original = connections.settings['default']
+        self.switch(settings_dict)
+        try:
+            yield
+        finally:
+            self.switch(original)
+
+    def switch(self, settings_dict):
+        connections.close_all()
+        connections.settings['default'] = connections.configure_settings({'default': settings_dict})['default']
+        # The writer threads make their own connections; this thread's is
+        # replaced by hand
+        connections['default'] = connections.create_connection('default')
+
+    def run(self, name, options):
+        users = list(User.objects.order_by('id'))
+        outcomes, timings = Counter(), []
+        deadline = time.perf_counter() + options['seconds']
+        lock = threading.Lock()
+
+        def writer(user):
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        Task.objects.create(owner=user, description='New task')
+                        with transaction.atomic():
+                            task = Task.objects.filter(owner=user).order_by('?').first()
+                            task.completed = not task.completed
+                            task.save(update_fields=['completed', 'updated_at'])
+                        outcome = 'ok'
+                    except OperationalError as exc:
+                        outcome = str(exc)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        outcomes[outcome] += 1
+                        if outcome == 'ok':
+                            timings.append(elapsed)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ok = outcomes.pop('ok', 0)
+        line = f"  {name:>5}: {ok / options['seconds']:7.1f} writes/sec"
+        if timings:
+            cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+            line += f", p50 {cuts[49]:6.1f} ms, p99 {cuts[98]:7.1f} ms"
+        line += f", {sum(outcomes.values())} errors"
+        self.stdout.write(line)
+        for error, count in outcomes.most_common():
+            self.stdout.write(f"    {count} x {error}")
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the task stats counters from the tasks with one aggregate query, after "
+        "writes that went around the API (the admin, the seeders, a restore)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help="Only this user's counters; can be given more than once.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = stats.rebuild(options['users'])
+        self.stdout.write(f"Recounted {total} user(s) in {time.perf_counter() - start:.1f} s.")
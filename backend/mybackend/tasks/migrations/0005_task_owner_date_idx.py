@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_updated_at_task_task_owner_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'date', 'time', 'id'], name='task_owner_date_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0005_task_owner_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDayCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('open', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_day_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('open_high', models.IntegerField(default=0)),
+                ('open_medium', models.IntegerField(default=0)),
+                ('open_low', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('as_of', models.DateField(default=django.utils.timezone.localdate)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='taskdaycounter',
+            constraint=models.UniqueConstraint(fields=('owner', 'date'), name='unique_owner_task_day_counter'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskcounter',
+            constraint=models.UniqueConstraint(fields=('owner',), name='unique_owner_task_counter'),
+        ),
+    ]
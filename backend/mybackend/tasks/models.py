@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 PRIORITY_CHOICES = [
@@ -15,6 +16,57 @@ class Task(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='Medium')
     created_at = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves TaskListCreate: owner filter + newest first, id as tie-breaker
+            models.Index(fields=["owner", "-created_at", "-id"], name="task_owner_created_idx"),
+            # Serves ?start=&end= and the agenda: owner filter + date range in calendar order
+            models.Index(fields=["owner", "date", "time", "id"], name="task_owner_date_idx"),
+            # Serves the delta sync: what changed for this owner since a point in time
+            models.Index(fields=["owner", "updated_at"], name="task_owner_updated_idx"),
+        ]
 
     def __str__(self):
         return f"'{self.description}' by {self.owner.username}"
+
+
+class TaskCounter(models.Model):
+    """
+    A user's task counts, kept up to date by Task's save and delete signals
+    (see tasks/stats.py) so the stats endpoint doesn't have to count.
+    `overdue` counts the open tasks dated before `as_of`.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="task_counters")
+    total = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    # Open tasks by priority
+    open_high = models.IntegerField(default=0)
+    open_medium = models.IntegerField(default=0)
+    open_low = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+    as_of = models.DateField(default=timezone.localdate)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner'], name='unique_owner_task_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}: {self.total} tasks, {self.completed} completed"
+
+
+class TaskDayCounter(models.Model):
+    """ How many of a user's open tasks fall on a day; the due today and overdue counts come from these. """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="task_day_counters")
+    date = models.DateField()
+    open = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'date'], name='unique_owner_task_day_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}/{self.date}: {self.open} open"
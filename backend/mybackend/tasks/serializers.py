@@ -1,7 +1,11 @@
 from rest_framework import serializers
+from mybackend.bulk import BulkListSerializer
+from mybackend.fieldsets import SparseFieldsetSerializerMixin
+from mybackend.timing import TimedSerializerMixin
 from .models import Task
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(TimedSerializerMixin, SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
-        fields = ['id', 'description', 'date', 'time', 'priority', 'created_at', 'completed']
+        fields = ['id', 'description', 'date', 'time', 'priority', 'created_at', 'completed', 'updated_at']
+        list_serializer_class = BulkListSerializer
@@ -0,0 +1,275 @@
+"""
+Per-user task counts for the dashboard, kept in TaskCounter and
+TaskDayCounter instead of counted from the tasks on every request.
+
+Receivers of Task's save and delete signals call record() with the state
+of the task before and after the write, read from the database in the
+write's transaction, so the views, the admin and scripts alike keep the
+counters up to date. Overdue and due today depend on the day as well as on
+the tasks: TaskDayCounter holds the open tasks per day, and
+TaskCounter.overdue the open ones before its `as_of` day. When a day
+passes, summary() adds the day's open tasks to `overdue` and moves `as_of`
+on, so reading the counts costs a few queries however many tasks and days
+there are.
+
+bulk_create() and update() send no signals. The bulk endpoint record()s
+its batches itself, in batch(); the seeders call rebuild() after theirs,
+and `manage.py reconcile_task_stats` recounts the counters after anything
+else. A user without counters gets them counted on their first read or
+write.
+"""
+import datetime
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from sync.tracking import owner_is_being_deleted
+
+from .models import Task, TaskCounter, TaskDayCounter
+
+PRIORITY_FIELDS = {
+    'High': 'open_high',
+    'Medium': 'open_medium',
+    'Low': 'open_low',
+}
+
+# A save that only writes other fields leaves the counts as they are
+COUNTED_FIELDS = {'owner', 'owner_id', 'completed', 'priority', 'date'}
+
+# Set while a write record()s its whole batch itself; see batch()
+_batch = ContextVar('task_stats_batch', default=False)
+
+
+def state(task):
+    """ What the counters go by. """
+    return task.completed, task.priority, task.date
+
+
+def locked_states(pks):
+    """
+    {pk: state} for the tasks as the database has them now, locked until the
+    transaction ends. A write reads them in its own transaction: an object
+    loaded before it may be out of date by the time it is saved.
+    """
+    if not pks:
+        return {}
+    rows = Task.objects.select_for_update().filter(pk__in=pks).values_list('pk', 'completed', 'priority', 'date')
+    return {pk: tuple(row) for pk, *row in rows}
+
+
+def locked_row(task, using):
+    """
+    (owner_id, state) of the task as the database has it, or None. Locked
+    until the transaction ends, when there is one.
+    """
+    rows = Task.objects.using(using).filter(pk=task.pk)
+    if transaction.get_connection(using).in_atomic_block:
+        rows = rows.select_for_update()
+    row = rows.values_list('owner_id', 'completed', 'priority', 'date').first()
+    return row and (row[0], tuple(row[1:]))
+
+
+def tally(rows):
+    """ TaskCounter field and per-day changes for (completed, priority, date, count) rows. """
+    fields, days = Counter(), Counter()
+    for completed, priority, day, count in rows:
+        fields['total'] += count
+        if completed:
+            fields['completed'] += count
+            continue
+        if priority in PRIORITY_FIELDS:
+            fields[PRIORITY_FIELDS[priority]] += count
+        if day is not None:
+            days[day] += count
+    return ({name: n for name, n in fields.items() if n},
+            {day: n for day, n in days.items() if n})
+
+
+def overdue_change(days):
+    """
+    How `overdue` changes for per-day changes, as an expression of the
+    counter's `as_of`: the days before it count. One flat CASE, latest day
+    first, however many days there are.
+    """
+    whens, total = [], 0
+    for day, n in sorted(days.items()):
+        total += n
+        whens.append(When(as_of__gt=day, then=Value(total)))
+    return Case(*reversed(whens), default=Value(0))
+
+
+def record(owner_id, removed=(), added=()):
+    """
+    Update the owner's counters for a write, given the states of the tasks
+    it removed and added; an update removes the old state and adds the new.
+    Call it in the transaction that wrote the tasks.
+    """
+    fields, days = tally([(*row, -1) for row in removed] + [(*row, 1) for row in added])
+    if not fields and not days:
+        return
+    updates = {name: F(name) + n for name, n in fields.items()}
+    if days:
+        updates['overdue'] = F('overdue') + overdue_change(days)
+
+    with transaction.atomic(savepoint=False):
+        # The UPDATE holds the counter's row until the write commits, which
+        # keeps other writes off the owner's day counters in the meantime
+        if not TaskCounter.objects.filter(owner_id=owner_id).update(**updates):
+            try:
+                with transaction.atomic():
+                    # Counts the tasks as they are now, this write included
+                    rebuild([owner_id])
+                return
+            except IntegrityError:
+                # Someone else counted them first
+                return record(owner_id, removed, added)
+
+        if days:
+            existing = dict(TaskDayCounter.objects.filter(owner_id=owner_id, date__in=days).values_list('date', 'open'))
+            TaskDayCounter.objects.bulk_create(
+                [TaskDayCounter(owner_id=owner_id, date=day, open=existing.get(day, 0) + n) for day, n in days.items()],
+                update_conflicts=True, unique_fields=['owner', 'date'], update_fields=['open'],
+            )
+
+
+@contextmanager
+def batch():
+    """ Keep the receivers below out of a batch of writes that record() it as a whole. """
+    token = _batch.set(True)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+
+
+def counts_change(update_fields):
+    return not _batch.get() and (update_fields is None or not COUNTED_FIELDS.isdisjoint(update_fields))
+
+
+@receiver(pre_save, sender=Task)
+def read_state_before_save(sender, instance, using, update_fields=None, **kwargs):
+    if counts_change(update_fields):
+        instance._stats_before = locked_row(instance, using) if instance.pk is not None else None
+
+
+@receiver(post_save, sender=Task)
+def record_save(sender, instance, update_fields=None, **kwargs):
+    if not counts_change(update_fields):
+        return
+    before = instance.__dict__.pop('_stats_before', None)
+    after = state(instance)
+    if before is not None and before[0] == instance.owner_id:
+        record(instance.owner_id, removed=[before[1]], added=[after])
+        return
+    if before is not None:
+        # Moved to another owner
+        record(before[0], removed=[before[1]])
+    record(instance.owner_id, added=[after])
+
+
+@receiver(pre_delete, sender=Task)
+def read_state_before_delete(sender, instance, using, origin=None, **kwargs):
+    # The counters go with the owner
+    if not _batch.get() and not owner_is_being_deleted(origin):
+        instance._stats_before = locked_row(instance, using)
+
+
+@receiver(post_delete, sender=Task)
+def record_delete(sender, instance, **kwargs):
+    before = instance.__dict__.pop('_stats_before', None)
+    # Nothing to count if someone else deleted it first
+    if before is not None:
+        record(before[0], removed=[before[1]])
+
+
+def rebuild(owner_ids=None, today=None):
+    """
+    Recount the counters of `owner_ids`, or everyone's, from the tasks with
+    one aggregate query. Returns the number of counters written.
+    """
+    today = today or timezone.localdate()
+    if owner_ids is None:
+        tasks, counters, day_counters = Task.objects.all(), TaskCounter.objects.all(), TaskDayCounter.objects.all()
+    else:
+        tasks = Task.objects.filter(owner_id__in=owner_ids)
+        counters = TaskCounter.objects.filter(owner_id__in=owner_ids)
+        day_counters = TaskDayCounter.objects.filter(owner_id__in=owner_ids)
+
+    with transaction.atomic():
+        # record() waits on the counter's row from here until the recount is
+        # written, so each write is counted once: in the recount or on top of it
+        list(counters.select_for_update().values_list('pk', flat=True))
+        groups = tasks.values_list('owner_id', 'completed', 'priority', 'date').annotate(count=Count('id')).order_by()
+
+        rows = {owner_id: [] for owner_id in owner_ids or ()}
+        for owner_id, *row in groups.iterator():
+            rows.setdefault(owner_id, []).append(row)
+
+        new_counters, new_day_counters = [], []
+        for owner_id, owner_rows in rows.items():
+            fields, days = tally(owner_rows)
+            overdue = sum(n for day, n in days.items() if day < today)
+            new_counters.append(TaskCounter(owner_id=owner_id, as_of=today, overdue=overdue, **fields))
+            new_day_counters.extend(TaskDayCounter(owner_id=owner_id, date=day, open=n) for day, n in days.items())
+
+        counters.delete()
+        day_counters.delete()
+        TaskCounter.objects.bulk_create(new_counters, batch_size=1000)
+        TaskDayCounter.objects.bulk_create(new_day_counters, batch_size=1000)
+    return len(new_counters)
+
+
+def move_to(counter, today):
+    """ Move the counter's `overdue` and `as_of` to `today`, either way. """
+    with transaction.atomic():
+        counter = TaskCounter.objects.select_for_update().get(pk=counter.pk)
+        if counter.as_of != today:
+            start, end = sorted((counter.as_of, today))
+            passed = TaskDayCounter.objects.filter(
+                owner_id=counter.owner_id, date__gte=start, date__lt=end,
+            ).aggregate(open=Sum('open'))['open'] or 0
+            counter.overdue += passed if today > counter.as_of else -passed
+            counter.as_of = today
+            counter.save(update_fields=['overdue', 'as_of'])
+    return counter
+
+
+def summary(owner_id, today=None):
+    """ The owner's counts, with overdue and due today as of `today` (by default the server's date). """
+    today = today or timezone.localdate()
+    counter = TaskCounter.objects.filter(owner_id=owner_id).first()
+    if counter is None:
+        rebuild([owner_id], today)
+        counter = TaskCounter.objects.get(owner_id=owner_id)
+    if counter.as_of != today:
+        counter = move_to(counter, today)
+    due_today = TaskDayCounter.objects.filter(owner_id=owner_id, date=today).values_list('open', flat=True)
+
+    open_tasks = counter.total - counter.completed
+    return {
+        'date': today,
+        'total': counter.total,
+        'completed': counter.completed,
+        'open': open_tasks,
+        'open_by_priority': {priority: getattr(counter, name) for priority, name in PRIORITY_FIELDS.items()},
+        'overdue': counter.overdue,
+        'due_today': due_today.first() or 0,
+    }
+
+
+def client_today(value):
+    """
+    The `?today=` a client sends for its own date, or None when it isn't a
+    date within a day of the server's. Time zones are never further apart.
+    """
+    try:
+        day = datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return day if abs(day - timezone.localdate()) <= datetime.timedelta(days=1) else None
@@ -1,3 +1,688 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from mybackend import listcache
+from mybackend.budgets import BudgetTestMixin
+from mybackend.queryplans import QueryPlanTestMixin
+from mybackend.pagination import KeysetPagination
+
+from . import stats, views
+from .models import Task, TaskCounter, TaskDayCounter
+from .serializers import TaskSerializer
+from .views import TaskListCreate
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class TaskListCreateQueryPlanTests(QueryPlanTestMixin, TestCase):
+    """ The list query has to be served by the owner index, not by sorting. """
+    view_class = TaskListCreate
+    url = '/api/tasks/'
+
+    def setUp(self):
+        # Ids are reused between tests, so cached lists could leak across them
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        for i in range(3):
+            Task.objects.create(owner=self.user, description=f'Task {i}')
+
+    def test_pages_use_owner_index(self):
+        self.check_list_plans('task_owner_created_idx')
+
+    def test_date_range_uses_date_index(self):
+        queryset = self.list_queryset({'start': '2024-05-06', 'end': '2024-05-13T12:00'})
+        self.assertUsesIndex(queryset, 'task_owner_date_idx')
+
+
+class KeysetPaginationTests(TestCase):
+    """ mybackend.pagination.KeysetPagination, on orderings with ties and NULLs. """
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        moment = timezone.now()
+        days = [None, '2024-05-01', None, '2024-05-02', '2024-05-01', '2024-05-03', None, '2024-05-01']
+        times = [None, '09:00', '10:00', None, '09:00', None, None, None]
+        for i, (day, time) in enumerate(zip(days, times)):
+            Task.objects.create(owner=self.user, description=f'Task {i}', date=day, time=time)
+        # Every other task shares a created_at with its neighbour
+        for task in Task.objects.all():
+            Task.objects.filter(pk=task.pk).update(created_at=moment - datetime.timedelta(seconds=task.pk // 2))
+
+    def page(self, queryset, params):
+        request = Request(APIRequestFactory().get('/api/tasks/', params))
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(queryset, request)
+        return [row.pk for row in rows], paginator.get_next_link(), paginator.get_previous_link()
+
+    def follow(self, link):
+        return {name: values[0] for name, values in parse_qs(urlparse(link).query).items()}
+
+    def walk(self, queryset, page_size):
+        """ Every page forwards from the first, then backwards from the last. """
+        forwards = []
+        params = {'page_size': page_size}
+        while True:
+            ids, next_link, previous_link = self.page(queryset, params)
+            forwards.append(ids)
+            self.assertEqual(previous_link is None, len(forwards) == 1)
+            if next_link is None:
+                break
+            params = self.follow(next_link)
+
+        backwards = [ids]
+        while previous_link is not None:
+            ids, _, previous_link = self.page(queryset, self.follow(previous_link))
+            backwards.insert(0, ids)
+        return forwards, backwards
+
+    def test_walks_every_ordering_both_ways(self):
+        tasks = Task.objects.filter(owner=self.user)
+        for ordering, expected in [
+            (['-created_at'], sorted(tasks, key=lambda task: (task.created_at, task.pk), reverse=True)),
+            # NULLs come first going up and last going down
+            (['date', 'time'], sorted(tasks, key=lambda task: (
+                task.date is not None, task.date or datetime.date.min,
+                task.time is not None, task.time or datetime.time.min, task.pk))),
+            (['-date'], sorted(tasks, key=lambda task: (
+                task.date is not None, task.date or datetime.date.min, task.pk), reverse=True)),
+        ]:
+            expected = [task.pk for task in expected]
+            for page_size in (1, 2, 3, len(expected)):
+                with self.subTest(ordering=ordering, page_size=page_size):
+                    forwards, backwards = self.walk(tasks.order_by(*ordering), page_size)
+                    self.assertEqual(sum(forwards, []), expected)
+                    self.assertEqual(backwards, forwards)
+                    self.assertTrue(all(len(ids) == page_size for ids in forwards[:-1]))
+
+    def test_invalid_cursors(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        next_link = client.get('/api/tasks/', {'page_size': 1}).data['next']
+        self.assertEqual(client.get(next_link).status_code, 200)
+
+        def cursor(payload):
+            return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        position = json.loads(urlsafe_b64decode(self.follow(next_link)['cursor']))['p']
+        for value in ['garbage', '%%%', cursor([]), cursor({'p': position[:1]}),
+                      cursor({'p': ['not a date', position[1]]}), cursor({'p': [position[0], 'x']})]:
+            with self.subTest(cursor=value):
+                response = client.get('/api/tasks/', {'cursor': value})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_page_size(self):
+        paginator = KeysetPagination()
+        for value, expected in [(None, paginator.page_size), ('3', 3), ('0', paginator.page_size),
+                                ('-5', paginator.page_size), ('lots', paginator.page_size),
+                                ('100000', paginator.max_page_size)]:
+            with self.subTest(page_size=value):
+                params = {} if value is None else {'page_size': value}
+                self.assertEqual(paginator.get_page_size(Request(APIRequestFactory().get('/', params))), expected)
+
+        ids, next_link, _ = self.page(Task.objects.order_by('-created_at'), {'page_size': '100000'})
+        self.assertEqual(len(ids), 8)
+        self.assertIsNone(next_link)
+
+
+class TaskDateRangeTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def task(self, description, date=None, time=None):
+        return Task.objects.create(owner=self.user, description=description, date=date, time=time)
+
+    def descriptions(self, params):
+        response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200)
+        return [task['description'] for task in response.data['results']]
+
+    def test_window_is_start_inclusive_end_exclusive_in_calendar_order(self):
+        self.task('Before', '2024-05-05', '23:00')
+        self.task('Monday 9am', '2024-05-06', '09:00')
+        self.task('Monday all day', '2024-05-06')
+        self.task('Sunday', '2024-05-12', '18:00')
+        self.task('Next Monday', '2024-05-13')
+        self.task('Undated')
+
+        self.assertEqual(self.descriptions({'start': '2024-05-06', 'end': '2024-05-13'}),
+                         ['Monday all day', 'Monday 9am', 'Sunday'])
+        self.assertEqual(self.descriptions({'start': '2024-05-12'}), ['Sunday', 'Next Monday'])
+
+    def test_times_narrow_the_edge_days(self):
+        self.task('Early', '2024-05-06', '08:00')
+        self.task('All day', '2024-05-06')
+        self.task('Late', '2024-05-06', '17:00')
+
+        self.assertEqual(self.descriptions({'start': '2024-05-06T09:00', 'end': '2024-05-06T18:00'}),
+                         ['All day', 'Late'])
+        self.assertEqual(self.descriptions({'start': '2024-05-06', 'end': '2024-05-06T12:00'}),
+                         ['All day', 'Early'])
+
+    def test_bad_ranges_are_rejected(self):
+        self.assertEqual(self.client.get('/api/tasks/', {'start': 'next week'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'start': '2024-05-06', 'end': '2024-05-06'}).status_code, 400)
+
+
+class TaskBulkTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_update_and_delete_in_one_batch(self):
+        keep = Task.objects.create(owner=self.user, description='Keep')
+        done = Task.objects.create(owner=self.user, description='Done')
+
+        response = self.client.post('/api/tasks/bulk/', {
+            'create': [{'description': 'New 1'}, {'description': 'New 2', 'priority': 'High'}],
+            'update': [{'id': keep.id, 'completed': True}],
+            'delete': [done.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['description'] for item in response.data['create']], ['New 1', 'New 2'])
+        self.assertTrue(response.data['update'][0]['completed'])
+        self.assertEqual(response.data['delete'], [{'id': done.id, 'deleted': True}])
+        self.assertEqual(Task.objects.filter(owner=self.user).count(), 3)
+        self.assertTrue(Task.objects.get(pk=keep.pk).completed)
+
+    def test_one_bad_item_rejects_the_whole_batch(self):
+        foreign = Task.objects.create(owner=self.other, description='Not yours')
+        mine = Task.objects.create(owner=self.user, description='Mine')
+
+        response = self.client.post('/api/tasks/bulk/', {
+            'create': [{'description': 'Fine'}, {'priority': 'Urgent'}],
+            'update': [{'id': mine.id, 'description': 'Renamed'}, {'id': foreign.id, 'completed': True}],
+            'delete': [foreign.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['create'][0], {})
+        self.assertIn('description', response.data['create'][1])
+        self.assertEqual(response.data['update'][0], {})
+        self.assertEqual(response.data['update'][1], {'id': ['Not found.']})
+        self.assertEqual(response.data['delete'][0], {'id': ['Not found.']})
+        self.assertEqual(Task.objects.get(pk=mine.pk).description, 'Mine')
+        self.assertFalse(Task.objects.filter(description='Fine').exists())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        tasks = [Task.objects.create(owner=self.user, description=f'Task {i}') for i in range(20)]
+        stats.rebuild([self.user.pk])
+        # Owner lookup, INSERT, UPDATE, the delete's SELECT + DELETE, the
+        # tombstone INSERT, one version bump, the stats' re-read of the rows
+        # and counter UPDATE, plus two savepoint pairs
+        with self.assertNumQueries(13):
+            response = self.client.post('/api/tasks/bulk/', {
+                'create': [{'description': f'New {i}'} for i in range(10)],
+                'update': [{'id': task.id, 'completed': True} for task in tasks[:10]],
+                'delete': [task.id for task in tasks[10:]],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+def recount(owner, today):
+    """ What stats.summary() should say, counted from the tasks. """
+    tasks = Task.objects.filter(owner=owner)
+    open_tasks = tasks.filter(completed=False)
+    return {
+        'date': today,
+        'total': tasks.count(),
+        'completed': tasks.filter(completed=True).count(),
+        'open': open_tasks.count(),
+        'open_by_priority': {priority: open_tasks.filter(priority=priority).count()
+                             for priority in ('High', 'Medium', 'Low')},
+        'overdue': open_tasks.filter(date__lt=today).count(),
+        'due_today': open_tasks.filter(date=today).count(),
+    }
+
+
+class TaskStatsTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.localdate()
+
+    def day(self, offset):
+        return (self.today + datetime.timedelta(days=offset)).isoformat()
+
+    def assertCounts(self):
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, recount(self.user, self.today))
+
+    def test_counts_follow_every_write(self):
+        created = []
+        for priority, date in [('High', self.day(-2)), ('Low', self.day(0)), ('Medium', self.day(3)),
+                               ('High', None), ('Medium', self.day(-2))]:
+            response = self.client.post('/api/tasks/', {'description': 'New', 'priority': priority, 'date': date},
+                                        format='json')
+            created.append(response.data['id'])
+            self.assertCounts()
+
+        for data in [{'completed': True}, {'date': self.day(0)}, {'priority': 'Low'}, {'completed': False}]:
+            self.client.patch(f'/api/tasks/{created[0]}/', data, format='json')
+            self.assertCounts()
+        self.client.put(f'/api/tasks/{created[1]}/', {'description': 'Moved', 'date': self.day(-1)}, format='json')
+        self.assertCounts()
+        self.client.delete(f'/api/tasks/{created[2]}/')
+        self.assertCounts()
+
+        response = self.client.post('/api/tasks/bulk/', {
+            'create': [{'description': 'Bulk', 'date': self.day(-3)}, {'description': 'Bulk', 'completed': True}],
+            'update': [{'id': created[3], 'date': self.day(0)}, {'id': created[4], 'completed': True}],
+            'delete': [created[1]],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCounts()
+
+        # Nothing is written when a batch is rejected
+        self.client.post('/api/tasks/bulk/', {'create': [{'description': 'Fine'}, {'priority': 'Urgent'}],
+                                              'delete': [created[0]]}, format='json')
+        self.assertCounts()
+        self.assertEqual(TaskCounter.objects.count(), 1)
+
+    def test_days_passing(self):
+        for offset in (-1, 0, 0, 1, 2):
+            self.client.post('/api/tasks/', {'description': 'New', 'date': self.day(offset)}, format='json')
+        self.assertCounts()
+
+        for offset in (1, 3, 30, -1, 0):
+            today = self.today + datetime.timedelta(days=offset)
+            self.assertEqual(stats.summary(self.user.pk, today), recount(self.user, today))
+        # A write while the counter is a day behind or ahead
+        stats.summary(self.user.pk, self.today + datetime.timedelta(days=1))
+        self.client.post('/api/tasks/', {'description': 'New', 'date': self.day(0)}, format='json')
+        self.assertCounts()
+
+        response = self.client.get('/api/tasks/stats/', {'today': self.day(1)})
+        self.assertEqual(response.data['due_today'], 1)
+        self.assertEqual(response.data['overdue'], 4)
+        self.assertEqual(self.client.get('/api/tasks/stats/', {'today': self.day(5)}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/stats/', {'today': 'tomorrow'}).status_code, 400)
+
+    def test_reads_dont_count_the_tasks(self):
+        Task.objects.bulk_create(Task(owner=self.user, description=f'Task {i}', date=self.day(i % 5 - 2))
+                                 for i in range(50))
+        # Counted once, on the first read
+        self.assertCounts()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/tasks/stats/')
+        self.assertFalse(any('"tasks_task"' in query['sql'] for query in queries))
+
+    def test_reconcile(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client.post('/api/tasks/', {'description': 'New', 'date': self.day(-1)}, format='json')
+        # bulk_create() sends no signals, so it leaves the counters behind
+        Task.objects.bulk_create([Task(owner=self.user, description='Admin', priority='High', date=self.day(0)),
+                                  Task(owner=other, description='Seeded', completed=True)])
+        self.assertNotEqual(self.client.get('/api/tasks/stats/').data, recount(self.user, self.today))
+
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('reconcile_task_stats', stdout=out)
+        self.assertEqual(len([query for query in queries if '"tasks_task"' in query['sql']]), 1)
+        self.assertIn('Recounted 2 user(s)', out.getvalue())
+        self.assertCounts()
+        self.assertEqual(stats.summary(other.pk), recount(other, self.today))
+        self.assertEqual(TaskDayCounter.objects.filter(owner=self.user).count(), 2)
+
+        call_command('reconcile_task_stats', '--user', str(other.pk), stdout=out)
+        self.assertCounts()
+
+    def test_writes_outside_the_views(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.assertCounts()
+        # The admin, the scripts and the shell save and delete models directly
+        task = Task.objects.create(owner=self.user, description='Scripted', date=self.today)
+        self.assertCounts()
+        task.completed = True
+        task.save(update_fields=['completed', 'updated_at'])
+        self.assertCounts()
+        task.priority, task.completed = 'High', False
+        task.save()
+        self.assertCounts()
+
+        task.owner = other
+        task.save()
+        self.assertCounts()
+        self.assertEqual(stats.summary(other.pk), recount(other, self.today))
+        Task.objects.filter(owner=other).delete()
+        self.assertEqual(stats.summary(other.pk), recount(other, self.today))
+
+        # Deleting the owner takes the counters with it
+        other.delete()
+        self.assertFalse(TaskCounter.objects.filter(owner_id=other.pk).exists())
+
+    def test_writes_read_the_state_they_change(self):
+        task = Task.objects.create(owner=self.user, description='Double-clicked', date=self.today)
+        stats.rebuild([self.user.pk])
+
+        # Two requests that both loaded the task before either saved it
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        for stale in (first, second):
+            serializer = TaskSerializer(stale, data={'completed': True}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            views.save_task(serializer)
+        self.assertCounts()
+
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        first.delete()
+        second.delete()
+        self.assertCounts()
+
+    def test_bulk_updates_patch_the_state_they_lock(self):
+        task = Task.objects.create(owner=self.user, description='Loaded', priority='Low', date=self.today)
+        stats.rebuild([self.user.pk])
+        locked_states = stats.locked_states
+
+        def completed_by_someone_else(pks):
+            # Another request saves after the batch loaded the task, but before it locks it
+            elsewhere = Task.objects.get(pk=task.pk)
+            elsewhere.completed, elsewhere.date = True, None
+            elsewhere.save()
+            return locked_states(pks)
+
+        with mock.patch.object(stats, 'locked_states', completed_by_someone_else):
+            response = self.client.post('/api/tasks/bulk/', {'update': [{'id': task.pk, 'priority': 'High'}]},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats.state(Task.objects.get(pk=task.pk)), (True, 'High', None))
+        self.assertCounts()
+
+    def test_account_deletion(self):
+        self.client.post('/api/tasks/', {'description': 'New', 'date': self.day(0)}, format='json')
+        self.user.delete()
+        self.assertFalse(TaskCounter.objects.exists())
+        self.assertFalse(TaskDayCounter.objects.exists())
+
+
+class TaskConditionalRequestTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(owner=self.user, description='Task')
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        # Only the version stamp is read
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_change_the_list_etag(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.client.patch(f'/api/tasks/{self.task.id}/', {'completed': True}, format='json')
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_have_their_own_etag(self):
+        self.assertNotEqual(
+            self.client.get('/api/tasks/')['ETag'],
+            self.client.get('/api/tasks/', {'page_size': 1})['ETag'],
+        )
+
+    def test_if_match_prevents_lost_updates(self):
+        url = f'/api/tasks/{self.task.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.patch(url, {'description': 'First'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.patch(url, {'description': 'Second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).description, 'First')
+
+
+class TaskListCacheTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(owner=self.user, description='Task')
+
+    def test_second_load_is_served_from_cache(self):
+        self.assertEqual(self.client.get('/api/tasks/')['X-Cache'], 'MISS')
+        # Only the version stamp is read
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['description'], 'Task')
+        self.assertEqual(listcache.stats()['hits'], 1)
+
+    def test_writes_evict_the_cached_list(self):
+        self.client.get('/api/tasks/')
+        self.client.post('/api/tasks/', {'description': 'Another'}, format='json')
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_admin_style_edits_evict_too(self):
+        self.client.get('/api/tasks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.description = 'Edited elsewhere'
+            self.task.save()
+        self.assertEqual(caches['lists'].get(listcache.index_key(self.user.pk, 'tasks')), None)
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response.data['results'][0]['description'], 'Edited elsewhere')
+
+
+class TaskSparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(owner=self.user, description='Task', priority='High')
+
+    def list_query(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, next(query['sql'] for query in queries if query['sql'].startswith('SELECT "tasks_task"'))
+
+    def test_fields_trims_the_output_and_the_columns(self):
+        response, sql = self.list_query({'fields': 'description,priority,completed'})
+        self.assertEqual(response.data['results'], [
+            {'id': self.task.id, 'description': 'Task', 'priority': 'High', 'completed': False},
+        ])
+        self.assertIn('"tasks_task"."priority"', sql)
+        self.assertNotIn('"tasks_task"."date"', sql)
+
+    def test_omit(self):
+        response, sql = self.list_query({'omit': 'id,date,time'})
+        self.assertEqual(list(response.data['results'][0]),
+                         ['id', 'description', 'priority', 'created_at', 'completed', 'updated_at'])
+        self.assertNotIn('"tasks_task"."time"', sql)
+
+        detail = self.client.get(f'/api/tasks/{self.task.id}/', {'omit': 'date,time'})
+        self.assertNotIn('date', detail.data)
+        self.assertIn('ETag', detail)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/tasks/', {'fields': 'description,colour'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('colour', response.data['fields'][0])
+
+    def test_writes_answer_with_every_field(self):
+        response = self.client.patch(f'/api/tasks/{self.task.id}/?fields=id', {'completed': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['completed'])
+        self.assertIn('description', response.data)
+
+    def test_compact_lists(self):
+        Task.objects.create(owner=self.user, description='Newer')
+        response = self.client.get('/api/tasks/', {'fields': 'description,completed', 'compact': 'true', 'page_size': 1})
+        self.assertEqual(response.data['columns'], ['id', 'description', 'completed'])
+        self.assertEqual(response.data['rows'], [[self.task.id + 1, 'Newer', False]])
+        self.assertNotIn('results', response.data)
+        self.assertIn('compact=true', response.data['next'])
+
+        # Each shape is cached on its own
+        self.assertIn('results', self.client.get('/api/tasks/').data)
+        empty = self.client.get('/api/tasks/', {'compact': '1', 'start': '2030-01-01', 'end': '2030-01-02'})
+        self.assertEqual(empty.data['rows'], [])
+        self.assertIn('priority', empty.data['columns'])
+
+
+class AsyncTaskViewTests(TestCase):
+    """ The async views (mybackend/urls_async.py) answer like the DRF ones. """
+
+    def setUp(self):
+        caches['lists'].clear()
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.token = f'Bearer {AccessToken.for_user(self.user)}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+        for i in range(3):
+            Task.objects.create(owner=self.user, description=f'Task {i}', date=f'2024-05-0{i + 1}')
+
+    def both(self, method, url, data=None, **extra):
+        responses = []
+        for urlconf in ('mybackend.urls', 'mybackend.urls_async'):
+            with override_settings(ROOT_URLCONF=urlconf):
+                caches['lists'].clear()
+                responses.append(getattr(self.client, method)(url, data, format='json', **extra))
+        return responses
+
+    def test_reads_match(self):
+        task = Task.objects.first()
+        for url, params in [
+            ('/api/tasks/', {'page_size': 2}),
+            ('/api/tasks/', {'start': '2024-05-02', 'end': '2024-05-04'}),
+            ('/api/tasks/', {'fields': 'description,completed', 'compact': 'true'}),
+            ('/api/tasks/', {'fields': 'colour'}),
+            (f'/api/tasks/{task.id}/', None),
+            (f'/api/tasks/{task.id}/', {'omit': 'date,time'}),
+            ('/api/tasks/999/', None),
+        ]:
+            drf, native = self.both('get', url, params)
+            self.assertEqual(native.status_code, drf.status_code)
+            self.assertEqual(native.json(), drf.json())
+            self.assertEqual(native.get('ETag'), drf.get('ETag'))
+
+        next_link = self.both('get', '/api/tasks/', {'page_size': 2})[1].json()['next']
+        with override_settings(ROOT_URLCONF='mybackend.urls_async'):
+            self.assertEqual(len(self.client.get(next_link).json()['results']), 1)
+
+    @override_settings(ROOT_URLCONF='mybackend.urls_async')
+    def test_writes(self):
+        response = self.client.post('/api/tasks/', {'description': 'New', 'priority': 'High'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/tasks/{response.json()['id']}/"
+        self.assertEqual(self.client.post('/api/tasks/', {}, format='json').status_code, 400)
+
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'completed': True}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['completed'])
+        self.assertEqual(self.client.put(url, {'description': 'Stale'}, format='json', HTTP_IF_MATCH=etag).status_code,
+                         412)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(stats.summary(self.user.pk), recount(self.user, timezone.localdate()))
+
+    @override_settings(ROOT_URLCONF='mybackend.urls_async')
+    def test_writes_and_counters_share_a_transaction(self):
+        with mock.patch('tasks.stats.record', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.client.post('/api/tasks/', {'description': 'Uncounted'}, format='json')
+        self.assertFalse(Task.objects.filter(description='Uncounted').exists())
+
+    @override_settings(ROOT_URLCONF='mybackend.urls_async')
+    async def test_under_asgi(self):
+        client = AsyncClient()
+        response = await client.get('/api/tasks/', headers={'Authorization': self.token})
+        self.assertEqual(len(response.json()['results']), 3)
+        headers = {'Authorization': self.token, 'If-None-Match': response['ETag']}
+        self.assertEqual((await client.get('/api/tasks/', headers=headers)).status_code, 304)
+
+        response = await client.get('/api/tasks/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+
+class TaskBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/tasks/'
+
+    def setUp(self):
+        caches['lists'].clear()
+
+    def owner_with_tasks(self, rows):
+        owner = self.create_owner()
+        tasks = Task.objects.bulk_create(
+            Task(owner=owner, description=f'Task {i}', date='2024-05-06') for i in range(rows)
+        )
+        stats.rebuild([owner.pk])
+        return self.client_for(owner), tasks
+
+    def test_budgets(self):
+        def list_tasks(rows):
+            client, _ = self.owner_with_tasks(rows)
+            return lambda: client.get('/api/tasks/')
+
+        def create_task(rows):
+            client, _ = self.owner_with_tasks(rows)
+            return lambda: client.post('/api/tasks/', {'description': 'New'}, format='json')
+
+        def bulk(rows):
+            client, tasks = self.owner_with_tasks(2 * rows)
+            return lambda: client.post('/api/tasks/bulk/', {
+                'create': [{'description': f'New {i}'} for i in range(rows)],
+                'update': [{'id': task.id, 'completed': True} for task in tasks[:rows]],
+                'delete': [task.id for task in tasks[rows:]],
+            }, format='json')
+
+        def detail(method, data=None):
+            def setup(rows):
+                client, tasks = self.owner_with_tasks(rows)
+                return lambda: getattr(client, method)(f'/api/tasks/{tasks[0].id}/', data, format='json')
+            return setup
+
+        def task_stats(rows):
+            client, _ = self.owner_with_tasks(rows)
+            return lambda: client.get('/api/tasks/stats/')
+
+        self.check_budgets({
+            ('TaskListCreate', 'GET'): list_tasks,
+            ('TaskListCreate', 'POST'): create_task,
+            ('TaskBulk', 'POST'): bulk,
+            ('TaskStats', 'GET'): task_stats,
+            ('TaskRetrieveUpdateDestroy', 'GET'): detail('get'),
+            ('TaskRetrieveUpdateDestroy', 'PATCH'): detail('patch', {'completed': True}),
+            ('TaskRetrieveUpdateDestroy', 'DELETE'): detail('delete'),
+        })
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import TaskListCreate, TaskRetrieveUpdateDestroy
+from .views import TaskListCreate, TaskRetrieveUpdateDestroy, TaskBulk, TaskStats
 
 urlpatterns = [
     path('', TaskListCreate.as_view(), name='task-list-create'),
+    path('bulk/', TaskBulk.as_view(), name='task-bulk'),
+    path('stats/', TaskStats.as_view(), name='task-stats'),
     # This path will handle GET, PUT, PATCH, and DELETE for a single task.
     path('<int:pk>/', TaskRetrieveUpdateDestroy.as_view(), name='task-detail'),
 ]
\ No newline at end of file
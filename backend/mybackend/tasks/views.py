@@ -1,11 +1,34 @@
+from django.db import transaction
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from mybackend.conditional import ConditionalDetailMixin, ConditionalListMixin
+from mybackend.listcache import CachedListMixin
+from mybackend.replicas import ReplicaReadMixin
+from mybackend.asyncviews import AsyncListCreateView, AsyncRetrieveUpdateDestroyView
+from mybackend.bulk import BulkOperationsView
+from mybackend.fieldsets import SparseFieldsetMixin
+from mybackend.filters import DateRangeFilter
+from . import stats
 from .models import Task
 from .serializers import TaskSerializer
 
-class TaskListCreate(generics.ListCreateAPIView):
+def save_task(serializer, **kwargs):
+    """
+    serializer.save() in a transaction, so the stats receivers lock the
+    task's old state until the counters are written (see tasks/stats.py).
+    Deletes are in one already.
+    """
+    with transaction.atomic():
+        return serializer.save(**kwargs)
+
+class TaskListCreate(ReplicaReadMixin, ConditionalListMixin, CachedListMixin, SparseFieldsetMixin,
+                     generics.ListCreateAPIView):
     serializer_class = TaskSerializer
     # This view is only accessible to authenticated users
     permission_classes = [permissions.IsAuthenticated]
+    # ?start=&end= narrows the list to a calendar window
+    filter_backends = [DateRangeFilter]
 
     def get_queryset(self):
         # This is the magic! Filter tasks by the logged-in user.
@@ -13,14 +36,77 @@ class TaskListCreate(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         # This is the other magic! Automatically set the owner when creating.
-        serializer.save(owner=self.request.user)
+        save_task(serializer, owner=self.request.user)
     
 
     # This view is for retrieving, updating, or deleting a single, specific task
-class TaskRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class TaskRetrieveUpdateDestroy(ReplicaReadMixin, ConditionalDetailMixin, SparseFieldsetMixin,
+                                generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # This ensures a user can only access and delete THEIR OWN tasks.
-        return Task.objects.filter(owner=self.request.user)
\ No newline at end of file
+        return Task.objects.filter(owner=self.request.user)
+
+    def perform_update(self, serializer):
+        save_task(serializer)
+
+class TaskBulk(BulkOperationsView):
+    """ Create, patch and delete many of the user's tasks in one request. """
+    serializer_class = TaskSerializer
+
+    def get_queryset(self):
+        return Task.objects.filter(owner=self.request.user)
+
+    def perform_batch(self, create_serializer, update_serializer, instances):
+        # The updates patch these in place
+        updated = list(update_serializer.instance.values())
+        before = stats.locked_states([task.pk for task in updated + instances])
+        # The serializer loaded them before the lock: patch the rows as they
+        # are now, so the write and the counters both start from `before`
+        for task in updated:
+            if task.pk in before:
+                task.completed, task.priority, task.date = before[task.pk]
+        # bulk_create() and bulk_update() send no signals, and the deletes are counted here with them
+        with stats.batch():
+            super().perform_batch(create_serializer, update_serializer, instances)
+        added = [stats.state(task) for task in create_serializer.instance or []]
+        added += [stats.state(task) for task in updated if task.pk in before]
+        stats.record(self.request.user.pk, removed=before.values(), added=added)
+
+class TaskStats(generics.GenericAPIView):
+    """ Counts for the dashboard: totals, open by priority, overdue and due today. ?today= gives the client's date. """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        today = None
+        if 'today' in request.query_params:
+            today = stats.client_today(request.query_params['today'])
+            if today is None:
+                raise ValidationError({'today': ['Expected a date (YYYY-MM-DD) within a day of the server\'s.']})
+        return Response(stats.summary(request.user.pk, today))
+
+
+
+# Served in place of the two views above under ASGI; see mybackend/asyncviews.py
+
+class AsyncTaskCountersMixin:
+    """ Saves in a transaction like the views above, for the stats counters, so they go on a thread. """
+    serializer_uses_database = True
+
+    def perform_save(self, serializer, **kwargs):
+        save_task(serializer, **kwargs)
+
+class AsyncTaskListCreate(AsyncTaskCountersMixin, AsyncListCreateView):
+    serializer_class = TaskSerializer
+    filter_backends = [DateRangeFilter]
+
+    def get_queryset(self):
+        return Task.objects.filter(owner=self.request.user).order_by('-created_at')
+
+class AsyncTaskRetrieveUpdateDestroy(AsyncTaskCountersMixin, AsyncRetrieveUpdateDestroyView):
+    serializer_class = TaskSerializer
+
+    def get_queryset(self):
+        return Task.objects.filter(owner=self.request.user)
@@ -0,0 +1,180 @@
+"""
+Fast membership checks against the refresh-token blacklist.
+
+Each process keeps a Bloom filter of the blacklisted jtis. A jti the filter
+has never seen is definitely not blacklisted and is let through without a
+query; a possible hit is confirmed against the table. The filter catches
+up with tokens blacklisted by other processes every
+TOKEN_BLACKLIST_SYNC_INTERVAL seconds, by reading the rows blacklisted
+since the last sync, less SYNC_OVERLAP (like the sync app's CLOCK_SKEW).
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+# Rows blacklisted by a transaction that commits while we sync are picked
+# up by the next sync
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        # Double hashing: two 64-bit halves of one digest give all k positions
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        """ Add `key`, and return whether it was new (false positives count as not). """
+        new = False
+        for position in self.positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        # Only new keys count, so re-adding a key in an overlapping sync
+        # doesn't use up the capacity
+        self.count += new
+        return new
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class RevokedTokens:
+    """
+    This process's view of the blacklist; see the module docstring.
+
+    Filling the filter from a large table takes seconds, so it is loaded
+    TOKEN_BLACKLIST_LOAD_BATCH rows per check instead of all at once, and
+    checks go to the table until it is complete.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+
+    def start(self):
+        blacklisted = BlacklistedToken.objects.count()
+        self.bloom = BloomFilter(max(settings.TOKEN_BLACKLIST_BLOOM_CAPACITY, 2 * blacklisted))
+        self.loaded_id = 0
+        self.ready = False
+        # Rows that commit out of id order during the load are caught by the
+        # first sync after it
+        self.synced_at = timezone.now()
+        self.checked_at = 0.0
+
+    def load_batch(self):
+        batch_size = settings.TOKEN_BLACKLIST_LOAD_BATCH
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=self.loaded_id).order_by('id')
+            .values_list('id', 'token__jti')[:batch_size]
+        )
+        for _token_id, jti in rows:
+            self.bloom.add(jti)
+        if rows:
+            self.loaded_id = rows[-1][0]
+        self.ready = len(rows) < batch_size
+
+    def sync(self):
+        if time.monotonic() - self.checked_at < settings.TOKEN_BLACKLIST_SYNC_INTERVAL:
+            return
+        now = timezone.now()
+        recent = BlacklistedToken.objects.filter(blacklisted_at__gte=self.synced_at - SYNC_OVERLAP)
+        for jti in recent.values_list('token__jti', flat=True):
+            self.bloom.add(jti)
+        self.synced_at, self.checked_at = now, time.monotonic()
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def might_be_revoked(self, jti):
+        with self.lock:
+            if self.bloom is None or self.bloom.count > self.bloom.capacity:
+                # Pruned tokens stay in the filter, so it is rebuilt once it fills up
+                self.start()
+            if not self.ready:
+                self.load_batch()
+                if not self.ready:
+                    return True
+            self.sync()
+            return jti in self.bloom
+
+    def is_revoked(self, jti):
+        return self.might_be_revoked(jti) and BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def clear(self):
+        with self.lock:
+            self.bloom = None
+
+
+revoked_tokens = RevokedTokens()
+
+
+def is_blacklisted(jti):
+    if not settings.TOKEN_BLACKLIST_CACHE:
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+    return revoked_tokens.is_revoked(jti)
+
+
+def blacklist(token, user):
+    """
+    Blacklist `token` for `user`. Returns False if it already was, e.g.
+    because a concurrent refresh got to it first.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    outstanding, _ = OutstandingToken.objects.get_or_create(jti=jti, defaults={
+        'user': user,
+        'token': str(token),
+        'created_at': token.current_time,
+        'expires_at': datetime_from_epoch(token['exp']),
+    })
+    try:
+        with transaction.atomic():
+            BlacklistedToken.objects.create(token=outstanding)
+    except IntegrityError:
+        return False
+    revoked_tokens.add(jti)
+    return True
+
+
+class RefreshToken(tokens.RefreshToken):
+    """ A RefreshToken that checks the blacklist through is_blacklisted(). """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+
+def outstand(token, user):
+    """ Record a newly issued refresh token, without RefreshToken.outstand()'s lookups. """
+    OutstandingToken.objects.create(
+        user=user,
+        jti=token[api_settings.JTI_CLAIM],
+        token=str(token),
+        created_at=token.current_time,
+        expires_at=datetime_from_epoch(token['exp']),
+    )
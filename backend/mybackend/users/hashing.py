@@ -0,0 +1,45 @@
+"""
+Password hashing for the async views, on a thread pool of its own.
+
+Hashing is slow on purpose: hundreds of milliseconds with the default
+PBKDF2 iterations. The pool has PASSWORD_HASHING_WORKERS threads, so a burst
+of logins waits its turn here instead of occupying the server. hashlib
+releases the GIL while it works, so the event loop keeps serving other
+requests in the meantime.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(settings.PASSWORD_HASHING_WORKERS, thread_name_prefix='password-hashing')
+        return _pool
+
+
+async def run_in_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), partial(func, *args))
+
+
+async def ahash_password(raw_password):
+    return await run_in_pool(make_password, raw_password)
+
+
+async def acheck_password(user, raw_password):
+    """ user.check_password() on the pool, including upgrading a hash made with outdated settings. """
+    outdated = []
+    matches = await run_in_pool(check_password, raw_password, user.password, outdated.append)
+    if outdated:
+        user.password = await ahash_password(raw_password)
+        await user.asave(update_fields=['password'])
+    return matches
@@ -0,0 +1,189 @@
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from tasks.models import Task
+from users.tokens import tokens_for_user
+
+PASSWORD = 'bench-passphrase'
+# Both setups should do the same work, so neither serves lists from the cache
+NO_LIST_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'lists': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+async def call_asgi(app, method, url, headers, body):
+    """ Feed one request to an ASGI app the way an ASGI server would, minus the socket. """
+    path, _, query = url.partition('?')
+    headers = {'Host': 'localhost', 'Content-Type': 'application/json', 'Content-Length': str(len(body)), **headers}
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    status = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def call_wsgi(app, method, url, headers, body):
+    """ The same for a WSGI app, as one of a threaded server's workers would. """
+    path, _, query = url.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    environ.update(('HTTP_' + name.upper().replace('-', '_'), value) for name, value in headers.items())
+    status = []
+    response = app(environ, lambda line, response_headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        b''.join(response)
+    finally:
+        # Sends request_finished, which closes the thread's connection
+        response.close()
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the API with many concurrent clients, served once by Django's ASGI handler "
+        "with the async views (like uvicorn) and once by the WSGI handler on a fixed pool of "
+        "threads (like gunicorn --threads). The requests are handed to the handlers in "
+        "process, so socket and HTTP parsing costs are left out. Creates its users and tasks "
+        "and deletes them afterwards; point it at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help="Clients sending requests at once.")
+        parser.add_argument('--threads', type=int, default=8, help="Worker threads of the WSGI server.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="How long each run lasts.")
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--tasks', type=int, default=100, help="Tasks per user.")
+
+    def handle(self, *args, **options):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(username=f'asgi-bench-{i}@example.com', email=f'asgi-bench-{i}@example.com', password=password)
+            for i in range(options['users'])
+        )
+        try:
+            self.run(options)
+        finally:
+            bench_users = User.objects.filter(username__startswith='asgi-bench-')
+            OutstandingToken.objects.filter(user__in=bench_users).delete()
+            bench_users.delete()
+
+    def run(self, options):
+        users = list(User.objects.filter(username__startswith='asgi-bench-'))
+        Task.objects.bulk_create(
+            Task(owner=user, description=f'Task {i}') for user in users for i in range(options['tasks'])
+        )
+        tokens = [f'Bearer {tokens_for_user(user).access_token}' for user in users]
+
+        def read(n):
+            return 'list', 'GET', '/api/tasks/?page_size=20', {'Authorization': tokens[n % len(tokens)]}, b''
+
+        def read_or_login(n):
+            # Every fourth client logs in over and over
+            if n % 4:
+                return read(n)
+            body = '{"email": "%s", "password": "%s"}' % (users[n % len(users)].email, PASSWORD)
+            return 'login', 'POST', '/api/users/login/', {}, body.encode()
+
+        for scenario, requests in [('task lists', read), ('task lists + logins', read_or_login)]:
+            self.stdout.write(f"{scenario}, {options['concurrency']} clients:")
+            for server in ('wsgi', 'asgi'):
+                results, errors, elapsed = asyncio.run(self.load(server, requests, options))
+                for label, timings in sorted(results.items()):
+                    cuts = statistics.quantiles(timings, n=100)
+                    self.stdout.write(
+                        f"  {server} {label:>5}: {len(timings) / elapsed:7.1f} requests/sec, "
+                        f"p50 {cuts[49]:7.1f} ms, p99 {cuts[98]:7.1f} ms"
+                        + (f", {errors[label]} errors" if errors[label] else '')
+                    )
+
+    async def load(self, server, requests, options):
+        if server == 'asgi':
+            with override_settings(ROOT_URLCONF='mybackend.urls_async', CACHES=NO_LIST_CACHE):
+                app = ASGIHandler()
+
+                async def call(*args):
+                    return await call_asgi(app, *args)
+
+                return await self.clients(call, requests, options)
+
+        with override_settings(ROOT_URLCONF='mybackend.urls', CACHES=NO_LIST_CACHE):
+            app = WSGIHandler()
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(options['threads']) as workers:
+                async def call(*args):
+                    return await loop.run_in_executor(workers, call_wsgi, app, *args)
+
+                return await self.clients(call, requests, options)
+
+    async def clients(self, call, requests, options):
+        """ Run the clients, each sending its next request when the last one is answered. """
+        timings, errors = defaultdict(list), Counter()
+        concurrency = options['concurrency']
+        start = time.perf_counter()
+        deadline = start + options['seconds']
+
+        async def client(n):
+            while time.perf_counter() < deadline:
+                label, *request = requests(n)
+                sent = time.perf_counter()
+                status = await call(*request)
+                timings[label].append((time.perf_counter() - sent) * 1000)
+                if status >= 400:
+                    errors[label] += 1
+                n += concurrency
+
+        await asyncio.gather(*(client(n) for n in range(concurrency)))
+        return timings, errors, time.perf_counter() - start
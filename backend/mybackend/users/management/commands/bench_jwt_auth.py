@@ -0,0 +1,75 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from mybackend.authentication import CachedJWTAuthentication, user_cache
+from users.tokens import tokens_for_user
+
+MODES = [
+    ('database', JWTAuthentication, {}),
+    ('cached', CachedJWTAuthentication, {'JWT_STATELESS_USERS': False}),
+    ('stateless', CachedJWTAuthentication, {'JWT_STATELESS_USERS': True}),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec for an authenticated endpoint with users loaded from the "
+        "database, from the in-process cache, and built from the token. Test data is "
+        "rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/tasks/?page_size=10')
+        parser.add_argument('--users', type=int, default=1000,
+                            help="Distinct users the requests are spread over.")
+        parser.add_argument('--seconds', type=float, default=3.0, help="How long to run each mode.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        User.objects.bulk_create(
+            User(username=f'auth-bench-{i}@example.com', email=f'auth-bench-{i}@example.com')
+            for i in range(options['users'])
+        )
+        users = User.objects.filter(username__startswith='auth-bench-')
+        headers = [f'Bearer {tokens_for_user(user).access_token}' for user in users]
+        client = Client(HTTP_HOST='localhost')
+
+        for name, auth_class, overrides in MODES:
+            user_cache.clear()
+            with mock.patch.object(APIView, 'authentication_classes', [auth_class]), override_settings(**overrides):
+                # One pass to warm up, so each mode runs with a full cache
+                for header in headers:
+                    client.get(options['url'], HTTP_AUTHORIZATION=header)
+
+                # Counted with a wrapper: each request resets connection.queries
+                queries = []
+                with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                    response = client.get(options['url'], HTTP_AUTHORIZATION=headers[0])
+                assert response.status_code == 200, response.content
+
+                count, start = 0, time.perf_counter()
+                deadline = start + options['seconds']
+                while time.perf_counter() < deadline:
+                    client.get(options['url'], HTTP_AUTHORIZATION=headers[count % len(headers)])
+                    count += 1
+                elapsed = time.perf_counter() - start
+
+            self.stdout.write(f"{name:>10}: {count / elapsed:8.1f} requests/sec, {len(queries)} queries per request")
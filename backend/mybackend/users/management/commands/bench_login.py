@@ -0,0 +1,68 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time POST /api/users/login/ and count its queries. The test user is "
+        "created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--users', type=int, default=10_000,
+                            help="Other users to create first, so the email lookup has something to search.")
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help="Use MD5 instead of PBKDF2, to time everything except the password hash.")
+
+    def handle(self, *args, **options):
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher'] if options['fast_hasher'] else None
+        with override_settings(**({'PASSWORD_HASHERS': hashers} if hashers else {})):
+            try:
+                with transaction.atomic():
+                    self.run(options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, options):
+        User.objects.bulk_create(
+            User(username=f'bench-{i}@example.com', email=f'bench-{i}@example.com')
+            for i in range(options['users'])
+        )
+        user = User(username='login-bench@example.com', email='login-bench@example.com')
+        user.set_password('correct horse battery staple')
+        user.save()
+
+        client = Client(HTTP_HOST='localhost')
+        payload = {'email': user.email, 'password': 'correct horse battery staple'}
+        client.post('/api/users/login/', payload, content_type='application/json')
+
+        timings, queries = [], set()
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.post('/api/users/login/', payload, content_type='application/json')
+                timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.content
+            queries.add(len(captured))
+
+        timings.sort()
+        self.stdout.write(
+            f"{options['requests']} logins: queries per request {sorted(queries)}, "
+            f"p50 {statistics.median(timings):.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms"
+        )
+        if 'sessionid' in response.cookies:
+            self.stdout.write("A session was created.")
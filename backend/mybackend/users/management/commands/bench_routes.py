@@ -0,0 +1,353 @@
+import http.client
+import json
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import URLResolver, get_resolver
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from outbox.models import OutboxEmail
+from tasks.models import Task
+from users.tokens import tokens_for_user
+from .seed_data import FIRST_NAMES, PASSWORD, SEED_PREFIX
+
+URLCONF = 'mybackend.urls'
+# Users the benchmark creates for the routes that write, deleted afterwards
+BENCH_PREFIX = 'bench-routes-'
+NEW_PASSWORD = 'Another-bench-passphrase-7'
+NO_LIST_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'lists': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def route_names(resolver=None):
+    """ The name of every route, apart from the admin's. """
+    resolver = resolver or get_resolver(URLCONF)
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace != 'admin':
+                yield from route_names(pattern)
+        elif pattern.name:
+            yield pattern.name
+
+
+def bench_email(kind, number):
+    return f'{BENCH_PREFIX}{kind}-{number}@example.com'
+
+
+def percentiles(timings):
+    if len(timings) < 2:
+        return {'p50': timings[0], 'p95': timings[0], 'p99': timings[0]} if timings else {}
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+class TestClientTransport:
+    """ Requests through Django's test client: the whole stack, middleware included, minus the socket. """
+    name = 'test client'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, method, path, body, content_type, headers):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        response = self.local.client.generic(method, path, body or b'', content_type, headers=headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+
+class HTTPTransport:
+    """ Requests to a running server, one keep-alive connection per client thread. """
+
+    def __init__(self, base_url):
+        self.name = base_url
+        self.url = urlsplit(base_url)
+        self.local = threading.local()
+
+    def __call__(self, method, path, body, content_type, headers):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80)
+        if content_type:
+            headers = {'Content-Type': content_type, **headers}
+        self.local.connection.request(method, self.url.path.rstrip('/') + path, body, headers)
+        response = self.local.connection.getresponse()
+        response.read()
+        return response.status
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route in mybackend/urls.py (the admin's aside): each is sent "
+        "--requests requests from --concurrency clients, and requests/sec and p50/p95/p99 "
+        "latencies are reported and saved as JSON, to compare between commits with "
+        "--compare. Reads are spread over the users of seed_data, so seed the database "
+        "first. Routes that write use users the benchmark creates and deletes afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Per route and method.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--users', type=int, default=50, help="Seeded users to spread the reads over.")
+        parser.add_argument('--base-url', help="Benchmark a running server, e.g. http://localhost:8000, "
+                                               "instead of calling the app in process.")
+        parser.add_argument('--routes', nargs='*', help="Only these route names.")
+        parser.add_argument('--no-list-cache', action='store_true',
+                            help="Don't serve lists from the list cache (in process only).")
+        parser.add_argument('--output', help="JSON file for the results; by default bench-routes-<commit>.json.")
+        parser.add_argument('--compare', help="Results of an earlier run to compare with.")
+
+    def handle(self, *args, **options):
+        transport = HTTPTransport(options['base_url']) if options['base_url'] else TestClientTransport()
+        overrides = {'ROOT_URLCONF': URLCONF}
+        if options['no_list_cache']:
+            overrides['CACHES'] = NO_LIST_CACHE
+
+        first_outbox_id = OutboxEmail.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        try:
+            self.prepare(options)
+            with override_settings(**overrides):
+                results = self.run(transport, options)
+        finally:
+            self.clean_up(first_outbox_id)
+
+        commit = self.commit()
+        report = {
+            'commit': commit,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'transport': transport.name,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'data': {
+                'users': User.objects.count(),
+                'tasks': Task.objects.count(),
+                'contacts': Contact.objects.count(),
+                'appointments': Appointment.objects.count(),
+            },
+            'routes': results,
+        }
+        output = options['output'] or f'bench-routes-{commit}.json'
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(f"Saved to {output}")
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report)
+
+    def commit(self):
+        try:
+            result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            return 'unknown'
+        return result.stdout.strip()
+
+    def prepare(self, options):
+        count = options['requests']
+        readers = list(User.objects.filter(username__startswith=SEED_PREFIX, is_active=True)
+                       .order_by('id')[:options['users']])
+        if not readers:
+            raise CommandError("There are no seeded users; run seed_data first.")
+        self.readers = []
+        for user in readers:
+            self.readers.append({
+                'email': user.email,
+                'auth': f'Bearer {tokens_for_user(user).access_token}',
+                'task': Task.objects.filter(owner=user).values_list('id', flat=True).first(),
+                'contact': Contact.objects.filter(owner=user).values_list('id', flat=True).first(),
+                'appointment': Appointment.objects.filter(owner=user).values_list('id', flat=True).first(),
+            })
+
+        self.run_id = uuid.uuid4().hex[:8]
+        writer = User.objects.create_user(bench_email('writer', self.run_id), bench_email('writer', self.run_id), PASSWORD)
+        self.writer = writer
+        self.writer_auth = f'Bearer {tokens_for_user(writer).access_token}'
+        # Rows for the detail routes to update and then delete
+        self.tasks = [task.pk for task in Task.objects.bulk_create(
+            Task(owner=writer, description=f'Bench {i}') for i in range(count))]
+        self.contacts = [contact.pk for contact in Contact.objects.bulk_create(
+            Contact(owner=writer, name=f'Bench {i}') for i in range(count))]
+        self.appointments = [appointment.pk for appointment in Appointment.objects.bulk_create(
+            Appointment(owner=writer, title=f'Bench {i}') for i in range(count))]
+        self.refresh_tokens = [str(tokens_for_user(writer)) for _ in range(2 * count)]
+
+        # A user per activation and per password reset, each with its token
+        password = make_password(PASSWORD)
+        inactive = User.objects.bulk_create(
+            User(username=bench_email(f'activate-{self.run_id}', i), email=bench_email(f'activate-{self.run_id}', i),
+                 password=password, is_active=False)
+            for i in range(count)
+        )
+        resetting = User.objects.bulk_create(
+            User(username=bench_email(f'reset-{self.run_id}', i), email=bench_email(f'reset-{self.run_id}', i),
+                 password=password)
+            for i in range(count)
+        )
+        self.activations = [self.uid_and_token(user) for user in inactive]
+        self.resets = [self.uid_and_token(user) for user in resetting]
+
+    def uid_and_token(self, user):
+        return {'uidb64': urlsafe_base64_encode(force_bytes(user.pk)), 'token': default_token_generator.make_token(user)}
+
+    def clean_up(self, first_outbox_id):
+        bench_users = User.objects.filter(username__startswith=BENCH_PREFIX)
+        OutstandingToken.objects.filter(user__in=bench_users).delete()
+        bench_users.delete()
+        # Activation emails for the registrations
+        for email in OutboxEmail.objects.filter(id__gt=first_outbox_id).only('id', 'recipient_list'):
+            if all(address.startswith(BENCH_PREFIX) for address in email.recipient_list):
+                email.delete()
+
+    def reader(self, i):
+        return self.readers[i % len(self.readers)]
+
+    def scenarios(self):
+        """ (route name, method, request builder) for each benchmarked request. """
+        def get(path, auth):
+            return 'GET', path, None, None, {'Authorization': auth}
+
+        def send(method, path, data, auth=None):
+            headers = {'Authorization': auth} if auth else {}
+            return method, path, json.dumps(data).encode(), 'application/json', headers
+
+        def post(path, data, auth=None):
+            return send('POST', path, data, auth)
+
+        writer = self.writer_auth
+        today = date.today()
+        window = f'start={today}&end={today + timedelta(days=30)}'
+
+        def csv_upload(i):
+            boundary = f'bench{self.run_id}'
+            rows = '\r\n'.join(f'Bench {i}-{k},{self.run_id}-{i}-{k}@example.org' for k in range(5))
+            body = (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="contacts.csv"\r\n'
+                f'Content-Type: text/csv\r\n\r\nname,email\r\n{rows}\r\n--{boundary}--\r\n'
+            ).encode()
+            return 'POST', '/api/contacts/import/', body, f'multipart/form-data; boundary={boundary}', {'Authorization': writer}
+
+        return [
+            ('token_obtain_pair', 'POST', lambda i: post('/api/users/token/', {
+                'username': self.reader(i)['email'], 'password': PASSWORD})),
+            ('token_refresh', 'POST', lambda i: post('/api/users/token/refresh/', {'refresh': self.refresh_tokens[i]})),
+            ('register_user', 'POST', lambda i: post('/api/users/register/', {
+                'full_name': 'Bench User', 'email': bench_email(f'register-{self.run_id}', i),
+                'password': NEW_PASSWORD, 'password_confirm': NEW_PASSWORD})),
+            ('login_user', 'POST', lambda i: post('/api/users/login/', {
+                'email': self.reader(i)['email'], 'password': PASSWORD})),
+            ('logout_user', 'POST', lambda i: post('/api/users/logout/', {
+                'refresh': self.refresh_tokens[len(self.refresh_tokens) // 2 + i]}, writer)),
+            ('get_user_profile', 'GET', lambda i: get('/api/users/profile/', self.reader(i)['auth'])),
+            ('user-detail', 'GET', lambda i: get('/api/users/me/', self.reader(i)['auth'])),
+            ('activate_user', 'POST', lambda i: post('/api/users/activate/', self.activations[i])),
+            ('resend_activation', 'POST', lambda i: post('/api/users/resend-activation/', {'email': self.writer.email})),
+            ('password_reset_request', 'POST', lambda i: post('/api/users/password-reset-request/', {
+                'email': bench_email('nobody', i)})),
+            ('password_reset_confirm', 'POST', lambda i: post('/api/users/password-reset-confirm/', {
+                **self.resets[i], 'password': NEW_PASSWORD, 'password_confirm': NEW_PASSWORD})),
+
+            ('task-list-create', 'GET', lambda i: get('/api/tasks/', self.reader(i)['auth'])),
+            ('task-list-create', 'POST', lambda i: post('/api/tasks/', {'description': f'Bench {i}'}, writer)),
+            ('task-bulk', 'POST', lambda i: post('/api/tasks/bulk/', {
+                'create': [{'description': f'Bulk {i}-{k}'} for k in range(10)]}, writer)),
+            ('task-detail', 'GET', lambda i: get(f'/api/tasks/{self.reader(i)["task"]}/', self.reader(i)['auth'])),
+            ('task-detail', 'PATCH', lambda i: send('PATCH', f'/api/tasks/{self.tasks[i]}/', {'completed': True}, writer)),
+            ('task-detail', 'DELETE', lambda i: send('DELETE', f'/api/tasks/{self.tasks[i]}/', {}, writer)),
+
+            ('contact-list-create', 'GET', lambda i: get('/api/contacts/', self.reader(i)['auth'])),
+            ('contact-list-create', 'POST', lambda i: post('/api/contacts/', {'name': f'Bench {i}'}, writer)),
+            ('contact-bulk', 'POST', lambda i: post('/api/contacts/bulk/', {
+                'create': [{'name': f'Bulk {i}-{k}'} for k in range(10)]}, writer)),
+            ('contact-search', 'GET', lambda i: get(
+                f'/api/contacts/search/?q={FIRST_NAMES[i % len(FIRST_NAMES)]}', self.reader(i)['auth'])),
+            ('contact-import', 'POST', csv_upload),
+            ('contact-detail', 'GET', lambda i: get(f'/api/contacts/{self.reader(i)["contact"]}/', self.reader(i)['auth'])),
+            ('contact-detail', 'PATCH', lambda i: send('PATCH', f'/api/contacts/{self.contacts[i]}/', {'company': 'Bench'}, writer)),
+            ('contact-detail', 'DELETE', lambda i: send('DELETE', f'/api/contacts/{self.contacts[i]}/', {}, writer)),
+
+            ('appointment-list-create', 'GET', lambda i: get('/api/appointments/', self.reader(i)['auth'])),
+            ('appointment-list-create', 'POST', lambda i: post('/api/appointments/', {
+                'title': f'Bench {i}', 'date': str(today), 'attendees': []}, writer)),
+            ('appointment-detail', 'GET', lambda i: get(
+                f'/api/appointments/{self.reader(i)["appointment"]}/', self.reader(i)['auth'])),
+            ('appointment-detail', 'PATCH', lambda i: send(
+                'PATCH', f'/api/appointments/{self.appointments[i]}/', {'location': 'Bench'}, writer)),
+            ('appointment-detail', 'DELETE', lambda i: send(
+                'DELETE', f'/api/appointments/{self.appointments[i]}/', {}, writer)),
+
+            ('sync-changes', 'GET', lambda i: get('/api/sync/', self.reader(i)['auth'])),
+            ('agenda', 'GET', lambda i: get(f'/api/agenda/?{window}', self.reader(i)['auth'])),
+            ('export-all', 'GET', lambda i: get('/api/export/', self.reader(i)['auth'])),
+            ('export-resource', 'GET', lambda i: get('/api/export/tasks.csv', self.reader(i)['auth'])),
+        ]
+
+    def run(self, transport, options):
+        scenarios = self.scenarios()
+        missing = set(route_names()) - {name for name, _, _ in scenarios}
+        if missing:
+            self.stderr.write(f"No requests for these routes: {', '.join(sorted(missing))}")
+        if options['routes']:
+            scenarios = [scenario for scenario in scenarios if scenario[0] in options['routes']]
+
+        self.stdout.write(f"{transport.name}, {options['requests']} requests per route from "
+                          f"{options['concurrency']} clients:")
+        results = {}
+        for name, method, build in scenarios:
+            label = f'{method} {name}'
+            results[label] = result = self.load(transport, build, options['requests'], options['concurrency'])
+            self.stdout.write(
+                f"  {label:<32} {result['rps']:8.1f} requests/sec, p50 {result['p50']:7.2f} ms, "
+                f"p95 {result['p95']:7.2f} ms, p99 {result['p99']:7.2f} ms"
+                + (f", {result['errors']} errors" if result['errors'] else '')
+            )
+        return results
+
+    def load(self, transport, build, count, concurrency):
+        def request(i):
+            args = build(i)
+            start = time.perf_counter()
+            status = transport(*args)
+            return (time.perf_counter() - start) * 1000, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as clients:
+            outcomes = list(clients.map(request, range(count)))
+        elapsed = time.perf_counter() - start
+
+        timings = [timing for timing, _ in outcomes]
+        return {
+            'requests': count,
+            'errors': sum(status >= 400 for _, status in outcomes),
+            'rps': count / elapsed,
+            **percentiles(timings),
+        }
+
+    def compare(self, before, after):
+        self.stdout.write(f"Compared with {before['commit']} ({before['date']}):")
+        for label, result in after['routes'].items():
+            previous = before['routes'].get(label)
+            if previous is None:
+                continue
+            changes = ', '.join(
+                f"{key} {(result[key] - previous[key]) / previous[key]:+.0%}"
+                for key in ('rps', 'p50', 'p99') if previous[key]
+            )
+            self.stdout.write(f"  {label:<32} {changes}")
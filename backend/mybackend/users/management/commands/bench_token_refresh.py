@@ -0,0 +1,123 @@
+import statistics
+import time
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from users.blacklist import revoked_tokens
+from users.serializers import ProfileTokenRefreshSerializer
+from users.tokens import tokens_for_user
+
+MODES = [
+    # simplejwt's own serializer: an exists() per refresh and extra user lookups
+    ('stock', TokenRefreshSerializer, {}),
+    ('table', ProfileTokenRefreshSerializer, {'TOKEN_BLACKLIST_CACHE': False}),
+    ('bloom', ProfileTokenRefreshSerializer, {'TOKEN_BLACKLIST_CACHE': True}),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time POST /api/users/token/refresh/ with a large token blacklist, checking it "
+        "with a query per refresh and through the in-process Bloom filter. Test data "
+        "is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=1000000,
+                            help="Outstanding tokens to seed, all of them blacklisted.")
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=2000, help="Refreshes timed per mode.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, users, count, batch_size=10000):
+        now = timezone.now()
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            tokens = OutstandingToken.objects.bulk_create(
+                OutstandingToken(
+                    user=users[(start + i) % len(users)], jti=uuid4().hex, token='-',
+                    created_at=now - timedelta(days=1), expires_at=now + timedelta(days=6),
+                )
+                for i in range(size)
+            )
+            BlacklistedToken.objects.bulk_create(BlacklistedToken(token=token) for token in tokens)
+
+    def run(self, options):
+        User.objects.bulk_create(
+            User(username=f'refresh-bench-{i}@example.com', email=f'refresh-bench-{i}@example.com')
+            for i in range(options['users'])
+        )
+        users = list(User.objects.filter(username__startswith='refresh-bench-'))
+
+        start = time.perf_counter()
+        self.seed(users, options['tokens'])
+        self.stdout.write(f"Seeded {options['tokens']} blacklisted tokens in {time.perf_counter() - start:.1f}s")
+
+        client = Client(HTTP_HOST='localhost')
+        for name, serializer_class, overrides in MODES:
+            revoked_tokens.clear()
+            # Each user refreshes with the token the last refresh handed back
+            refresh = [str(tokens_for_user(user)) for user in users]
+            with mock.patch.object(TokenRefreshView, 'serializer_class', serializer_class), \
+                    override_settings(**overrides):
+
+                def post(i):
+                    response = client.post('/api/users/token/refresh/', {'refresh': refresh[i]},
+                                           content_type='application/json')
+                    assert response.status_code == 200, response.content
+                    refresh[i] = response.json()['refresh']
+
+                # Until the Bloom filter is loaded, each refresh loads a batch
+                warmup = []
+                while not warmup or (overrides.get('TOKEN_BLACKLIST_CACHE') and not revoked_tokens.ready):
+                    start = time.perf_counter()
+                    post(len(warmup) % len(users))
+                    warmup.append((time.perf_counter() - start) * 1000)
+
+                # Counted with a wrapper: each request resets connection.queries.
+                # Savepoints are left out; outside this benchmark's transaction
+                # there are none.
+                queries = []
+                with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                    post(1 % len(users))
+                queries = [sql for sql in queries if 'SAVEPOINT' not in sql]
+
+                timings = []
+                for i in range(options['requests']):
+                    start = time.perf_counter()
+                    post(i % len(users))
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                # A reused token is refused
+                stale = refresh[0]
+                post(0)
+                response = client.post('/api/users/token/refresh/', {'refresh': stale},
+                                       content_type='application/json')
+                assert response.status_code == 401, response.content
+
+            cuts = statistics.quantiles(timings, n=100)
+            self.stdout.write(
+                f"{name:>6}: warm-up {len(warmup):3} refresh(es), slowest {max(warmup):6.1f} ms; p50 {cuts[49]:5.2f} ms, p99 {cuts[98]:5.2f} ms, "
+                f"{len(timings) / (sum(timings) / 1000):6.1f} refreshes/sec, {len(queries)} queries per refresh"
+            )
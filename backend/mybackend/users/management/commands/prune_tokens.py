@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired refresh tokens and their blacklist entries. An expired "
+        "token is refused anyway, so there is no need to remember it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running and prune every --interval seconds instead of exiting.",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=3600.0,
+            help="Seconds to sleep between runs when running with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total = self.prune(options['batch_size'])
+            if total or not options['loop']:
+                self.stdout.write(f"Deleted {total} expired token(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def prune(self, batch_size):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        total = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return total
+            # The blacklist entries cascade; only('id') keeps the collector
+            # from loading every token's text first
+            OutstandingToken.objects.filter(id__in=ids).only('id').delete()
+            total += len(ids)
@@ -0,0 +1,176 @@
+import random
+import time
+from datetime import date, time as clock, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from sync.models import ResourceVersion
+from sync.tracking import TRACKED_MODELS
+from tasks import stats
+from tasks.models import PRIORITY_CHOICES, Task
+from users.models import UserProfile
+
+SEED_PREFIX = 'seed-'
+PASSWORD = 'seed-passphrase'
+
+FIRST_NAMES = ['Ada', 'Ben', 'Chloe', 'Dev', 'Ema', 'Femi', 'Grace', 'Hiro', 'Ines', 'Jonas', 'Kemi', 'Luca']
+LAST_NAMES = ['Adeyemi', 'Brown', 'Chen', 'Dubois', 'Eze', 'Fischer', 'Garcia', 'Hansen', 'Ito', 'Jones']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises']
+TITLES = ['CEO', 'CFO', 'Engineer', 'Designer', 'Accountant', 'Consultant', 'Office Manager']
+VERBS = ['Call', 'Email', 'Review', 'Prepare', 'Book', 'Follow up on', 'Send', 'Draft', 'Sign']
+THINGS = ['the quarterly report', 'travel plans', 'the contract', 'invoices', 'the board deck', 'payroll']
+MEETINGS = ['Weekly sync', 'Lunch', 'Quarterly review', 'Client call', 'Interview', 'Offsite planning']
+LOCATIONS = ['Head office', 'Room 4B', 'https://meet.example.com/standup', 'Cafe Nero', None]
+
+
+def seed_email(number):
+    return f'{SEED_PREFIX}{number}@example.com'
+
+
+def batched(objs, size):
+    objs = iter(objs)
+    while batch := list(islice(objs, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic users, tasks, contacts and appointments with "
+        "attendees, for benchmarks. Everything is written with bulk_create() in batches, "
+        "so e.g. --users 10000 --tasks 1000000 takes minutes, not hours. Users are named "
+        f"{seed_email('<n>')}, are active and share the password '{PASSWORD}'; running "
+        "the command again adds more."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--tasks', type=int, default=100_000, help="In total, spread over the users.")
+        parser.add_argument('--contacts', type=int, default=50_000, help="In total, spread over the users.")
+        parser.add_argument('--appointments', type=int, default=50_000, help="In total, spread over the users.")
+        parser.add_argument('--attendees', type=int, default=3, help="Contacts linked to each appointment, at most.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help="For the random generator, so runs are repeatable.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        user_ids = self.create_users(options['users'])
+        contact_ids = self.create_contacts(user_ids, options['contacts'])
+        self.create_tasks(user_ids, options['tasks'])
+        self.create_appointments(user_ids, contact_ids, options['appointments'], options['attendees'])
+
+        # bulk_create() doesn't send the signals that start the version stamps
+        ResourceVersion.objects.bulk_create(
+            (ResourceVersion(owner_id=user_id, resource=resource, version=1)
+             for user_id in user_ids for resource in TRACKED_MODELS.values()),
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        # Nor the ones that keep the task stats counters
+        for batch in batched(user_ids, self.batch_size):
+            stats.rebuild(batch)
+
+    def write(self, label, model, objs, on_batch=None):
+        """
+        bulk_create() `objs` one batch (and transaction) at a time, and return
+        how many there were. Only one batch is held at a time: `on_batch` gets
+        each one once it's created, for the ids a caller needs.
+        """
+        start, count = time.perf_counter(), 0
+        for batch in batched(objs, self.batch_size):
+            created = model.objects.bulk_create(batch)
+            count += len(created)
+            if on_batch:
+                on_batch(created)
+        self.stdout.write(f"{label}: {count} in {time.perf_counter() - start:.1f} s")
+        return count
+
+    def create_users(self, count):
+        first = User.objects.filter(username__startswith=SEED_PREFIX).count()
+        # One hash for everyone; hashing a million passwords would take days
+        password = make_password(PASSWORD)
+        names = [(self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)) for _ in range(count)]
+        user_ids = []
+        self.write('users', User, (
+            User(username=seed_email(number), email=seed_email(number), password=password,
+                 first_name=first_name, last_name=last_name)
+            for number, (first_name, last_name) in enumerate(names, first)
+        ), on_batch=lambda users: user_ids.extend(user.pk for user in users))
+        self.write('profiles', UserProfile, (
+            UserProfile(user_id=user_id, full_name=f'{first_name} {last_name}')
+            for user_id, (first_name, last_name) in zip(user_ids, names)
+        ))
+        return user_ids
+
+    def some_date(self):
+        return date.today() + timedelta(days=self.random.randint(-180, 180))
+
+    def some_time(self):
+        return clock(self.random.randint(7, 19), self.random.choice([0, 15, 30, 45]))
+
+    def create_tasks(self, user_ids, count):
+        priorities = [value for value, _ in PRIORITY_CHOICES]
+        self.write('tasks', Task, (
+            Task(
+                owner_id=user_ids[number % len(user_ids)],
+                description=f'{self.random.choice(VERBS)} {self.random.choice(THINGS)}',
+                date=self.some_date() if self.random.random() < 0.7 else None,
+                time=self.some_time() if self.random.random() < 0.4 else None,
+                priority=self.random.choice(priorities),
+                completed=self.random.random() < 0.3,
+            )
+            for number in range(count)
+        ))
+
+    def create_contacts(self, user_ids, count):
+        def contact(number):
+            first_name, last_name = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+            return Contact(
+                owner_id=user_ids[number % len(user_ids)],
+                name=f'{first_name} {last_name}',
+                email=f'{first_name}.{last_name}.{number}@example.org'.lower(),
+                phone=f'+44 20 {self.random.randint(1000, 9999)} {self.random.randint(1000, 9999)}',
+                company=self.random.choice(COMPANIES),
+                title=self.random.choice(TITLES),
+            )
+
+        contact_ids = {user_id: [] for user_id in user_ids}
+
+        def collect(contacts):
+            for contact in contacts:
+                contact_ids[contact.owner_id].append(contact.pk)
+
+        self.write('contacts', Contact, (contact(number) for number in range(count)), on_batch=collect)
+        return contact_ids
+
+    def create_appointments(self, user_ids, contact_ids, count, attendees):
+        Attendee = Appointment.attendees.through
+        linked = 0
+
+        def link(appointments):
+            # Each batch's links are written with it, so no list of every appointment is kept
+            nonlocal linked
+            links = []
+            for appointment in appointments:
+                candidates = contact_ids[appointment.owner_id]
+                for contact_id in self.random.sample(candidates, min(len(candidates), self.random.randint(0, attendees))):
+                    links.append(Attendee(appointment_id=appointment.pk, contact_id=contact_id))
+            linked += len(Attendee.objects.bulk_create(links, batch_size=self.batch_size))
+
+        self.write('appointments', Appointment, (
+            Appointment(
+                owner_id=user_ids[number % len(user_ids)],
+                title=self.random.choice(MEETINGS),
+                date=self.some_date(),
+                time=self.some_time() if self.random.random() < 0.8 else None,
+                location=self.random.choice(LOCATIONS),
+            )
+            for number in range(count)
+        ), on_batch=link)
+        # Written with the appointments, and timed with them
+        self.stdout.write(f"attendee links: {linked}")
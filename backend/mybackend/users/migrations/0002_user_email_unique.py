@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_unique_emails(apps, schema_editor):
+    """
+    Registration only checked for the exact email before the index, so a
+    database can hold accounts whose emails differ at most in case. Merging
+    accounts isn't something to do behind someone's back: stop and list them.
+    """
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias).exclude(email='')
+        .values(email_lower=Lower('email')).annotate(count=Count('id')).filter(count__gt=1)
+        .order_by('email_lower').values_list('email_lower', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Emails have to be unique, ignoring case, but these are used by more than one user: %s. "
+            "Change or clear the extra accounts' emails, then migrate again." % ', '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Emails are how people log in, so make them unique and indexed. auth.User
+    isn't ours to change, hence the raw SQL. Blank emails (e.g. superusers
+    made without one) are left out of the index.
+    """
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_unique_emails, migrations.RunPython.noop),
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX users_user_email_uniq ON auth_user (email) WHERE email <> ''",
+            "DROP INDEX users_user_email_uniq",
+        ),
+    ]
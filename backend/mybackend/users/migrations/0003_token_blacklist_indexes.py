@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes on the token blacklist tables: blacklisted_at for the per-process
+    blacklist sync and expires_at for prune_tokens. The tables belong to
+    simplejwt, hence the raw SQL.
+    """
+
+    dependencies = [
+        ('users', '0002_user_email_unique'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX users_blacklistedtoken_at_idx ON token_blacklist_blacklistedtoken (blacklisted_at)",
+            "DROP INDEX users_blacklistedtoken_at_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX users_outstandingtoken_expires_idx ON token_blacklist_outstandingtoken (expires_at)",
+            "DROP INDEX users_outstandingtoken_expires_idx",
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    A plain index on auth_user.email for the lookups by email. SQLite only
+    uses the partial unique index from 0002 when the query repeats its
+    `email <> ''`, and the ORM's `email = ?` doesn't, so those scanned the
+    table. The unique index still keeps the emails unique.
+    """
+
+    dependencies = [
+        ('users', '0003_token_blacklist_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX users_user_email_idx ON auth_user (email)",
+            "DROP INDEX users_user_email_idx",
+        ),
+    ]
@@ -0,0 +1,38 @@
+from importlib import import_module
+
+from django.db import migrations
+
+check_unique_emails = import_module('users.migrations.0002_user_email_unique').check_unique_emails
+
+
+class Migration(migrations.Migration):
+    """
+    Make emails unique ignoring case, so A@x.com can't register next to
+    a@x.com, and index lower(email) for users_by_email(). As in 0004, the
+    lookups need a plain index: SQLite only uses the partial unique one when
+    the query repeats its `email <> ''`.
+    """
+
+    dependencies = [
+        ('users', '0004_user_email_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_unique_emails, migrations.RunPython.noop),
+        migrations.RunSQL(
+            "DROP INDEX users_user_email_uniq",
+            "CREATE UNIQUE INDEX users_user_email_uniq ON auth_user (email) WHERE email <> ''",
+        ),
+        migrations.RunSQL(
+            "DROP INDEX users_user_email_idx",
+            "CREATE INDEX users_user_email_idx ON auth_user (email)",
+        ),
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX users_user_email_lower_uniq ON auth_user (lower(email)) WHERE email <> ''",
+            "DROP INDEX users_user_email_lower_uniq",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX users_user_email_lower_idx ON auth_user (lower(email))",
+            "DROP INDEX users_user_email_lower_idx",
+        ),
+    ]
@@ -1,8 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+def users_by_email(email):
+    """ Users with `email`, ignoring case, looked up on the lower(email) index from migration 0005. """
+    return User.objects.alias(email_lower=Lower('email')).filter(email_lower=Lower(Value(email)))
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     full_name = models.CharField(max_length=100, blank=True)
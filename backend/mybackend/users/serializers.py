@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.contrib.auth.password_validation import validate_password
-from .models import UserProfile
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from mybackend.timing import TimedSerializerMixin
+from . import blacklist
+from .models import UserProfile, users_by_email
+from .tokens import add_profile_claims
 
 from .utils import send_activation_email
 
@@ -22,7 +31,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         
         # Check if email already exists
-        if User.objects.filter(email=attrs['email']).exists():
+        if users_by_email(attrs['email']).exists():
             raise serializers.ValidationError({"email": "Email is already registered."})
         
         return attrs
@@ -33,27 +42,79 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         email = validated_data['email']
         username=email
     
-        # Create user with the new username
-        user = User.objects.create(
+        user = User(
             username=username, 
             email=email,
             first_name=full_name.split(' ')[0], # Save first part as first_name
             last_name=' '.join(full_name.split(' ')[1:]), # Save rest as last_name
             is_active=False
         )
-        
+        # Hashing takes a good part of a second; the transaction would hold
+        # SQLite's write lock all along (see mybackend/sqlite3)
         user.set_password(validated_data['password'])
-        user.save()
-        send_activation_email(user)
+
+        # The user and its activation email are committed together; the
+        # email itself goes out later from the outbox worker.
+        with transaction.atomic():
+            user.save()
+            send_activation_email(user)
         return user
 
 class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True, write_only=True)
+    # Clients that only use the JWTs don't need a session
+    session = serializers.BooleanField(required=False, default=False)
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     email = serializers.EmailField(source='user.email')
     
     class Meta:
         model = UserProfile
-        fields = ('full_name', 'email')
\ No newline at end of file
+        fields = ('full_name', 'email')
+
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """ TokenObtainPairSerializer with the profile claims in both tokens. """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_profile_claims(super().get_token(user), user)
+
+
+class ProfileTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer that rewrites the profile claims from the database
+    instead of copying them from the old refresh token. The user has to be
+    loaded to check they are still active anyway; the profile comes along in
+    the same query.
+
+    Rotation blacklists the old token and records the new one directly,
+    with the user already in hand, rather than through RefreshToken's
+    blacklist() and outstand() that look the user up again each.
+    """
+    token_class = blacklist.RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.select_related('userprofile').filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        add_profile_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION and not blacklist.blacklist(refresh, user):
+                # Another request rotated this token first
+                raise TokenError(_('Token is blacklisted'))
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            blacklist.outstand(refresh, user)
+
+            data['refresh'] = str(refresh)
+
+        return data
@@ -1,3 +1,474 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.contrib.auth.tokens import default_token_generator
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from appointments.models import Appointment
+from contacts.models import Contact
+from mybackend.authentication import CachedJWTAuthentication, user_cache
+from mybackend.budgets import BudgetTestMixin
+from mybackend.queryplans import QueryPlanTestMixin
+from sync.models import ResourceVersion
+from tasks.models import Task
+from .blacklist import BloomFilter, RefreshToken, revoked_tokens
+from .models import UserProfile, users_by_email
+from .tokens import tokens_for_user
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ada@example.com', 'ada@example.com', 'secret-pass',
+                                             first_name='Ada', last_name='Lovelace')
+        self.client = APIClient()
+
+    def login(self, email='ada@example.com', password='secret-pass', **extra):
+        return self.client.post('/api/users/login/', {'email': email, 'password': password, **extra}, format='json')
+
+    def test_login_is_two_queries_and_returns_tokens(self):
+        # Loading the user, and recording the refresh token for the blacklist
+        with self.assertNumQueries(2):
+            response = self.login()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['full_name'], 'Ada Lovelace')
+        self.assertEqual(AccessToken(response.data['access'])['user_id'], str(self.user.id))
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_session_on_request(self):
+        response = self.login(session=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('sessionid', response.cookies)
+
+    def test_failed_logins(self):
+        self.assertEqual(self.login(password='wrong').data['error'], 'Invalid credentials')
+        self.assertEqual(self.login(email='nobody@example.com').data['error'], 'Invalid credentials')
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.login()
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('not activated', response.data['error'])
+
+    def test_emails_are_unique(self):
+        User.objects.create_user('admin', '', 'pass')
+        User.objects.create_user('root', '', 'pass')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('someone-else', 'ada@example.com', 'pass')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('shouting', 'ADA@example.com', 'pass')
+
+    def test_emails_ignore_case(self):
+        self.assertEqual(self.login(email='Ada@Example.com').status_code, 200)
+        response = self.client.post('/api/users/register/', {
+            'full_name': 'Ada Again', 'email': 'ADA@example.com',
+            'password': 'a-Strong-passw0rd', 'password_confirm': 'a-Strong-passw0rd',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+
+    def test_migration_refuses_duplicate_emails(self):
+        check_unique_emails = import_module('users.migrations.0002_user_email_unique').check_unique_emails
+        schema_editor = SimpleNamespace(connection=connection)
+        check_unique_emails(django_apps, schema_editor)
+
+        # As a database from before the index could hold them; rolled back with the test
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX users_user_email_lower_uniq')
+        User.objects.create_user('shouting', 'ADA@example.com', 'pass')
+        with self.assertRaisesMessage(RuntimeError, 'ada@example.com'):
+            check_unique_emails(django_apps, schema_editor)
+
+
+class RegistrationTests(TestCase):
+
+    def test_password_is_hashed_outside_the_transaction(self):
+        # Transactions take SQLite's write lock, so slow work stays out of them
+        outer = len(connection.atomic_blocks)
+        blocks = []
+
+        def hash_password(*args, **kwargs):
+            blocks.append(len(connection.atomic_blocks))
+            return make_password(*args, **kwargs)
+
+        with mock.patch('django.contrib.auth.base_user.make_password', side_effect=hash_password):
+            response = APIClient().post('/api/users/register/', {
+                'full_name': 'Ada Lovelace', 'email': 'ada@example.com',
+                'password': 'a-Strong-passw0rd', 'password_confirm': 'a-Strong-passw0rd',
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(blocks, [outer])
+        self.assertTrue(User.objects.get(email='ada@example.com').check_password('a-Strong-passw0rd'))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class EmailLookupQueryPlanTests(QueryPlanTestMixin, TestCase):
+    """ Logging in and the email links look users up by email; that mustn't scan auth_user. """
+
+    def test_lookups_use_email_index(self):
+        users = users_by_email('Ada@example.com')
+        self.assertUsesIndex(users, 'users_user_email_lower_idx')
+        self.assertUsesIndex(users.select_related('userprofile'), 'users_user_email_lower_idx')
+
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ProfileClaimTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ada@example.com', 'ada@example.com', 'secret-pass',
+                                             first_name='Ada', last_name='Lovelace')
+        self.client = APIClient()
+
+    def obtain(self):
+        response = self.client.post('/api/users/token/', {'username': 'ada@example.com', 'password': 'secret-pass'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get(self, url, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get(url)
+
+    def test_me_and_profile_come_from_the_token(self):
+        access = self.obtain()['access']
+        self.assertEqual(AccessToken(access)['full_name'], 'Ada Lovelace')
+
+        with self.assertNumQueries(0):
+            me = self.get('/api/users/me/', access)
+            profile = self.get('/api/users/profile/', access)
+
+        self.assertEqual(me.data, {'is_authenticated': True, 'user': {
+            'id': self.user.id, 'username': 'ada@example.com', 'email': 'ada@example.com',
+            'full_name': 'Ada Lovelace',
+        }})
+        self.assertEqual(profile.data, {'full_name': 'Ada Lovelace', 'email': 'ada@example.com'})
+
+    def test_refresh_picks_up_profile_changes(self):
+        tokens = self.obtain()
+        self.user.userprofile.full_name = 'Augusta Ada King'
+        self.user.userprofile.save()
+
+        response = self.client.post('/api/users/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['full_name'], 'Augusta Ada King')
+        self.assertEqual(self.get('/api/users/me/', response.data['access']).data['user']['full_name'],
+                         'Augusta Ada King')
+
+    def test_refresh_rejects_inactive_users(self):
+        tokens = self.obtain()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post('/api/users/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_tokens_without_claims_fall_back_to_the_database(self):
+        access = str(AccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            response = self.get('/api/users/me/', access)
+        self.assertEqual(response.data['user']['full_name'], 'Ada Lovelace')
+
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('ada@example.com', 'ada@example.com', 'secret-pass')
+        self.token = tokens_for_user(self.user).access_token
+        self.auth = CachedJWTAuthentication()
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            first = self.auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            second = self.auth.get_user(self.token)
+        self.assertEqual(second, self.user)
+        self.assertIsNot(first, second)
+
+    def test_saving_the_user_drops_it(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(client.get('/api/tasks/').status_code, 401)
+
+    @override_settings(JWT_USER_CACHE_SIZE=1)
+    def test_cache_is_bounded(self):
+        other = User.objects.create_user('alan@example.com', 'alan@example.com', 'secret-pass')
+        self.auth.get_user(self.token)
+        self.auth.get_user(tokens_for_user(other).access_token)
+        with self.assertNumQueries(1):
+            self.auth.get_user(self.token)
+
+    @override_settings(JWT_USER_CACHE_TTL=-1)
+    def test_entries_expire(self):
+        self.auth.get_user(self.token)
+        with self.assertNumQueries(1):
+            self.auth.get_user(self.token)
+
+    @override_settings(JWT_STATELESS_USERS=True)
+    def test_stateless_users(self):
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token)
+        self.assertEqual((user.pk, user.email), (self.user.pk, 'ada@example.com'))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = client.post('/api/tasks/', {'description': 'Made by a token user'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get().owner, self.user)
+
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class TokenBlacklistTests(TestCase):
+
+    def setUp(self):
+        revoked_tokens.clear()
+        self.user = User.objects.create_user('ada@example.com', 'ada@example.com', 'secret-pass')
+        self.refresh = str(tokens_for_user(self.user))
+        self.client = APIClient()
+
+    def post_refresh(self, refresh):
+        return self.client.post('/api/users/token/refresh/', {'refresh': refresh}, format='json')
+
+    def test_rotated_tokens_are_refused(self):
+        response = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+        # The new one works, once
+        self.assertEqual(self.post_refresh(response.data['refresh']).status_code, 200)
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+    def test_unknown_tokens_skip_the_blacklist_query(self):
+        self.post_refresh(self.refresh)
+        # Loading the user, blacklisting the old token (get + insert, in a
+        # savepoint under the test's transaction) and recording the new one;
+        # nothing for the blacklist check itself
+        refresh = str(tokens_for_user(self.user))
+        with self.assertNumQueries(6):
+            self.assertEqual(self.post_refresh(refresh).status_code, 200)
+
+    @override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=0)
+    def test_tokens_blacklisted_elsewhere_are_picked_up(self):
+        self.post_refresh(str(tokens_for_user(self.user)))
+        # As another process would
+        jti = RefreshToken(self.refresh, verify=False)['jti']
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_LOAD_BATCH=1)
+    def test_checks_use_the_table_until_the_filter_is_loaded(self):
+        self.post_refresh(self.refresh)
+        self.post_refresh(str(tokens_for_user(self.user)))
+        revoked_tokens.clear()
+
+        refresh = str(tokens_for_user(self.user))
+        for _ in range(2):
+            self.assertTrue(revoked_tokens.might_be_revoked(RefreshToken(refresh, verify=False)['jti']))
+        self.assertFalse(revoked_tokens.might_be_revoked(RefreshToken(refresh, verify=False)['jti']))
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    def test_logout_revokes_the_refresh_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        response = self.client.post('/api/users/logout/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    def test_prune_deletes_expired_tokens(self):
+        self.post_refresh(self.refresh)
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        fresh = tokens_for_user(self.user)
+
+        out = StringIO()
+        call_command('prune_tokens', batch_size=1, stdout=out)
+
+        self.assertIn('Deleted 2 expired token(s).', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [fresh['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for number in range(1000):
+            bloom.add(f'jti-{number}')
+        self.assertTrue(all(f'jti-{number}' in bloom for number in range(1000)))
+        false_positives = sum(f'other-{number}' in bloom for number in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+
+@override_settings(ROOT_URLCONF='mybackend.urls_async', PASSWORD_HASHERS=FAST_HASHERS)
+class AsyncAuthViewTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('ada@example.com', 'ada@example.com', 'secret-pass',
+                                             first_name='Ada', last_name='Lovelace')
+        self.client = AsyncClient()
+
+    async def login(self, password='secret-pass'):
+        return await self.client.post('/api/users/login/', {'email': 'ada@example.com', 'password': password},
+                                      content_type='application/json')
+
+    async def test_login(self):
+        response = await self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['full_name'], 'Ada Lovelace')
+        self.assertEqual((await self.login('wrong')).json(), {'error': 'Invalid credentials'})
+
+        headers = {'Authorization': f"Bearer {response.json()['access']}"}
+        response = await self.client.get('/api/users/me/', headers=headers)
+        self.assertEqual(response.json()['user']['email'], 'ada@example.com')
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.SHA1PasswordHasher'] + FAST_HASHERS)
+    async def test_outdated_hashes_are_upgraded(self):
+        self.assertEqual((await self.login()).status_code, 200)
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.password.startswith('sha1$'))
+
+    async def test_password_reset_confirm(self):
+        data = {
+            'uidb64': urlsafe_base64_encode(force_bytes(self.user.pk)),
+            'token': default_token_generator.make_token(self.user),
+            'password': 'a-new-passphrase',
+            'password_confirm': 'a-new-passphrase',
+        }
+        response = await self.client.post('/api/users/password-reset-confirm/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await self.login('a-new-passphrase')).status_code, 200)
+        # The token is spent once the password changes
+        response = await self.client.post('/api/users/password-reset-confirm/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SeedDataTests(TestCase):
+
+    def seed(self, **options):
+        call_command('seed_data', attendees=2, stdout=StringIO(), **options)
+
+    def test_creates_the_requested_volumes(self):
+        self.seed(users=3, tasks=10, contacts=6, appointments=4)
+
+        users = User.objects.filter(username__startswith='seed-')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+        self.assertEqual(Task.objects.count(), 10)
+        self.assertEqual(Contact.objects.count(), 6)
+        self.assertEqual(Appointment.objects.count(), 4)
+        # Versions for every tracked resource, so sync can start from them
+        self.assertEqual(ResourceVersion.objects.filter(owner__in=users).count(), 3 * 3)
+        # Users can log in with the shared password
+        response = APIClient().post('/api/users/login/', {'email': 'seed-0@example.com', 'password': 'seed-passphrase'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_attendees_are_the_owners_contacts(self):
+        # Several batches, whose links are written batch by batch
+        self.seed(users=2, tasks=0, contacts=20, appointments=10, batch_size=3)
+
+        Attendee = Appointment.attendees.through
+        links = Attendee.objects.select_related('appointment', 'contact')
+        self.assertTrue(links.exists())
+        for link in links:
+            self.assertEqual(link.appointment.owner_id, link.contact.owner_id)
+
+    def test_running_again_adds_more_users(self):
+        self.seed(users=2, tasks=0, contacts=0, appointments=0)
+        self.seed(users=2, tasks=0, contacts=0, appointments=0)
+
+        self.assertEqual(
+            sorted(User.objects.filter(username__startswith='seed-').values_list('username', flat=True)),
+            ['seed-0@example.com', 'seed-1@example.com', 'seed-2@example.com', 'seed-3@example.com'],
+        )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UserBudgetTests(BudgetTestMixin, TestCase):
+    url_prefix = 'api/users/'
+    password = 'Correct-horse-7'
+
+    def owner_with_tasks(self, rows, **fields):
+        # None of these views should read the user's data
+        owner = self.create_owner(self.password, **fields)
+        Task.objects.bulk_create(Task(owner=owner, description=f'Task {i}') for i in range(rows))
+        return owner
+
+    def uid_and_token(self, user):
+        return {'uidb64': urlsafe_base64_encode(force_bytes(user.pk)), 'token': default_token_generator.make_token(user)}
+
+    def test_budgets(self):
+        def post(path, data, authenticated=False):
+            def setup(rows):
+                owner = self.owner_with_tasks(rows)
+                client = self.client_for(owner) if authenticated else APIClient()
+                return lambda: client.post(path, data(owner), format='json')
+            return setup
+
+        def get(path):
+            def setup(rows):
+                client = self.client_for(self.owner_with_tasks(rows))
+                return lambda: client.get(path)
+            return setup
+
+        def register(rows):
+            email = f'new-{User.objects.count()}@example.com'
+            return lambda: APIClient().post('/api/users/register/', {
+                'full_name': 'New User', 'email': email, 'password': self.password, 'password_confirm': self.password,
+            }, format='json')
+
+        def activate(rows):
+            owner = self.owner_with_tasks(rows, is_active=False)
+            return lambda: APIClient().post('/api/users/activate/', self.uid_and_token(owner), format='json')
+
+        def resend(rows):
+            owner = self.owner_with_tasks(rows, is_active=False)
+            return lambda: APIClient().post('/api/users/resend-activation/', {'email': owner.email}, format='json')
+
+        credentials = lambda owner: {'email': owner.email, 'password': self.password}
+        new_password = lambda owner: {
+            **self.uid_and_token(owner), 'password': 'Another-horse-8', 'password_confirm': 'Another-horse-8',
+        }
+        self.check_budgets({
+            ('TokenObtainPairView', 'POST'): post(
+                '/api/users/token/', lambda owner: {'username': owner.username, 'password': self.password}),
+            ('TokenRefreshView', 'POST'): post(
+                '/api/users/token/refresh/', lambda owner: {'refresh': str(tokens_for_user(owner))}),
+            ('register_user', 'POST'): register,
+            ('login_user', 'POST'): post('/api/users/login/', credentials),
+            ('logout_user', 'POST'): post(
+                '/api/users/logout/', lambda owner: {'refresh': str(tokens_for_user(owner))}, authenticated=True),
+            ('get_user_profile', 'GET'): get('/api/users/profile/'),
+            ('check_auth_status', 'GET'): get('/api/users/me/'),
+            ('activate_user', 'POST'): activate,
+            ('resend_activation', 'POST'): resend,
+            ('password_reset_request', 'POST'): post('/api/users/password-reset-request/',
+                                                     lambda owner: {'email': owner.email}),
+            ('password_reset_confirm', 'POST'): post('/api/users/password-reset-confirm/', new_password),
+        })
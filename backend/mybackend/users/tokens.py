@@ -0,0 +1,48 @@
+"""
+Profile claims carried in the JWTs, so that "who am I" can be answered
+from the token alone. The claims are written whenever a token pair is
+issued or refreshed, which is also when a changed profile catches up.
+"""
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import UserProfile
+
+PROFILE_CLAIMS = ('username', 'email', 'full_name')
+
+
+def profile_full_name(user):
+    try:
+        return user.userprofile.full_name
+    except UserProfile.DoesNotExist:
+        return user.get_full_name() or user.username
+
+
+def add_profile_claims(token, user):
+    token['username'] = user.username
+    token['email'] = user.email
+    token['full_name'] = profile_full_name(user)
+    return token
+
+
+def tokens_for_user(user):
+    """ A refresh token (and, through it, an access token) with the profile claims. """
+    return add_profile_claims(RefreshToken.for_user(user), user)
+
+
+def profile_from_user(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'full_name': profile_full_name(user),
+    }
+
+
+def profile_from_token(token):
+    """ The same dict as profile_from_user(), or None for a token issued without the claims. """
+    if any(claim not in token for claim in PROFILE_CLAIMS):
+        return None
+    profile = {'id': int(token[api_settings.USER_ID_CLAIM])}
+    profile.update((claim, token[claim]) for claim in PROFILE_CLAIMS)
+    return profile
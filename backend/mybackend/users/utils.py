@@ -1,13 +1,14 @@
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
 from django.conf import settings
 
+from outbox.utils import queue_mail
+
 
 def send_activation_email(user, site_domain="localhost:3000"):
     """
-    Generates and sends an activation email to the user.
+    Generates an activation email for the user and queues it in the outbox.
     """
     token = default_token_generator.make_token(user)
     uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
@@ -28,18 +29,17 @@ def send_activation_email(user, site_domain="localhost:3000"):
     The PAs Assistant Team
     """
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=message,
         from_email=settings.DEFAULT_FROM_EMAIL, # Make sure to set this in settings.py
         recipient_list=[user.email],
-        fail_silently=False,
     )
 
 
 def send_password_reset_email(user, site_domain="localhost:3000"):
     """
-    Generates and sends a password reset email to the user.
+    Generates a password reset email for the user and queues it in the outbox.
     """
     token = default_token_generator.make_token(user)
     uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
@@ -61,10 +61,9 @@ def send_password_reset_email(user, site_domain="localhost:3000"):
     The PAs Assistant Team
     """
 
-    send_mail(
+    queue_mail(
         subject=subject,
         message=message,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[user.email],
-        fail_silently=False,
     )
\ No newline at end of file
@@ -1,11 +1,19 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
-from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer
-from .models import UserProfile
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from mybackend.asyncviews import AsyncAPIView
+from .blacklist import RefreshToken, blacklist
+from .hashing import acheck_password, ahash_password
+from .models import users_by_email
+from .serializers import UserRegistrationSerializer, UserLoginSerializer
+from .tokens import profile_from_token, profile_from_user, tokens_for_user
 
 from .utils import send_activation_email, send_password_reset_email
 from django.contrib.auth.tokens import default_token_generator
@@ -31,40 +39,45 @@ def register_user(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login_user(request):
+    """
+    Log in with email and password and get a JWT pair back. The user and
+    their profile come from one query on the email index. Pass
+    `"session": true` to also start a Django session.
+    """
     serializer = UserLoginSerializer(data=request.data)
     if serializer.is_valid():
         email = serializer.validated_data['email']
         password = serializer.validated_data['password']
         
-        user_instance= None
-        try:
-            user_instance = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user = users_by_email(email).select_related('userprofile').first()
+        if user is None:
+            # Hash anyway, so the response time doesn't tell whether the email is registered
+            User().set_password(password)
             return Response({
                 'error': 'Invalid credentials'
             }, status=status.HTTP_401_UNAUTHORIZED)
-        
 
-        user = authenticate(username=user_instance.username, password=password)
-        if user is not None:
-            login(request, user)
+        # Same checks authenticate() makes, without looking the user up again
+        if not user.is_active:
             return Response({
-                'message': 'Login successful',
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'full_name': user.userprofile.full_name
-                }
-            })
-        else:
-            if not user_instance.is_active:
-                return Response({
-                    'error': 'Account not activated. Please check your email'
-                }, status=status.HTTP_401_UNAUTHORIZED)
+                'error': 'Account not activated. Please check your email'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        if not user.check_password(password):
             return Response({
                 'error': 'Invalid credentials'
             }, status=status.HTTP_401_UNAUTHORIZED)
+
+        if serializer.validated_data.get('session'):
+            user.backend = 'django.contrib.auth.backends.ModelBackend'
+            login(request, user)
+
+        refresh = tokens_for_user(user)
+        return Response({
+            'message': 'Login successful',
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+            'user': profile_from_user(user)
+        })
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
@@ -98,7 +111,7 @@ def resend_activation(request):
         return Response({'error': 'Email is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        user = User.objects.get(email=email)
+        user = users_by_email(email).get()
         
         if not user.is_active:
             # If user exists and is not active, send a new email
@@ -125,7 +138,7 @@ def password_reset_request(request):
         return Response({'error': 'Email is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        user = User.objects.get(email=email)
+        user = users_by_email(email).get()
         
         # We check if they are active, but we'll send the email anyway
         # This is a security measure to not reveal if an email is registered.
@@ -182,36 +195,156 @@ def password_reset_confirm(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_user(request):
+    # Clients that send their refresh token get it revoked as well
+    if request.data.get('refresh'):
+        try:
+            refresh = RefreshToken(request.data['refresh'])
+        except TokenError:
+            refresh = None
+        if refresh is not None and refresh.get(api_settings.USER_ID_CLAIM) == str(request.user.id):
+            blacklist(refresh, request.user)
     logout(request)
     return Response({'message': 'Logged out successfully'})
 
+def current_profile(request):
+    """
+    The signed-in user's profile, read from the access token's claims.
+    Tokens issued before the claims existed fall back to the database.
+    """
+    profile = profile_from_token(request.auth)
+    if profile is None:
+        user = User.objects.select_related('userprofile').filter(pk=request.user.id).first()
+        if user is not None:
+            profile = profile_from_user(user)
+    return profile
+
+
+# These two trust the token (checked by the stateless authentication) and
+# don't look the user up; changes show up at the next token refresh
+
 @api_view(['GET'])
+@authentication_classes([JWTStatelessUserAuthentication])
 @permission_classes([IsAuthenticated])
 def get_user_profile(request):
-    profile = UserProfile.objects.get(user=request.user)
-    serializer = UserProfileSerializer(profile)
-    return Response(serializer.data)
+    profile = current_profile(request)
+    if profile is None:
+        return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'full_name': profile['full_name'], 'email': profile['email']})
 
 
 @api_view(['GET'])
+@authentication_classes([JWTStatelessUserAuthentication])
 @permission_classes([IsAuthenticated]) # This ensures only logged-in users can see it
 def check_auth_status(request):
-    
-
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
-    if created and not profile.full_name:
-        profile.full_name = request.user.get_full_name() or request.user.username
-        profile.save()
-
-    if request.user.is_authenticated:
+    profile = current_profile(request)
+    if profile is not None:
         return Response({
             'is_authenticated': True,
-            'user': {
-                'id': request.user.id,
-                'username': request.user.username,
-                'email': request.user.email,
-                'full_name': profile.full_name # Now this is safe to access
-            }
+            'user': profile
         })
     
-    return Response({'is_authenticated': False}, status=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+    return Response({'is_authenticated': False}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+# Async versions of the endpoints above, served under ASGI by
+# mybackend/urls_async.py. Password hashing goes to the bounded pool in
+# users/hashing.py instead of holding up the request's worker.
+
+class AsyncLogin(AsyncAPIView):
+    """ login_user for ASGI. """
+    login_required = False
+
+    async def post(self, request):
+        serializer = UserLoginSerializer(data=request.data)
+        if not serializer.is_valid():
+            return self.render(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data['email']
+        password = serializer.validated_data['password']
+
+        user = await users_by_email(email).select_related('userprofile').afirst()
+        if user is None:
+            # Hash anyway, so the response time doesn't tell whether the email is registered
+            await ahash_password(password)
+            return self.render({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        if not user.is_active:
+            return self.render({
+                'error': 'Account not activated. Please check your email'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        if not await acheck_password(user, password):
+            return self.render({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if serializer.validated_data.get('session'):
+            user.backend = 'django.contrib.auth.backends.ModelBackend'
+            await sync_to_async(login)(request._request, user)
+
+        refresh = await sync_to_async(tokens_for_user)(user)
+        return self.render({
+            'message': 'Login successful',
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+            'user': profile_from_user(user)
+        })
+
+
+class AsyncPasswordResetConfirm(AsyncAPIView):
+    """ password_reset_confirm for ASGI. """
+    login_required = False
+
+    async def post(self, request):
+        uidb64 = request.data.get('uidb64')
+        token = request.data.get('token')
+        password = request.data.get('password')
+        password_confirm = request.data.get('password_confirm')
+
+        if not all([uidb64, token, password, password_confirm]):
+            return self.render({'error': 'All fields are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if password != password_confirm:
+            return self.render({'password': "Passwords do not match."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            user = await User.objects.aget(pk=force_str(urlsafe_base64_decode(uidb64)))
+        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+            user = None
+
+        if user is None or not default_token_generator.check_token(user, token):
+            return self.render({'error': 'Reset link is invalid or has expired.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            validate_password(password, user)
+        except ValidationError as e:
+            return self.render({'password': list(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        user.password = await ahash_password(password)
+        await user.asave()
+        return self.render({'message': 'Password has been reset successfully.'})
+
+
+async def acurrent_profile(request):
+    """ current_profile() for async views. """
+    profile = profile_from_token(request.auth)
+    if profile is None:
+        user = await User.objects.select_related('userprofile').filter(pk=request.user.id).afirst()
+        if user is not None:
+            profile = profile_from_user(user)
+    return profile
+
+
+class AsyncUserProfile(AsyncAPIView):
+    """ get_user_profile for ASGI. """
+    authentication_class = JWTStatelessUserAuthentication
+
+    async def get(self, request):
+        profile = await acurrent_profile(request)
+        if profile is None:
+            return self.render({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return self.render({'full_name': profile['full_name'], 'email': profile['email']})
+
+
+class AsyncAuthStatus(AsyncAPIView):
+    """ check_auth_status for ASGI. """
+    authentication_class = JWTStatelessUserAuthentication
+
+    async def get(self, request):
+        profile = await acurrent_profile(request)
+        if profile is None:
+            return self.render({'is_authenticated': False}, status=status.HTTP_401_UNAUTHORIZED)
+        return self.render({'is_authenticated': True, 'user': profile})
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import '../styles/Quickinfo.css';
-import { getAccessToken, fetchWithAuth } from '../users/UserAuth'; 
+import { getAccessToken, fetchWithAuth, readAllPages } from '../users/UserAuth'; 
 import { useAuth } from '../context/AuthContext'; 
 
 const API_TASKS_URL = 'http://localhost:8000/api/tasks/';
@@ -31,7 +31,7 @@ const QuickInfo = () => {
             try {
                 const response = await fetchWithAuth(API_TASKS_URL);
                 if (!response.ok) throw new Error('Could not fetch tasks.');
-                const allTasks = await response.json();
+                const allTasks = await readAllPages(response);
                 const today = new Date(); today.setHours(0, 0, 0, 0);
                 const processedTasks = allTasks
                     .filter(task => !task.completed)
@@ -69,7 +69,7 @@ const QuickInfo = () => {
              try {
                  const response = await fetchWithAuth(API_CONTACTS_URL);
                  if (!response.ok) throw new Error('Could not fetch contacts.');
-                 const allContacts = await response.json();
+                 const allContacts = await readAllPages(response);
                  const processedContacts = allContacts.slice(0, 3); // Simple slice for now
                  setKeyContacts(processedContacts);
              } catch (err) {
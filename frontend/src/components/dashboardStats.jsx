@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
-import { fetchWithAuth } from '../users/UserAuth';
+import { fetchWithAuth, readAllPages } from '../users/UserAuth';
 import '../styles/dashboardStats.css';
 
 // API endpoints
@@ -53,9 +53,9 @@ const DashboardStats = () => {
                 if (!contactRes.ok) throw new Error('Failed to fetch contacts');
 
                 // Get the JSON data (which is an array)
-                const tasks = await taskRes.json();
-                const appointments = await apptRes.json();
-                const contacts = await contactRes.json();
+                const tasks = await readAllPages(taskRes);
+                const appointments = await readAllPages(apptRes);
+                const contacts = await readAllPages(contactRes);
 
                 // Set the counts based on the length of the arrays
                 setTaskCount(tasks.length);
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import Calendar from './calendar';
 import AppointmentForm from '../components/AppointmentForm';
-import { fetchWithAuth } from '../users/UserAuth'; 
+import { fetchWithAuth, readAllPages } from '../users/UserAuth'; 
 import { useAuth } from '../context/AuthContext'; 
 import { toast } from 'react-toastify';
 
@@ -62,7 +62,7 @@ const AppointmentPage = () => {
                     throw new Error(`Could not fetch tasks (Status: ${response.status})`);
                 }
 
-                const appointments = await response.json();
+                const appointments = await readAllPages(response);
                 const calendarEvents = transformAppointmentsToEvents(appointments);
                 setEvents(calendarEvents);
             } catch (err) {
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import ContactsView from '../components/ContactsView'; // The UI component
 import ContactModal from '../components/ContactModal'; // The Modal component
 import '../styles/contacts.css';
-import {fetchWithAuth } from '../users/UserAuth';
+import {fetchWithAuth, readAllPages } from '../users/UserAuth';
 import { useAuth } from '../context/AuthContext';
 import { toast } from 'react-toastify';
 
@@ -30,7 +30,7 @@ const ContactsContainer = () => {
             try {
                 const response = await fetchWithAuth(API_CONTACTS_URL);
                 if (!response.ok) throw new Error('Could not fetch contacts.');
-                const data = await response.json();
+                const data = await readAllPages(response);
                 setContacts(data);
             } catch (err) {
                 setError(err.message);
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import TasksView from '../components/TaskView';
 import '../styles/tasks.css';
-import { fetchWithAuth, getAccessToken } from '../users/UserAuth'; 
+import { fetchWithAuth, getAccessToken, readAllPages } from '../users/UserAuth'; 
 import { useAuth } from '../context/AuthContext';
 import { toast } from 'react-toastify';
 
@@ -36,7 +36,7 @@ const TasksContainer = () => {
                 const response = await fetchWithAuth(API_BASE_URL);
 
                 if (!response.ok) throw new Error('Could not fetch tasks.');
-                const data = await response.json();
+                const data = await readAllPages(response);
                 setTasks(data);
             } catch (err) {
                 setError(err.message);
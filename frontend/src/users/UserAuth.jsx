@@ -304,6 +304,26 @@ export const fetchWithAuth = async (url, options = {}) => {
     return response;
 };
 
+/**
+ * Reads a list response, following the 'next' cursor links of a
+ * paginated endpoint until every page has been loaded.
+ * @param {Response} response - The (ok) response for the first page.
+ * @returns {Promise<Array>} - All the results across pages.
+ */
+export const readAllPages = async (response) => {
+    let data = await response.json();
+    if (!data || !Array.isArray(data.results)) return data;
+
+    let results = data.results;
+    while (data.next) {
+        const nextResponse = await fetchWithAuth(data.next);
+        if (!nextResponse.ok) throw new Error('Could not fetch the next page.');
+        data = await nextResponse.json();
+        results = results.concat(data.results);
+    }
+    return results;
+};
+
 
 // export const fetchWithAuth = async (url, options = {}) => {
     